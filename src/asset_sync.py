@@ -0,0 +1,166 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from build_manifest import FileHasher
+from fs_utils import load_state, remove_output, temp_path_for, write_json_atomic
+
+ASSET_STATE_VERSION = 1
+LINK_MODES = ("auto", "copy", "hardlink", "reflink")
+# Files at least this big are copied on the thread pool instead of inline
+LARGE_FILE_SIZE = 1 << 20
+_FICLONE = 0x40049409
+
+
+def scan_static(source_dir):
+    """Yield (relative path, DirEntry) for every non-hidden file under `source_dir`."""
+    stack = [""]
+    while stack:
+        relative_dir = stack.pop()
+        with os.scandir(os.path.join(source_dir, relative_dir)) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                relative = os.path.join(relative_dir, entry.name)
+                if entry.is_dir():
+                    stack.append(relative)
+                elif entry.is_file():
+                    yield relative, entry
+
+
+def _reflink(src_path, tmp_path):
+    import fcntl
+
+    with open(src_path, "rb") as src, open(tmp_path, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+
+
+def _copy_file_range(src_path, tmp_path):
+    with open(src_path, "rb") as src, open(tmp_path, "wb") as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+
+
+def place_file(src_path, dest_path, link_mode="auto"):
+    """Put a copy of `src_path` at `dest_path` and return how it was done.
+
+    The new file is built next to the destination and renamed over it, so a
+    destination that was hardlinked to an older source is never written through.
+    """
+    if link_mode == "hardlink":
+        tmp_path = temp_path_for(dest_path)
+        try:
+            os.link(src_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+            return "hardlink"
+        except OSError:
+            pass  # different filesystem or no link support, copy instead
+
+    tmp_path = temp_path_for(dest_path)
+    strategies = []
+    if link_mode in ("auto", "reflink"):
+        strategies.append(("reflink", _reflink))
+        if hasattr(os, "copy_file_range"):
+            strategies.append(("copy_file_range", _copy_file_range))
+    strategies.append(("copy", shutil.copyfile))
+
+    for method, strategy in strategies:
+        try:
+            strategy(src_path, tmp_path)
+            break
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if method == "copy":
+                raise
+    shutil.copystat(src_path, tmp_path)
+    os.replace(tmp_path, dest_path)
+    return method
+
+
+def _is_unchanged(stat, dest_path, old, source_hash):
+    try:
+        dest_stat = os.stat(dest_path)
+    except OSError:
+        return False
+    if dest_stat.st_size != stat.st_size:
+        return False
+    if source_hash is not None:
+        return old is not None and old.get("hash") == source_hash
+    return dest_stat.st_mtime_ns == stat.st_mtime_ns
+
+
+def sync_static(source_dir, dest_dir, state_path, link_mode="auto", use_hash=False, jobs=4, files=None,
+                output_dirs=(), minifier=None):
+    """Bring `dest_dir` in line with `source_dir`, touching only files that changed.
+
+    Files are compared by size and mtime (or content hash with `use_hash`), and files
+    this function placed on an earlier run are pruned once their source is gone.
+    `files` is a list of (relative path, DirEntry) from an inventory.Inventory, used instead of
+    walking `source_dir`, and `output_dirs` directories already known to exist, which pruning
+    leaves in place.
+    With a minify.MinifyCache as `minifier`, the files it handles are placed from their
+    minified copy, which is only made again when the source hash changes.
+    Returns a dict of counts by outcome.
+    """
+    if link_mode not in LINK_MODES:
+        raise ValueError(f"unknown link mode {link_mode!r}, expected one of {LINK_MODES}")
+
+    old_files = load_state(state_path, ASSET_STATE_VERSION).get("files", {})
+    hasher = FileHasher({os.path.join(source_dir, path): entry for path, entry in old_files.items()})
+    entries = scan_static(source_dir) if files is None else files
+    files = {}
+    counts = {"unchanged": 0, "pruned": 0}
+    made_dirs = set(output_dirs)
+    large = []
+
+    def record(method):
+        counts[method] = counts.get(method, 0) + 1
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for relative, entry in entries:
+            stat = entry.stat()
+            src_path = entry.path
+            dest_path = os.path.join(dest_dir, relative)
+            files[relative] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            minify = minifier is not None and minifier.handles(relative)
+            source_hash = None
+            if use_hash or minify:
+                source_hash = hasher.stat_entry(src_path, stat)["hash"]
+                files[relative]["hash"] = source_hash
+
+            old = old_files.get(relative)
+            if minify:
+                src_path = minifier.output_for(src_path, source_hash)
+                stat = os.stat(src_path)
+                files[relative]["minified"] = True
+            # A file that was minified last time (or not) has to be placed again when that flips
+            if (old or {}).get("minified", False) == minify and _is_unchanged(stat, dest_path, old, source_hash):
+                counts["unchanged"] += 1
+                continue
+
+            directory = os.path.normpath(os.path.dirname(dest_path))
+            if directory not in made_dirs:
+                os.makedirs(directory, exist_ok=True)
+                made_dirs.add(directory)
+            if stat.st_size >= LARGE_FILE_SIZE:
+                large.append(pool.submit(place_file, src_path, dest_path, link_mode))
+            else:
+                record(place_file(src_path, dest_path, link_mode))
+
+        for future in large:
+            record(future.result())
+
+    if minifier is not None:
+        minifier.retain({entry["hash"] for entry in files.values() if entry.get("minified")})
+    for relative in old_files:
+        if relative not in files:
+            remove_output(os.path.join(dest_dir, relative), dest_dir, output_dirs)
+            counts["pruned"] += 1
+
+    write_json_atomic(state_path, {"version": ASSET_STATE_VERSION, "files": files})
+    return counts
@@ -0,0 +1,61 @@
+"""Bytes per node for the slotted node classes versus the old __dict__-based layout.
+
+Run with: python3 src/bench_memory.py [count]
+"""
+import sys
+import tracemalloc
+
+from htmlnode import LeafNode, ParentNode
+from textnode import TextNode, TextType
+
+
+# Replicas of the node classes as they were before __slots__, for comparison
+class DictTextNode:
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class DictHTMLNode:
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+def bytes_per_node(factory, count):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        nodes = [factory(i) for i in range(count)]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    # Only count what the nodes themselves allocated, not the list holding them
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    allocated -= sys.getsizeof(nodes)
+    return allocated / count
+
+
+def main(count=100_000):
+    # Shared text/tag values so only the node objects are measured
+    text = "fragment"
+    children = []
+    cases = [
+        ("TextNode", lambda i: DictTextNode(text, TextType.TEXT), lambda i: TextNode(text, TextType.TEXT)),
+        ("LeafNode", lambda i: DictHTMLNode("b", text, None, None), lambda i: LeafNode("b", text)),
+        ("ParentNode", lambda i: DictHTMLNode("p", None, children, None), lambda i: ParentNode("p", children)),
+    ]
+
+    print(f"{'node':<12}{'before':>10}{'after':>10}{'saved':>8}")
+    for name, old_factory, new_factory in cases:
+        old = bytes_per_node(old_factory, count)
+        new = bytes_per_node(new_factory, count)
+        print(f"{name:<12}{old:>10.1f}{new:>10.1f}{1 - new / old:>8.0%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
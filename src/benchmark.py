@@ -0,0 +1,172 @@
+"""Time the markdown pipeline on a seeded synthetic corpus.
+
+    python3 src/benchmark.py run --pages 200 --output bench.json
+    python3 src/benchmark.py compare baseline.json bench.json --threshold 0.10
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from block_markdown import BlockType, block_to_block_type, iter_typed_blocks, markdown_to_blocks, markdown_to_html_node
+from corpus import DEFAULT_BLOCK_MIX, DEFAULT_INLINE_DENSITY, generate_corpus
+from generate_page import generate_pages_recursive
+from inline_markdown import text_to_textnodes
+
+RESULTS_VERSION = 1
+TEMPLATE = """<!doctype html>
+<html>
+  <head><title>{{ Title }}</title><link href="/index.css" rel="stylesheet" /></head>
+  <body><article>{{ Content }}</article></body>
+</html>
+"""
+
+
+def _time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {"min": min(timings), "median": statistics.median(timings), "repeat": repeat}
+
+
+def run_benchmarks(pages=100, seed=0, blocks=40, repeat=5, block_mix=None, inline_density=None):
+    block_mix = DEFAULT_BLOCK_MIX if block_mix is None else block_mix
+    inline_density = DEFAULT_INLINE_DENSITY if inline_density is None else inline_density
+
+    with tempfile.TemporaryDirectory() as root:
+        content = os.path.join(root, "content")
+        paths = generate_corpus(content, pages=pages, seed=seed, blocks=blocks, block_mix=block_mix,
+                                inline_density=inline_density)
+        documents = []
+        for path in paths:
+            with open(path, "r") as file:
+                documents.append(file.read())
+
+        # Inputs for the later stages are prepared once so each stage is timed on its own
+        blocks_list = [block for document in documents for block in markdown_to_blocks(document)]
+        paragraphs = [
+            " ".join(line.strip() for line in block.splitlines())
+            for block in blocks_list
+            if block_to_block_type(block) == BlockType.PARAGRAPH
+        ]
+        nodes = [markdown_to_html_node(document) for document in documents]
+
+        template_path = os.path.join(root, "template.html")
+        with open(template_path, "w") as file:
+            file.write(TEMPLATE)
+        dest = os.path.join(root, "docs")
+
+        def full_build():
+            # generate_page reports every page; keep that out of the timing output
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive("/", content, template_path, dest)
+
+        stages = {
+            "markdown_to_blocks": lambda: [markdown_to_blocks(document) for document in documents],
+            "block_to_block_type": lambda: [block_to_block_type(block) for block in blocks_list],
+            "iter_typed_blocks": lambda: [list(iter_typed_blocks(document)) for document in documents],
+            "text_to_textnodes": lambda: [text_to_textnodes(text) for text in paragraphs],
+            "markdown_to_html_node": lambda: [markdown_to_html_node(document) for document in documents],
+            "to_html": lambda: [node.to_html() for node in nodes],
+            "generate_pages_recursive": full_build,
+        }
+        results = {name: _time(function, repeat) for name, function in stages.items()}
+
+    return {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "pages": pages,
+            "seed": seed,
+            "blocks": blocks,
+            "block_mix": block_mix,
+            "inline_density": inline_density,
+            "documents_bytes": sum(len(document) for document in documents),
+            "block_count": len(blocks_list),
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline, current, threshold=0.10):
+    """Return (name, baseline seconds, current seconds, relative change, regressed) rows.
+
+    Stages are compared on their minimum time, the least noisy of the statistics kept.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        change = (result["min"] - old["min"]) / old["min"] if old["min"] else 0.0
+        rows.append((name, old["min"], result["min"], change, change > threshold))
+    return rows
+
+
+def _load(path):
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the static site generator.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="generate a corpus and time each stage")
+    run.add_argument("--pages", type=int, default=100)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--blocks", type=int, default=40, help="blocks per page")
+    run.add_argument("--repeat", type=int, default=5)
+    run.add_argument("--block-mix", type=json.loads, default=None,
+                     help='JSON weights per block kind, e.g. \'{"paragraph": 3, "code": 1}\'')
+    run.add_argument("--inline-density", type=json.loads, default=None,
+                     help='JSON chance per word of each inline kind, e.g. \'{"link": 0.2}\'')
+    run.add_argument("--output", "-o", help="write results JSON here instead of stdout")
+    run.add_argument("--baseline", help="compare against this results file and fail on regressions")
+    run.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging (default: 0.10)")
+
+    compare = commands.add_parser("compare", help="compare two results files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging (default: 0.10)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        current = run_benchmarks(args.pages, args.seed, args.blocks, args.repeat, args.block_mix, args.inline_density)
+        text = json.dumps(current, indent=2, sort_keys=True)
+        if args.output:
+            with open(args.output, "w") as file:
+                file.write(text + "\n")
+        else:
+            print(text)
+        if not args.baseline:
+            return 0
+        baseline = _load(args.baseline)
+    else:
+        baseline = _load(args.baseline)
+        current = _load(args.current)
+
+    if baseline["meta"].get("pages") != current["meta"].get("pages") or baseline["meta"].get("seed") != current["meta"].get("seed"):
+        print("warning: baseline was measured on a different corpus", file=sys.stderr)
+
+    regressions = 0
+    print(f"{'stage':<26}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, old, new, change, regressed in compare_results(baseline, current, args.threshold):
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<26}{old * 1000:>10.2f}ms{new * 1000:>10.2f}ms{change:>+9.1%}{flag}")
+        regressions += regressed
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
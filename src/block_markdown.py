@@ -2,30 +2,50 @@ import re
 from enum import Enum
 from typing import Any
 
-from htmlnode import ParentNode
+from htmlnode import LeafNode, ParentNode
 from inline_markdown import text_to_textnodes
+from minify import minify_chunks
 from textnode import TextNode, text_node_to_html_node, TextType
 
 
 
 
-def markdown_to_blocks(markdown: str):
-    lines = markdown.splitlines()
-    blocks = []
+def iter_lines(source):
+    """Yield lines without their line endings from a string, an open file or an mmap.
+
+    Files and mmaps are read with readline, one line at a time; bytes are decoded as UTF-8.
+    Lines are split the way str.splitlines splits them, whatever the source.
+    """
+    if isinstance(source, str):
+        yield from source.splitlines()
+        return
+    readline = source.readline
+    line = readline()
+    while line:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        yield from line.splitlines()
+        line = readline()
+
+
+def iter_markdown_blocks(source):
+    """Yield blocks as soon as the blank line (or end of input) that closes them is read."""
     current: list[str] = []
 
-    for line in lines:
+    for line in iter_lines(source):
         if line.strip() == "":
             if current:
-                blocks.append("\n".join(current).strip())
+                yield "\n".join(current).strip()
                 current = []
         else:
             current.append(line)
 
     if current:
-        blocks.append("\n".join(current).strip())
+        yield "\n".join(current).strip()
+
 
-    return blocks
+def markdown_to_blocks(markdown: str):
+    return list(iter_markdown_blocks(markdown))
 
 class BlockType(Enum):
     PARAGRAPH = "paragraph"
@@ -80,125 +100,249 @@ def block_to_block_type(markdown_block: str) -> BlockType:
         return BlockType.ORDERED_LIST
     return BlockType.PARAGRAPH
 
-def text_to_children(text):
-    text_nodes = text_to_textnodes(text)
-    return [text_node_to_html_node(node) for node in text_nodes]
-
-
-def markdown_to_html_node(markdown):
-    new_nodes: list[Any] = []
-    blocks = markdown_to_blocks(markdown)
-    for block in blocks:
-        block_type = block_to_block_type(block)
-        # Paragraph Formatting
-        if block_type == BlockType.PARAGRAPH:
-            # Strip each line, then join with a single space
-            paragraph_text = " ".join(line.strip() for line in block.splitlines())
-            children = text_to_children(paragraph_text)
-            new_nodes.append(ParentNode(tag="p", children=children))
-        # Code Formatting
-        elif block_type == BlockType.CODE:
-            lines = block.splitlines()
-            inner_lines = lines[1:-1]
-
-            # Strip leading spaces from each inner line (tests expect no indentation)
-            stripped_lines = [line.lstrip() for line in inner_lines]
-
-            # Join with a newline *between* lines, and add a final newline
-            inner_code = "\n".join(stripped_lines) + "\n"
-
-            nd = TextNode(text=inner_code, text_type=TextType.CODE)
-            code_html = text_node_to_html_node(nd)
-            new_nodes.append(ParentNode(tag="pre", children=[code_html]))
-        # Heading Formatting
-        elif block_type == BlockType.HEADING:
-            level = 0
-            for i in block:
-                if i == "#":
-                    level += 1
-                if i != "#":
-                    break
-            stripped = block[level:].lstrip()
-            children = text_to_children(stripped)
-            new_nodes.append(ParentNode(tag=f"h{level}", children=children, props=None))
-        # Quote formatting
-        elif block_type == BlockType.QUOTE:
-            lines = block.split("\n")
-            stripped_lines = []
-            for line in lines:
-                if line.startswith(">"):
+def _scanned_block(lines, last, quote, unordered, ordered):
+    # The last line is only known once the block ends, and block.strip() trims its tail
+    last = last.rstrip()
+    quote = quote and last.startswith(">")
+    unordered = unordered and last.startswith("- ") and len(last) > 2
+    ordered = ordered and last.startswith(f"{len(lines) + 1}. ")
+    lines.append(last)
+
+    first = lines[0]
+    if first.startswith("```") and last.endswith("```"):
+        return BlockType.CODE, lines
+    if len(lines) == 1 and _HEADING_RE.match(first):
+        return BlockType.HEADING, lines
+    if quote:
+        return BlockType.QUOTE, lines
+    if unordered:
+        return BlockType.UNORDERED_LIST, lines
+    if ordered:
+        return BlockType.ORDERED_LIST, lines
+    return BlockType.PARAGRAPH, lines
+
+
+def iter_typed_blocks(source):
+    """Yield (BlockType, lines) for each block of a string, file or mmap in a single pass.
+
+    Each line is checked against every block kind once, as it is read, instead of
+    splitting the block again for every classifier. The result always agrees with
+    markdown_to_blocks followed by block_to_block_type; `lines` are the block's lines.
+    """
+    for _, block_type, lines in iter_numbered_blocks(source):
+        yield block_type, lines
+
+
+def iter_numbered_blocks(source):
+    """Like iter_typed_blocks, but yield (number of the block's first line, BlockType, lines)."""
+    lines: list[str] = []
+    pending = None  # newest line, held back until we know whether it is the block's last
+    quote = unordered = ordered = True
+    start = 0
+
+    for number, line in enumerate(iter_lines(source), start=1):
+        if not line or line.isspace():
+            if pending is not None:
+                yield (start, *_scanned_block(lines, pending, quote, unordered, ordered))
+                lines = []
+                pending = None
+                quote = unordered = ordered = True
+            continue
+        if pending is None:
+            pending = line.lstrip()
+            start = number
+            continue
+
+        quote = quote and pending.startswith(">")
+        unordered = unordered and pending.startswith("- ") and len(pending) > 2
+        ordered = ordered and pending.startswith(f"{len(lines) + 1}. ")
+        lines.append(pending)
+        pending = line
+
+    if pending is not None:
+        yield (start, *_scanned_block(lines, pending, quote, unordered, ordered))
+
+
+def text_to_children(text, context=None, text_nodes=None):
+    nodes = text_to_textnodes(text)
+    if text_nodes is not None:
+        text_nodes.extend(nodes)
+    return [text_node_to_html_node(node, context) for node in nodes]
+
+
+# Bump whenever rendered block HTML changes, so cached fragments from older code are ignored
+RENDERER_VERSION = "1"
+
+
+def lines_to_html_node(block_type, lines, context=None, text_nodes=None):
+    """Build the node for a block that has already been classified and split into lines.
+
+    `context` is the RenderContext that resolves link and image URLs. A `text_nodes` list
+    receives every TextNode the block is built from, for the stages that read them.
+    """
+    # Paragraph Formatting
+    if block_type == BlockType.PARAGRAPH:
+        # Strip each line, then join with a single space
+        paragraph_text = " ".join(line.strip() for line in lines)
+        children = text_to_children(paragraph_text, context, text_nodes)
+        return ParentNode(tag="p", children=children)
+    # Code Formatting
+    elif block_type == BlockType.CODE:
+        inner_lines = lines[1:-1]
+
+        # Strip leading spaces from each inner line (tests expect no indentation)
+        stripped_lines = [line.lstrip() for line in inner_lines]
+
+        # Join with a newline *between* lines, and add a final newline
+        inner_code = "\n".join(stripped_lines) + "\n"
+
+        nd = TextNode(text=inner_code, text_type=TextType.CODE)
+        if text_nodes is not None:
+            text_nodes.append(nd)
+        code_html = text_node_to_html_node(nd)
+        return ParentNode(tag="pre", children=[code_html])
+    # Heading Formatting
+    elif block_type == BlockType.HEADING:
+        block = lines[0]
+        level = 0
+        for i in block:
+            if i == "#":
+                level += 1
+            if i != "#":
+                break
+        stripped = block[level:].lstrip()
+        children = text_to_children(stripped, context, text_nodes)
+        return ParentNode(tag=f"h{level}", children=children, props=None)
+    # Quote formatting
+    elif block_type == BlockType.QUOTE:
+        stripped_lines = []
+        for line in lines:
+            if line.startswith(">"):
+                line = line[1:]
+                if line.startswith(" "):
                     line = line[1:]
-                    if line.startswith(" "):
-                        line = line[1:]
-                stripped_lines.append(line)
-
-            formatted = "\n".join(stripped_lines).strip()
-            new_nodes.append(
+            stripped_lines.append(line)
+
+        formatted = "\n".join(stripped_lines).strip()
+        return ParentNode(
+            tag="blockquote",
+            children=text_to_children(formatted, context, text_nodes),
+            props=None,
+        )
+    # UOList formatting
+    elif block_type == BlockType.UNORDERED_LIST:
+        li_nodes = []
+        for line in lines:
+            line = line.strip()
+            if line.startswith("- "):
+                item_text = line[2:]
+            elif line.startswith("* "):
+                item_text = line[2:]
+            else:
+                continue
+            children = text_to_children(item_text, context, text_nodes)
+            li_nodes.append(
                 ParentNode(
-                    tag="blockquote",
-                    children=text_to_children(formatted),
+                    tag="li",
+                    children=children,
                     props=None,
                 )
             )
-        # UOList formatting
-        elif block_type == BlockType.UNORDERED_LIST:
-            lines = block.split("\n")
-            li_nodes = []
-            for line in lines:
-                line = line.strip()
-                if line.startswith("- "):
-                    item_text = line[2:]
-                elif line.startswith("* "):
-                    item_text = line[2:]
+        return ParentNode(
+            tag="ul",
+            children=li_nodes,
+            props=None,
+        )
+
+    elif block_type == BlockType.ORDERED_LIST:
+        oli_nodes = []
+        for line in lines:
+            line = line.strip()
+            if "." in line:
+                prefix, rest = line.split(".", 1)
+                if prefix.isdigit():
+                    item_text = rest.lstrip()  # remove the space after "1."
                 else:
-                    continue
-                children = text_to_children(item_text)
-                li_nodes.append(
+                    continue  # skip malformed lines
+                children = text_to_children(item_text, context, text_nodes)
+
+                oli_nodes.append(
                     ParentNode(
                         tag="li",
                         children=children,
                         props=None,
                     )
                 )
-            new_nodes.append(
-                ParentNode(
-                    tag="ul",
-                    children=li_nodes,
-                    props=None,
-                )
-            )
-
-        elif block_type == BlockType.ORDERED_LIST:
-            lines = block.split("\n")
-            oli_nodes = []
-            for line in lines:
-                line = line.strip()
-                if "." in line:
-                    prefix, rest = line.split(".", 1)
-                    if prefix.isdigit():
-                        item_text = rest.lstrip()  # remove the space after "1."
-                    else:
-                        continue  # skip malformed lines
-                    children = text_to_children(item_text)
-
-                    oli_nodes.append(
-                        ParentNode(
-                            tag="li",
-                            children=children,
-                            props=None,
-                        )
-                    )
-            new_nodes.append(
-                ParentNode(
-                    tag="ol",
-                    children=oli_nodes,
-                    props=None,
-                )
-            )
-
-
-
+        return ParentNode(
+            tag="ol",
+            children=oli_nodes,
+            props=None,
+        )
+
+
+def _url_keys(context, text_nodes):
+    if context is None:
+        return {}
+    return context.url_keys(node.url for node in text_nodes if node.text_type in (TextType.LINK, TextType.IMAGE))
+
+
+def render_block(block_type, lines, cache=None, context=None, facts=None, line=1):
+    """Return the node for one scanned block, served from a BlockCache as raw HTML when one is given.
+
+    A minifying context serializes the block through minify.minify_chunks; with a cache the
+    minified HTML is what gets stored, so an unchanged block is never minified twice.
+    A page_facts.PageFacts given as `facts` is handed what it collects from the block's
+    TextNodes, `line` being the block's first line; the cache keeps that next to the HTML.
+    The first heading also becomes its `title`.
+    Cached HTML also keeps the url_keys of the URLs it resolved, and is only reused while
+    they still resolve the same, so a new image or asset name re-renders just its blocks.
+    """
+    minify = context is not None and context.minify
+    if facts is not None and facts.title is None and block_type is BlockType.HEADING:
+        # The page title is its first heading, as extract_title would find it
+        facts.title = "\n".join(lines).strip().lstrip("#").strip()
+    text_nodes = [] if facts is not None or cache is not None else None
+    if cache is None:
+        node = lines_to_html_node(block_type, lines, context, text_nodes)
+        if facts is not None:
+            facts.add(line, {**facts.collect(lines, text_nodes), "urls": _url_keys(context, text_nodes)})
+        if minify:
+            return LeafNode(tag=None, value="".join(minify_chunks(node.iter_html())))
+        return node
+
+    key = cache.key(block_type.value, "\n".join(lines), "" if context is None else context.cache_key)
+    entry = cache.get_entry(key, lambda meta: (facts is None or facts.covered_by(meta))
+                            and (context is None or context.urls_current(meta.get("urls"))))
+    if entry is not None and entry[0] is not None:
+        html, meta = entry
+    else:
+        node = lines_to_html_node(block_type, lines, context, text_nodes)
+        html = "".join(minify_chunks(node.iter_html())) if minify else node.to_html()
+        meta = entry[1] if entry is not None else {}
+        if facts is not None:
+            meta = {**meta, **facts.collect(lines, text_nodes)}
+        meta = {**meta, "urls": _url_keys(context, text_nodes)}
+        cache.put(key, html, meta)
+    if facts is not None:
+        facts.add(line, meta)
+    return LeafNode(tag=None, value=html)
+
+
+def markdown_to_html_node(markdown, cache=None, context=None, facts=None):
+    new_nodes: list[Any] = [
+        render_block(block_type, lines, cache, context, facts, line)
+        for line, block_type, lines in iter_numbered_blocks(markdown)
+    ]
+    return ParentNode(tag="div", children=new_nodes)
 
 
-    return ParentNode(tag="div", children=new_nodes)
+def iter_markdown_html(source, cache=None, context=None, facts=None):
+    """Yield the HTML for a markdown source one block at a time, wrapped like markdown_to_html_node.
 
+    Only the current block and its nodes are alive at any point, so memory stays flat
+    however long the document is.
+    """
+    yield "<div>"
+    for line, block_type, lines in iter_numbered_blocks(source):
+        yield from render_block(block_type, lines, cache, context, facts, line).iter_html()
+    yield "</div>"
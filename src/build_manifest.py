@@ -0,0 +1,34 @@
+import os
+
+from fs_utils import hash_file, load_state, write_json_atomic
+
+MANIFEST_VERSION = 1
+
+
+def load_manifest(manifest_path: str) -> dict:
+    # A missing or unreadable manifest just means "rebuild everything"
+    manifest = load_state(manifest_path, MANIFEST_VERSION)
+    if not manifest:
+        return {"version": MANIFEST_VERSION, "pages": {}}
+    return manifest
+
+
+def save_manifest(manifest_path: str, manifest: dict):
+    write_json_atomic(manifest_path, manifest)
+
+
+class FileHasher:
+    """Hashes files, reusing the previous digest when size and mtime are unchanged."""
+
+    def __init__(self, previous: dict | None = None):
+        self.previous = previous or {}
+
+    def stat_entry(self, path: str, stat: os.stat_result | None = None) -> dict:
+        if stat is None:
+            stat = os.stat(path)
+        old = self.previous.get(path)
+        if old is not None and "hash" in old and old.get("size") == stat.st_size and old.get("mtime_ns") == stat.st_mtime_ns:
+            digest = old["hash"]
+        else:
+            digest = hash_file(path)
+        return {"hash": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
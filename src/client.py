@@ -0,0 +1,70 @@
+"""Talk to a build daemon started with `python3 src/main.py --daemon`.
+
+    python3 src/client.py build                  # incremental build of everything
+    python3 src/client.py build content/a.md     # rebuild after these paths changed
+    python3 src/client.py status
+    python3 src/client.py stop
+
+Only the standard library is imported here, so a request costs little more than
+interpreter startup.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+
+DEFAULT_SOCKET_PATH = ".build/daemon.sock"
+COMMANDS = ("build", "status", "stop")
+
+
+def send_command(socket_path, request, timeout=None):
+    """Send one JSON request to the daemon and return its JSON reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as replies:
+            line = replies.readline()
+    if not line:
+        raise ConnectionError("daemon closed the connection without replying")
+    return json.loads(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send a command to the running build daemon.")
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("paths", nargs="*", help="changed files, for build")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help=f"daemon socket (default: {DEFAULT_SOCKET_PATH})")
+    args = parser.parse_args(argv)
+
+    request = {"command": args.command}
+    if args.paths:
+        # The daemon may run from another directory, so send absolute paths
+        request["paths"] = [os.path.abspath(path) for path in args.paths]
+    try:
+        reply = send_command(args.socket, request)
+    except OSError as e:
+        print(f"No build daemon at {args.socket}: {e}", file=sys.stderr)
+        return 2
+
+    if reply.get("log"):
+        sys.stdout.write(reply["log"])
+    if args.command == "status":
+        for key, value in sorted(reply.get("status", {}).items()):
+            print(f"{key}: {value}")
+    failures = reply.get("failures", [])
+    for from_path, error in failures:
+        print(f"Failed to generate {from_path}: {error}", file=sys.stderr)
+    if failures:
+        print(f"{len(failures)} page(s) failed", file=sys.stderr)
+    broken_links = reply.get("broken_links", [])
+    if broken_links:
+        print(f"{len(broken_links)} broken link(s) fail the build under --strict-links", file=sys.stderr)
+    if reply.get("error"):
+        print(reply["error"], file=sys.stderr)
+    return 0 if reply.get("ok") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Seeded synthetic markdown for benchmarks and differential tests."""
+import os
+import random
+
+BLOCK_KINDS = ("paragraph", "heading", "code", "quote", "unordered_list", "ordered_list")
+DEFAULT_BLOCK_MIX = {
+    "paragraph": 6,
+    "heading": 2,
+    "code": 1,
+    "quote": 1,
+    "unordered_list": 1,
+    "ordered_list": 1,
+}
+# Chance that any given word is wrapped in that inline syntax
+DEFAULT_INLINE_DENSITY = {
+    "link": 0.04,
+    "image": 0.005,
+    "bold": 0.03,
+    "italic": 0.02,
+    "code": 0.02,
+}
+
+_WORDS = (
+    "ring hobbit shire elf dwarf wizard mountain river forest road journey friend shadow light tower "
+    "king sword song tale dragon gold gate bridge lore star ancient quiet green deep long far under "
+    "over into across beyond the and of a to in is was with their"
+).split()
+_CODE_WORDS = "func main return fmt Println if else for range var let const x y z".split()
+
+
+def _inline_text(rng, word_count, inline_density):
+    words = []
+    kinds = list(inline_density.items())
+    for _ in range(word_count):
+        word = rng.choice(_WORDS)
+        for kind, chance in kinds:
+            if rng.random() < chance:
+                if kind == "link":
+                    word = f"[{word} {rng.choice(_WORDS)}](/pages/{rng.randrange(1000)})"
+                elif kind == "image":
+                    word = f"![{word}](/images/{word}.png)"
+                elif kind == "bold":
+                    word = f"**{word}**"
+                elif kind == "italic":
+                    word = f"_{word}_"
+                elif kind == "code":
+                    word = f"`{rng.choice(_CODE_WORDS)}`"
+                break
+        words.append(word)
+    return " ".join(words)
+
+
+def _block(rng, kind, inline_density):
+    if kind == "paragraph":
+        return "\n".join(_inline_text(rng, rng.randint(8, 20), inline_density) for _ in range(rng.randint(1, 4)))
+    if kind == "heading":
+        return f"{'#' * rng.randint(2, 6)} {_inline_text(rng, rng.randint(2, 6), inline_density)}"
+    if kind == "code":
+        lines = [" ".join(rng.choice(_CODE_WORDS) for _ in range(rng.randint(2, 8))) for _ in range(rng.randint(1, 8))]
+        return "```\n" + "\n".join(lines) + "\n```"
+    if kind == "quote":
+        return "\n".join(f"> {_inline_text(rng, rng.randint(4, 12), inline_density)}" for _ in range(rng.randint(1, 4)))
+    if kind == "unordered_list":
+        return "\n".join(f"- {_inline_text(rng, rng.randint(2, 10), inline_density)}" for _ in range(rng.randint(2, 8)))
+    if kind == "ordered_list":
+        return "\n".join(f"{i}. {_inline_text(rng, rng.randint(2, 10), inline_density)}"
+                         for i in range(1, rng.randint(2, 10)))
+    raise ValueError(f"unknown block kind {kind!r}")
+
+
+def generate_document(rng, blocks=40, block_mix=None, inline_density=None):
+    """Return one markdown document: a title heading followed by `blocks` random blocks."""
+    block_mix = DEFAULT_BLOCK_MIX if block_mix is None else block_mix
+    inline_density = DEFAULT_INLINE_DENSITY if inline_density is None else inline_density
+    kinds = [kind for kind in BLOCK_KINDS if block_mix.get(kind, 0) > 0]
+    weights = [block_mix[kind] for kind in kinds]
+
+    parts = [f"# {_inline_text(rng, rng.randint(2, 6), {})}"]
+    for kind in rng.choices(kinds, weights=weights, k=blocks):
+        parts.append(_block(rng, kind, inline_density))
+    return "\n\n".join(parts) + "\n"
+
+
+def generate_corpus(dest_dir, pages=100, seed=0, blocks=40, block_mix=None, inline_density=None, per_section=50):
+    """Write `pages` documents under `dest_dir` as <section>/<page>/index.md and return their paths."""
+    rng = random.Random(seed)
+    paths = []
+    for page in range(pages):
+        directory = os.path.join(dest_dir, f"section-{page // per_section}", f"page-{page}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "index.md")
+        with open(path, "w") as file:
+            file.write(generate_document(rng, blocks, block_mix, inline_density))
+        paths.append(path)
+    return paths
@@ -0,0 +1,181 @@
+"""Keep the build warm between requests.
+
+`python3 src/main.py --daemon [build options]` builds once and then waits on a Unix
+socket for the commands that src/client.py sends. The daemon keeps everything that
+is costly to rebuild: the interpreter and its imports, compiled templates, the
+inventory, the block cache connection and, with --jobs, the worker pool.
+
+Each build's output is captured into the log sent back to the client, but only what
+the daemon process itself prints: pages rendered in --jobs worker processes write
+to the daemon's own stdout, so their "Generating page" lines are not in the log.
+Failures are reported either way. --profile is not supported in daemon mode.
+"""
+import contextlib
+import io
+import json
+import os
+import socketserver
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import main as build
+from pipeline import format_peak_rss
+
+
+class BuildDaemon:
+    """Runs incremental builds for one set of build options, one build at a time."""
+
+    def __init__(self, args):
+        self.args = args
+        self.block_cache = build.open_block_cache(args)
+        self.pool = ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 else None
+        self.inventory = None
+        self.builds = 0
+        self.last_build = None
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def _refresh_pages(self, paths):
+        """Update the kept inventory for edited pages; False if it has to be rescanned."""
+        if self.inventory is None:
+            return False
+        known = {os.path.normpath(path): path for path in self.inventory.page_stats}
+        stats = {}
+        for path in paths:
+            if path in known:
+                try:
+                    stats[known[path]] = os.stat(path)
+                except OSError:
+                    return False  # deleted
+            elif path.endswith(".md"):
+                return False  # a new page
+            # Templates, layouts and .layout files are not part of the inventory
+        self.inventory.page_stats.update(stats)
+        return True
+
+    def build(self, paths=None):
+        """Build everything, or only the sides of the site that `paths` belong to.
+
+        Returns (failures, broken_links, log, seconds).
+        """
+        with self._lock:
+            start = time.perf_counter()
+            log = io.StringIO()
+            with contextlib.redirect_stdout(log):
+                assets = pages = True
+                if paths:
+                    paths = [os.path.normpath(os.path.relpath(path)) for path in paths]
+                    static_root = os.path.normpath(build.SOURCE_DIR) + os.sep
+                    assets = any(path.startswith(static_root) for path in paths)
+                    pages = any(not path.startswith(static_root) for path in paths)
+                    if assets or not self._refresh_pages(paths):
+                        self.inventory = None
+                else:
+                    self.inventory = None
+                if self.inventory is None:
+                    self.inventory = build.scan_inventory(self.args)
+                failures, broken_links = build.build_incremental(self.args, assets=assets, pages=pages,
+                                                                 block_cache=self.block_cache, found=self.inventory,
+                                                                 pool=self.pool)
+                build.close_block_cache(self.block_cache)
+                build.run_precompress(self.args)
+                build.write_deploy()
+            seconds = time.perf_counter() - start
+            self.builds += 1
+            self.last_build = {"seconds": round(seconds, 3), "failures": len(failures),
+                              "broken_links": len(broken_links), "finished": time.time()}
+            return failures, broken_links, log.getvalue(), seconds
+
+    def status(self):
+        status = {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started),
+            "builds": self.builds,
+            "building": self._lock.locked(),
+            "peak_rss": format_peak_rss(),
+        }
+        if self.last_build is not None:
+            status["last_build_seconds"] = self.last_build["seconds"]
+            status["last_build_failures"] = self.last_build["failures"]
+            status["last_build_broken_links"] = self.last_build["broken_links"]
+        if self.inventory is not None:
+            status["pages"] = len(self.inventory.pages)
+            status["static_files"] = len(self.inventory.static_files)
+        return status
+
+    def handle(self, request):
+        command = request.get("command")
+        if command == "build":
+            failures, broken_links, log, seconds = self.build(request.get("paths"))
+            return {"ok": not failures and not broken_links, "failures": failures, "broken_links": broken_links,
+                    "log": log, "seconds": round(seconds, 3)}
+        if command == "status":
+            return {"ok": True, "status": self.status()}
+        if command == "stop":
+            return {"ok": True}
+        return {"ok": False, "error": f"unknown command {command!r}"}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            reply = self.server.daemon.handle(request)
+        except Exception as e:
+            request = {}
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+        if request.get("command") == "stop":
+            # shutdown() waits for serve_forever, so it cannot run on this request's thread
+            threading.Thread(target=self.server.shutdown).start()
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, daemon):
+        self.daemon = daemon
+        super().__init__(socket_path, _Handler)
+
+
+def _remove_stale_socket(socket_path):
+    if not os.path.exists(socket_path):
+        return
+    from client import send_command
+
+    try:
+        send_command(socket_path, {"command": "status"}, timeout=1)
+    except OSError:
+        os.remove(socket_path)  # left behind by a daemon that died
+        return
+    raise RuntimeError(f"a build daemon is already listening on {socket_path}")
+
+
+def run(args, socket_path, ready=None):
+    """Build once, then serve commands on `socket_path` until a stop command arrives."""
+    directory = os.path.dirname(socket_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    _remove_stale_socket(socket_path)
+
+    daemon = BuildDaemon(args)
+    failures, broken_links, log, seconds = daemon.build()
+    print(log, end="")
+    build.report_failures(failures, broken_links)
+    try:
+        with DaemonServer(socket_path, daemon) as server:
+            print(f"Build daemon listening on {socket_path} (first build took {seconds:.2f}s)")
+            if ready is not None:
+                ready(server)
+            server.serve_forever()
+    finally:
+        daemon.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+    return 0
@@ -0,0 +1,44 @@
+import os
+import time
+
+from asset_sync import scan_static
+from build_manifest import FileHasher
+from fs_utils import load_state, write_json_atomic
+
+DEPLOY_STATE_VERSION = 1
+
+
+def write_deploy_manifest(dest_dir, state_path, manifest_path):
+    """Compare `dest_dir` with the last build's outputs and write what deploy has to move.
+
+    Only files whose size or mtime moved are hashed, so a file rewritten with the same
+    bytes is not reported. `manifest_path` gets {"added", "changed", "removed"} lists of
+    paths relative to `dest_dir`, with / separators, plus the SHA-256 of each file to upload.
+    Returns the manifest.
+    """
+    old_files = load_state(state_path, DEPLOY_STATE_VERSION).get("files", {})
+    hasher = FileHasher({os.path.join(dest_dir, path): entry for path, entry in old_files.items()})
+    files = {}
+    added = []
+    changed = []
+    for relative, entry in scan_static(dest_dir):
+        relative = relative.replace(os.sep, "/")
+        files[relative] = hasher.stat_entry(entry.path, entry.stat())
+        old = old_files.get(relative)
+        if old is None:
+            added.append(relative)
+        elif old.get("hash") != files[relative]["hash"]:
+            changed.append(relative)
+
+    manifest = {
+        "version": DEPLOY_STATE_VERSION,
+        "generated": time.time(),
+        "root": dest_dir,
+        "added": sorted(added),
+        "changed": sorted(changed),
+        "removed": sorted(path for path in old_files if path not in files),
+        "hashes": {path: files[path]["hash"] for path in sorted(added + changed)},
+    }
+    write_json_atomic(state_path, {"version": DEPLOY_STATE_VERSION, "files": files})
+    write_json_atomic(manifest_path, manifest)
+    return manifest
@@ -4,7 +4,11 @@ from typing import Any
 
 
 def extract_title(markdown: str) -> str | Any:
-    blocks = markdown_to_blocks(markdown)
+    return extract_title_from_blocks(markdown_to_blocks(markdown))
+
+
+def extract_title_from_blocks(blocks) -> str | Any:
+    # Stops at the first heading, so a streamed document is only read up to its title
     for block in blocks:
         if block_to_block_type(block) == BlockType.HEADING:
             return block.lstrip("#").strip()
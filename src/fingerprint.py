@@ -0,0 +1,75 @@
+import os
+import re
+
+from asset_sync import place_file
+from build_manifest import FileHasher
+from fs_utils import load_state, remove_output, remove_state, write_json_atomic
+
+FINGERPRINT_STATE_VERSION = 1
+FINGERPRINT_EXTENSIONS = (".css", ".js", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg", ".ico",
+                          ".woff", ".woff2")
+HASH_LENGTH = 10
+ASSET_MANIFEST_NAME = "asset-manifest.json"
+# index.3f9a1c2b4d.css
+FINGERPRINTED_RE = re.compile(rf"\.[0-9a-f]{{{HASH_LENGTH}}}\.[^./]+$")
+
+
+def fingerprinted_name(relative, digest):
+    stem, extension = os.path.splitext(relative)
+    return f"{stem}.{digest[:HASH_LENGTH]}{extension}"
+
+
+def fingerprint_assets(dest_dir, state_path, files, extensions=FINGERPRINT_EXTENSIONS, output_dirs=()):
+    """Give every asset in `files` a content-hashed twin such as index.3f9a1c2b4d.css.
+
+    `files` are the paths, relative to `dest_dir`, of the assets the build copied or made
+    there: the static inventory and image variants. Whatever else is in `dest_dir`, such as
+    files other stages generate, is left alone, so the same sources always give the same
+    twins. The originals stay where they are. Twins are hardlinks, so they cost no extra space,
+    and an asset keeps its name for as long as its bytes do not change. Twins of removed or
+    changed assets are pruned, leaving the directories in `output_dirs`. Writes
+    asset-manifest.json into `dest_dir` and returns {original site URL: fingerprinted site URL}.
+    """
+    old_files = load_state(state_path, FINGERPRINT_STATE_VERSION).get("files", {})
+    hasher = FileHasher({os.path.join(dest_dir, path): entry for path, entry in old_files.items()})
+    old_outputs = {entry.get("output") for entry in old_files.values()}
+    placed = {}
+    assets = {}
+
+    for relative in sorted(set(files)):
+        name = os.path.basename(relative)
+        if not name.lower().endswith(extensions) or FINGERPRINTED_RE.search(name):
+            continue
+        path = os.path.join(dest_dir, relative)
+        try:
+            source = hasher.stat_entry(path)
+        except OSError:
+            continue  # not placed, e.g. its copy failed
+        output = fingerprinted_name(relative, source["hash"])
+        output_path = os.path.join(dest_dir, output)
+        if not os.path.exists(output_path):
+            place_file(path, output_path, "hardlink")
+        placed[relative] = dict(source, output=output)
+        assets["/" + relative.replace(os.sep, "/")] = "/" + output.replace(os.sep, "/")
+
+    outputs = {entry["output"] for entry in placed.values()}
+    for output in old_outputs - outputs:
+        if output is not None:
+            remove_output(os.path.join(dest_dir, output), dest_dir, output_dirs)
+
+    write_json_atomic(state_path, {"version": FINGERPRINT_STATE_VERSION, "files": placed})
+    write_json_atomic(os.path.join(dest_dir, ASSET_MANIFEST_NAME), assets)
+    return assets
+
+
+def remove_fingerprints(dest_dir, state_path, output_dirs=()):
+    """Delete the twins and asset-manifest.json an earlier run wrote; returns how many twins there were."""
+    if not os.path.exists(state_path):
+        return 0
+    old_files = load_state(state_path, FINGERPRINT_STATE_VERSION).get("files", {})
+    for entry in old_files.values():
+        if entry.get("output") is not None:
+            remove_output(os.path.join(dest_dir, entry["output"]), dest_dir, output_dirs)
+    remove_output(os.path.join(dest_dir, ASSET_MANIFEST_NAME), dest_dir, output_dirs)
+    remove_state(state_path)
+    return len(old_files)
@@ -0,0 +1,135 @@
+import contextlib
+import hashlib
+import json
+import os
+
+_CHUNK_SIZE = 1 << 16
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_state(path, version):
+    """Return the JSON object saved at `path`, or {} when it is missing, unreadable or another version.
+
+    Every build stage keeps its state this way, so a format change just means starting over.
+    """
+    try:
+        with open(path, "r") as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(state, dict) or state.get("version") != version:
+        return {}
+    return state
+
+
+def remove_state(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def write_json_atomic(path, data, compact=False):
+    """Write `data` to `path` as JSON through a temp file, so an interrupted build never leaves half of it.
+
+    State is indented to keep it diffable; `compact` is for files that are served or grow large.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = temp_path_for(path)
+    with open(tmp_path, "w") as file:
+        if compact:
+            json.dump(data, file, separators=(",", ":"), sort_keys=True)
+        else:
+            json.dump(data, file, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def remove_output(dest_path, dest_dir_path, keep=()):
+    """Delete a stale output file and any directories its removal leaves empty.
+
+    Directories in `keep` (such as Inventory.output_dirs, which the build is about to write
+    into) are left in place even when empty.
+    """
+    if os.path.exists(dest_path):
+        print(f"Removing stale output {dest_path}")
+        os.remove(dest_path)
+
+    # Drop directories left empty by the removal, but never the output root itself
+    root = os.path.abspath(dest_dir_path)
+    keep = {os.path.abspath(directory) for directory in keep}
+    directory = os.path.dirname(os.path.abspath(dest_path))
+    while (directory.startswith(root + os.sep) and directory not in keep and os.path.isdir(directory)
+           and not os.listdir(directory)):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+
+
+def temp_path_for(dest_path):
+    # Same directory as the target so os.replace stays a rename on one filesystem
+    return os.path.join(os.path.dirname(dest_path), f".{os.path.basename(dest_path)}.{os.getpid()}.tmp")
+
+
+class _HashingWriter:
+    """Binary sink that hashes and counts what it passes on to `file`."""
+
+    mode = "wb"
+
+    def __init__(self, file):
+        self.file = file
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+
+def _output_hash(path, size, record):
+    """Return the SHA-256 of `path`, or None if it is missing or not `size` bytes long.
+
+    While the file keeps the size and mtime in `record`, the hash recorded there is used
+    instead of reading the file.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if stat.st_size != size:
+        return None
+    if record and record.get("size") == stat.st_size and record.get("mtime_ns") == stat.st_mtime_ns:
+        return record.get("hash")
+    return hash_file(path)
+
+
+@contextlib.contextmanager
+def open_if_changed(dest_path, record=None):
+    """Open a temp file for `dest_path` that replaces it on close only if the bytes differ.
+
+    What is written is hashed on the way through, so the temp file is never read back.
+    `record` is a dict holding the {"hash", "size", "mtime_ns"} of `dest_path` from an
+    earlier call, which saves reading an unchanged file too; it is updated to the new ones.
+    """
+    tmp_path = temp_path_for(dest_path)
+    try:
+        with open(tmp_path, "wb") as file:
+            sink = _HashingWriter(file)
+            yield sink
+        digest = sink.digest.hexdigest()
+        if _output_hash(dest_path, sink.size, record) == digest:
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, dest_path)
+        if record is not None:
+            stat = os.stat(dest_path)
+            record.update(hash=digest, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
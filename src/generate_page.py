@@ -1,51 +1,426 @@
-from block_markdown import markdown_to_html_node
-from extract_title import extract_title
+from block_markdown import iter_markdown_blocks, iter_markdown_html, markdown_to_html_node
+from build_manifest import FileHasher, load_manifest, save_manifest
+from concurrent.futures import ProcessPoolExecutor
+from extract_title import extract_title_from_blocks
+from fs_utils import open_if_changed, remove_output
+from htmlnode import write_chunks
+from inventory import scan
+from page_facts import PageFacts, body_first_line
+from pipeline import DEFAULT_MAX_INFLIGHT, run_pipeline
+from profiler import NULL_PROFILER, Profiler, TimedIterator
+from render_context import RenderContext
+from search import page_url
+from template import load_template, read_front_matter, select_template, split_front_matter
+import functools
 import os
+import sys
+import time
 
-def generate_page(basepath, from_path, template_path, dest_path):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    #
-    with open(from_path, "r") as file:
-        md_contents = file.read()
-        file.close()
+# Sources above this size are rendered block by block instead of being read whole
+STREAM_THRESHOLD = 8 * 1024 * 1024
 
-    with open(template_path, "r") as file1:
-        template = file1.read()
-        file1.close()
 
-    node = markdown_to_html_node(md_contents)
-    html = node.to_html()
-    title = extract_title(md_contents)
-    output = template.replace("{{ Title }}", title ).replace("{{ Content }}", html)
-    new_output = output.replace('href="/', f'href="{basepath}').replace('src="/', f'src="{basepath}')
+def _write_profiled(profiler, from_path, sink, template, title, node, write_stage="write"):
+    html = TimedIterator(node.iter_html())
+    filled = TimedIterator(template.iter_render(Title=title, Content=html))
 
-    directory = os.path.dirname(dest_path)
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+    blocks = sys.getallocatedblocks()
+    cpu = time.thread_time_ns()
+    start = time.perf_counter_ns()
+    write_chunks(filled, sink)
+    wall_ns = time.perf_counter_ns() - start
+    cpu_ns = time.thread_time_ns() - cpu
 
-    with open(dest_path, 'w') as f:
-        f.write(new_output)
+    # Serializing, filling the template and writing happen interleaved in one stream,
+    # so each is reported as a back-to-back span sized by its exclusive time
+    stages = [
+        ("to_html", html.wall_ns, html.cpu_ns),
+        ("template", filled.wall_ns - html.wall_ns, filled.cpu_ns - html.cpu_ns),
+        (write_stage, wall_ns - filled.wall_ns, cpu_ns - filled.cpu_ns),
+    ]
+    for name, stage_wall_ns, stage_cpu_ns in stages:
+        stage_blocks = sys.getallocatedblocks() - blocks if name == write_stage else 0
+        profiler.add_event(name, start, stage_wall_ns, stage_cpu_ns, stage_blocks, from_path, synthetic=True)
+        start += stage_wall_ns
 
 
+def _count_lines_to(file, position):
+    file.seek(0)
+    number = 1
+    while file.tell() != position:
+        file.readline()
+        number += 1
+    return number
 
 
+def _generate_page_streaming(from_path, template_path, dest_path, content_root, profiler, block_cache, context,
+                             make_dirs, facts, output):
+    with profiler.stage("page", page=from_path), profiler.stage("stream", page=from_path):
+        with open(from_path, "r") as file:
+            front_matter = read_front_matter(file)
+            body_start = file.tell()
+            template = load_template(select_template(from_path, front_matter, template_path, content_root), context)
+            print(f"Streaming page from {from_path} to {dest_path} using {template.path}")
+            if facts is not None and facts.urls is not None:
+                facts.urls.update(context.url_keys(template.urls))
 
-def generate_pages_recursive(basepath, dir_path_content, template_path, dest_dir_path):
-    files = os.listdir(dir_path_content)
-    for file in files:
-        from_path = os.path.join(dir_path_content, file)
-        if os.path.isfile(from_path):
-            if file.endswith(".md"):
-                name = file.replace(".md", ".html")
-                final_path = os.path.join(dest_dir_path, name)
+            # The title goes near the top of the template, so find it first and then rewind
+            title = extract_title_from_blocks(iter_markdown_blocks(file))
+            if facts is not None:
+                facts.title = title
+                facts.first_line = _count_lines_to(file, body_start)
+            file.seek(body_start)
 
-                generate_page(basepath=basepath, from_path=from_path, template_path=template_path, dest_path=final_path)
-            else:
-                pass
-        else:
-            generate_pages_recursive(basepath=basepath, dir_path_content=os.path.join(dir_path_content, file), template_path=template_path,
-                                     dest_dir_path=os.path.join(dest_dir_path, file))
+            if make_dirs:
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
 
+            chunks = template.iter_render(Title=title, Content=iter_markdown_html(file, block_cache, context, facts))
+            with open_if_changed(dest_path, output) as f:
+                write_chunks(chunks, f)
 
+    return front_matter
 
 
+def generate_page(basepath, from_path, template_path, dest_path, content_root=None, profiler=NULL_PROFILER,
+                  stream_threshold=STREAM_THRESHOLD, block_cache=None, context=None, make_dirs=True, facts=None,
+                  source=None, output=None, size=None):
+    """Render one markdown page to `dest_path` and return its front matter.
+
+    `template_path` is the default layout; front matter or a `.layout` file under
+    `content_root` can pick another one from the layouts/ directory next to it.
+    Sources larger than `stream_threshold` bytes are parsed and written one block at a time.
+    With a `block_cache` (a render_cache.BlockCache), unchanged blocks reuse their cached HTML.
+    `context` is the RenderContext for the build; by default one that only applies `basepath`.
+    Pass `make_dirs=False` when the output directory is known to exist (see inventory.py).
+    A page_facts.PageFacts given as `facts` collects from the page as it renders.
+    `source` is the markdown of `from_path` when the caller has already read it.
+    `output` is the fs_utils.open_if_changed record of `dest_path`, updated as it is written.
+    `size` is the size of `from_path` when the caller already knows it (see inventory.py).
+    """
+    if context is None:
+        context = RenderContext(basepath)
+    if source is None and (os.path.getsize(from_path) if size is None else size) > stream_threshold:
+        return _generate_page_streaming(from_path, template_path, dest_path, content_root, profiler, block_cache,
+                                        context, make_dirs, facts, output)
+
+    with profiler.stage("page", page=from_path):
+        if source is None:
+            with profiler.stage("read", page=from_path):
+                with open(from_path, "r") as file:
+                    source = file.read()
+        md_contents = source
+
+        front_matter, _, template, title, node = _prepare_page(from_path, dest_path, md_contents, template_path,
+                                                               content_root, profiler, block_cache, context, facts)
+        if make_dirs:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+        if profiler.enabled:
+            with open_if_changed(dest_path, output) as f:
+                _write_profiled(profiler, from_path, f, template, title, node)
+            return front_matter
+
+        # Stream the page straight into the file instead of building the whole document first
+        chunks = template.iter_render(Title=title, Content=node.iter_html())
+        with open_if_changed(dest_path, output) as f:
+            write_chunks(chunks, f)
+
+    return front_matter
+
+
+def _prepare_page(from_path, dest_path, md_contents, template_path, content_root, profiler, block_cache, context,
+                  facts=None):
+    with profiler.stage("template_load", page=from_path):
+        front_matter, body = split_front_matter(md_contents)
+        template = load_template(select_template(from_path, front_matter, template_path, content_root), context)
+    print(f"Generating page from {from_path} to {dest_path} using {template.path}")
+
+    if facts is None:
+        # Still wanted for the title, which the parse takes from the first heading it scans
+        facts = PageFacts()
+    facts.first_line = body_first_line(md_contents, body)
+    if facts.urls is not None:
+        facts.urls.update(context.url_keys(template.urls))
+    with profiler.stage("parse", page=from_path):
+        node = markdown_to_html_node(body, block_cache, context, facts)
+    if facts.title is None:
+        raise Exception("Missing Header/Title")
+    return front_matter, body, template, facts.title, node
+
+
+def generate_pages_recursive(basepath, dir_path_content, template_path, dest_dir_path, content_root=None):
+    if content_root is None:
+        content_root = dir_path_content
+    inventory = scan(dir_path_content, None, dest_dir_path)
+    inventory.make_output_dirs()
+    for from_path, final_path in inventory.pages:
+        generate_page(basepath=basepath, from_path=from_path, template_path=template_path, dest_path=final_path,
+                      content_root=content_root, make_dirs=False)
+
+
+def find_pages(dir_path_content, dest_dir_path):
+    return scan(dir_path_content, None, dest_dir_path).pages
+
+
+def _page_is_current(entry, source, dest_path, template_digest, context):
+    # Only the URLs the page uses are checked, so a changed image re-renders just the pages showing it
+    return (
+        entry is not None
+        and entry.get("hash") == source["hash"]
+        and entry.get("dest") == dest_path
+        and entry.get("template") == template_digest
+        and entry.get("basepath") == context.basepath
+        and entry.get("context") == context.cache_key
+        and context.urls_current(entry.get("urls"))
+        and os.path.exists(dest_path)
+    )
+
+
+def _template_digest(from_path, front_matter, template_path, content_root, digests):
+    path = select_template(from_path, front_matter, template_path, content_root)
+    if path not in digests:
+        try:
+            digests[path] = load_template(path).digest
+        except (OSError, ValueError):
+            # Let the render report the broken layout for each page that uses it
+            digests[path] = None
+    return digests[path]
+
+
+class PageResult:
+    """One page on its way through the render pipeline, and what rendering it reported.
+
+    It crosses into worker processes, so `source` only holds the markdown between the read-ahead
+    thread and the renderer; the rendered page goes straight to disk and never comes back.
+    """
+
+    __slots__ = ("from_path", "dest_path", "front_matter", "error", "events", "cache_hits", "cache_misses",
+                 "search", "links", "urls", "source", "output", "size")
+
+    def __init__(self, from_path, front_matter=None, error=None, events=(), dest_path=None, output=None,
+                 size=None):
+        self.from_path = from_path
+        self.dest_path = dest_path
+        self.front_matter = front_matter
+        self.error = error
+        self.events = events
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # (title, term counts) when the search index is being built
+        self.search = None
+        # [line, kind, url] when links are being checked
+        self.links = None
+        # {url: RenderContext.url_key} of every site-absolute URL on the page
+        self.urls = None
+        # Markdown read ahead for the renderer; None when the renderer reads the page itself
+        self.source = None
+        # {"hash", "size", "mtime_ns"} of the output as last written, see fs_utils.open_if_changed
+        self.output = output
+        # Source size from the inventory's stat, so the page is not stat'ed again; None if unknown
+        self.size = size
+
+
+def _read_page(result, profiler, stream_threshold):
+    try:
+        with profiler.stage("read", page=result.from_path):
+            size = os.path.getsize(result.from_path) if result.size is None else result.size
+            if size <= stream_threshold:
+                with open(result.from_path, "r") as file:
+                    result.source = file.read()
+    except OSError as e:
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _render_page_task(settings, result):
+    context, template_path, content_root, profile, cache_settings, index_search, collect_links, make_dirs = settings
+    if result.error is not None:
+        return result
+    from_path = result.from_path
+    profiler = Profiler() if profile else NULL_PROFILER
+    cache = cache_settings.open() if cache_settings is not None else None
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    # Links, search terms and used URLs are gathered from the TextNodes this render builds anyway
+    facts = PageFacts(links=collect_links, terms=index_search, urls=True)
+    try:
+        # The page is written as it renders, so no finished page is held in memory or sent back
+        result.front_matter = generate_page(basepath=context.basepath, from_path=from_path,
+                                            template_path=template_path, dest_path=result.dest_path,
+                                            content_root=content_root, profiler=profiler, block_cache=cache,
+                                            context=context, make_dirs=make_dirs, facts=facts,
+                                            source=result.source, output=result.output, size=result.size)
+        result.links = facts.links
+        result.urls = facts.urls
+        if index_search:
+            result.search = (facts.title, dict(facts.terms))
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.source = None
+    result.events = profiler.events
+    if cache is not None:
+        cache.flush()
+        result.cache_hits = cache.hits - hits
+        result.cache_misses = cache.misses - misses
+    return result
+
+
+def _render_all(context, pages, template_path, jobs, content_root, profiler=NULL_PROFILER, block_cache=None,
+                search=None, make_dirs=True, max_inflight=DEFAULT_MAX_INFLIGHT, pool=None, links=None, outputs=None,
+                page_stats=None):
+    settings = (context, template_path, content_root, profiler.enabled, block_cache, search is not None,
+                links is not None, make_dirs)
+    render = functools.partial(_render_page_task, settings)
+    page_stats = page_stats or {}
+    items = (PageResult(from_path, dest_path=dest_path, output=None if outputs is None else outputs.get(from_path, {}),
+                        size=page_stats[from_path].st_size if from_path in page_stats else None)
+             for from_path, dest_path in pages)
+
+    results = []
+    own_pool = None
+    if pool is None and jobs > 1 and len(pages) > 1:
+        pool = own_pool = ProcessPoolExecutor(max_workers=min(jobs, len(pages)))
+    if pool is None:
+        # Sources are read ahead on I/O threads while the current page renders and streams to disk
+        read = functools.partial(_read_page, profiler=profiler, stream_threshold=STREAM_THRESHOLD)
+        batch_size = 1
+    else:
+        # Workers read and write their own pages, so only paths and what rendering reported cross
+        # the process boundary. A few batches per worker keeps IPC overhead low while still
+        # balancing uneven pages, and every worker can hold one within the in-flight limit.
+        read = None
+        workers = max(jobs, 1)
+        batch_size = max(1, min(len(pages) // (workers * 4), max_inflight // workers))
+    try:
+        for result in run_pipeline(items, read, render, None, max_inflight, pool=pool, batch_size=batch_size):
+            if profiler.enabled:
+                profiler.events.extend(result.events)
+            result.events = ()
+            if block_cache is not None:
+                block_cache.hits += result.cache_hits
+                block_cache.misses += result.cache_misses
+            if search is not None and result.search is not None:
+                title, terms = result.search
+                search.add_page(result.from_path, context.resolve_url(page_url(result.dest_path, search.dest_dir)),
+                                title, terms)
+                result.search = None
+            if links is not None and result.links is not None:
+                links.add_page(result.from_path, page_url(result.dest_path, links.dest_dir), result.links)
+                result.links = None
+            if outputs is not None and result.error is None:
+                outputs[result.from_path] = result.output
+            results.append(result)
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown()
+    # Pages finish in any order; report them in the order they were given
+    order = {from_path: index for index, (from_path, _) in enumerate(pages)}
+    results.sort(key=lambda result: order[result.from_path])
+    return results
+
+
+def render_pages(basepath, pages, template_path, jobs=1, content_root=None, profiler=NULL_PROFILER,
+                 block_cache=None, context=None, search=None, make_dirs=True, max_inflight=DEFAULT_MAX_INFLIGHT,
+                 pool=None, links=None, outputs=None, page_stats=None):
+    """Render (from_path, dest_path) pairs, serially or across a pool of `jobs` processes.
+
+    Pages stream to disk as they render, with at most `max_inflight` pages in flight at once
+    (see pipeline.run_pipeline).
+    A failing page does not stop the others. Returns a list of (from_path, error) pairs.
+    `block_cache` is a render_cache.BlockCacheSettings; its hit and miss counts are updated.
+    A search.SearchIndex given as `search`, and a links.LinkChecker given as `links`, are
+    brought in line with exactly these pages.
+    `make_dirs=False` skips the per-page directory check once Inventory.make_output_dirs ran.
+    A long-lived `pool` (a ProcessPoolExecutor) is used instead of starting one for `jobs`.
+    `outputs` maps from_path to the fs_utils.open_if_changed record of its output, so
+    unchanged outputs are not read back; it is updated for every page that rendered.
+    `page_stats` (Inventory.page_stats) supplies source sizes so pages are not stat'ed again.
+    """
+    context = context or RenderContext(basepath)
+    from_paths = {from_path for from_path, _ in pages}
+    for index in (search, links):
+        if index is not None:
+            index.retain(from_paths)
+    results = _render_all(context, pages, template_path, jobs, content_root, profiler, block_cache, search,
+                          make_dirs, max_inflight, pool, links, outputs, page_stats)
+    return [(result.from_path, result.error) for result in results if result.error is not None]
+
+
+def generate_pages_incremental(basepath, dir_path_content, template_path, dest_dir_path, manifest_path, jobs=1,
+                               profiler=NULL_PROFILER, block_cache=None, context=None, search=None,
+                               inventory=None, max_inflight=DEFAULT_MAX_INFLIGHT, pool=None, links=None):
+    """Render only pages whose source, layout or render context changed since the last build.
+
+    An inventory.Inventory supplies the pages and their stats instead of a fresh walk,
+    and its output directories are assumed to exist already; removing stale outputs keeps them.
+
+    Returns the (from_path, dest_path) pairs that were rendered and the (from_path, error)
+    pairs that failed.
+    """
+    context = context or RenderContext(basepath)
+    manifest = load_manifest(manifest_path)
+    old_pages = manifest.get("pages", {})
+    hasher = FileHasher(old_pages)
+    digests = {}
+
+    # Start from the old entries so a failure part way through keeps what we still know about
+    pages = dict(old_pages)
+    manifest["pages"] = pages
+    dirty = []
+    sources = {}
+    outputs = {}
+    seen = set()
+    if inventory is None:
+        inventory = scan(dir_path_content, None, dest_dir_path)
+        inventory.make_output_dirs()
+    try:
+        for from_path, dest_path in inventory.pages:
+            seen.add(from_path)
+            source = hasher.stat_entry(from_path, inventory.page_stats.get(from_path))
+            old_entry = old_pages.get(from_path)
+            if old_entry is not None and old_entry.get("hash") == source["hash"]:
+                # Same source means same front matter, so only the directory layout can have moved
+                digest = _template_digest(from_path, old_entry.get("front_matter", {}), template_path, dir_path_content, digests)
+                indexed = all(index is None or from_path in index.pages for index in (search, links))
+                if digest is not None and indexed and _page_is_current(old_entry, source, dest_path, digest, context):
+                    continue
+
+            old_entry = pages.pop(from_path, None)
+            if old_entry is not None and old_entry.get("dest") != dest_path:
+                remove_output(old_entry["dest"], dest_dir_path, inventory.output_dirs)
+            elif old_entry is not None and "output" in old_entry:
+                outputs[from_path] = old_entry["output"]
+            sources[from_path] = source
+            dirty.append((from_path, dest_path))
+
+        results = _render_all(context, dirty, template_path, jobs, dir_path_content, profiler, block_cache, search,
+                              make_dirs=False, max_inflight=max_inflight, pool=pool, links=links, outputs=outputs,
+                              page_stats=inventory.page_stats)
+        rendered = []
+        failures = []
+        for result in results:
+            from_path = result.from_path
+            if result.error is not None:
+                failures.append((from_path, result.error))
+                continue
+            digest = _template_digest(from_path, result.front_matter, template_path, dir_path_content, digests)
+            pages[from_path] = {
+                **sources[from_path],
+                "dest": result.dest_path,
+                "template": digest,
+                "front_matter": result.front_matter,
+                "basepath": context.basepath,
+                "context": context.cache_key,
+                "urls": result.urls,
+                "output": outputs[from_path],
+            }
+            rendered.append((from_path, result.dest_path))
+
+        for from_path in [path for path in pages if path not in seen]:
+            remove_output(pages.pop(from_path)["dest"], dest_dir_path, inventory.output_dirs)
+        for index in (search, links):
+            if index is not None:
+                index.retain(seen)
+    finally:
+        save_manifest(manifest_path, manifest)
+
+    return rendered, failures
@@ -1,7 +1,56 @@
 from __future__ import annotations
 
+import io
+
+DEFAULT_BUFFER_SIZE = 1 << 16
+
+
+def _is_binary_sink(sink) -> bool:
+    if isinstance(sink, io.TextIOBase):
+        return False
+    if isinstance(sink, (io.RawIOBase, io.BufferedIOBase)):
+        return True
+    return "b" in getattr(sink, "mode", "")
+
+
+def write_chunks(chunks, sink, buffer_size=DEFAULT_BUFFER_SIZE, binary=None):
+    """Write string chunks to a text or binary sink, buffering at most ~`buffer_size` characters.
+
+    Binary sinks get UTF-8, encoded one buffer at a time.
+    """
+    if binary is None:
+        binary = _is_binary_sink(sink)
+
+    def flush(data):
+        sink.write(data.encode("utf-8") if binary else data)
+
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        if len(chunk) >= buffer_size:
+            # Oversized chunks (a huge code block, say) go out in slices so the buffer stays bounded
+            if buffer:
+                flush("".join(buffer))
+                buffer = []
+                size = 0
+            for start in range(0, len(chunk), buffer_size):
+                flush(chunk[start:start + buffer_size])
+            continue
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            flush("".join(buffer))
+            buffer = []
+            size = 0
+    if buffer:
+        flush("".join(buffer))
+
 
 class HTMLNode:
+    # Pages build hundreds of thousands of nodes, so skip the per-instance __dict__.
+    # Nodes without attributes keep props=None, which props_to_html treats as empty.
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -11,6 +60,25 @@ class HTMLNode:
     def to_html(self):
         raise NotImplementedError
 
+    def iter_html(self):
+        """Yield this node's HTML as fragments, walking the tree with a stack instead of recursion."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                yield node
+            elif isinstance(node, ParentNode):
+                node._check()
+                yield f"<{node.tag}{node.props_to_html()}>"
+                stack.append(f"</{node.tag}>")
+                stack.extend(reversed(node.children))
+            else:
+                yield node.to_html()
+
+    def write_html(self, sink, buffer_size=DEFAULT_BUFFER_SIZE):
+        """Stream this node's HTML into an open text or binary file-like object."""
+        write_chunks(self.iter_html(), sink, buffer_size)
+
     def props_to_html(self):
         if self.props is None:
             return ""
@@ -30,6 +98,8 @@ def text_node_to_html(text_node):
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
        super().__init__(tag, value, None, props)
     
@@ -46,16 +116,17 @@ class LeafNode(HTMLNode):
         return f"LeafNode({self.tag}, {self.value}, {self.props})"
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
+    def _check(self):
         if self.tag is None:
             raise ValueError("invalid HTML: no tag")
         if self.children is None:
             raise ValueError("invalid HTML: no children")
-        children_html = ""
-        for child in self.children:
-            children_html += child.to_html()
-        return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"
+
+    def to_html(self):
+        return "".join(self.iter_html())
 
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from asset_sync import place_file, scan_static
+from build_manifest import FileHasher
+from fs_utils import load_state, remove_output, remove_state, write_json_atomic
+
+try:
+    from PIL import Image
+except ImportError:  # optional, images are copied as they are without it
+    Image = None
+
+IMAGE_STATE_VERSION = 1
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+DEFAULT_WIDTHS = (480, 960, 1600)
+DEFAULT_FORMAT = "webp"
+DEFAULT_QUALITY = 80
+DEFAULT_SIZES = "100vw"
+_FORMATS = {"webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg"), "png": ("PNG", ".png")}
+IMAGE_FORMATS = tuple(_FORMATS)
+
+
+class ImageSettings:
+    """Widths and encoding for responsive variants; part of every cache key."""
+
+    def __init__(self, widths=DEFAULT_WIDTHS, image_format=DEFAULT_FORMAT, quality=DEFAULT_QUALITY,
+                 sizes=DEFAULT_SIZES):
+        if image_format not in _FORMATS:
+            raise ValueError(f"unknown image format {image_format!r}, expected one of {IMAGE_FORMATS}")
+        self.widths = tuple(sorted(set(widths)))
+        self.image_format = image_format
+        self.quality = quality
+        self.sizes = sizes
+
+    @property
+    def extension(self):
+        return _FORMATS[self.image_format][1]
+
+    def cache_key(self, source_hash):
+        digest = hashlib.sha256()
+        digest.update(json.dumps([source_hash, self.widths, self.image_format, self.quality]).encode())
+        return digest.hexdigest()[:32]
+
+
+def _make_variants(src_path, entry_dir, widths, image_format, quality, extension):
+    """Resize one image to every width narrower than it into `entry_dir`.
+
+    widths.json records the widths made and the original's own width, which the srcset needs.
+    Returns that record.
+    """
+    os.makedirs(entry_dir, exist_ok=True)
+    made = []
+    with Image.open(src_path) as image:
+        image.load()
+        if image_format == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        for width in widths:
+            # Never upscale; the original already covers anything wider
+            if width >= image.width:
+                continue
+            height = max(1, round(image.height * width / image.width))
+            variant = image.resize((width, height), Image.LANCZOS)
+            path = os.path.join(entry_dir, f"{width}{extension}")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            variant.save(tmp_path, _FORMATS[image_format][0], quality=quality, optimize=True)
+            os.replace(tmp_path, path)
+            made.append(width)
+        record = {"widths": made, "original": image.width}
+    with open(os.path.join(entry_dir, "widths.json"), "w") as file:
+        json.dump(record, file)
+    return record
+
+
+def _cached_widths(entry_dir):
+    try:
+        with open(os.path.join(entry_dir, "widths.json"), "r") as file:
+            record = json.load(file)
+    except (OSError, ValueError):
+        return None
+    # A bare list of widths was written before the original's width was kept; make it again
+    return record if isinstance(record, dict) else None
+
+
+def build_image_variants(source_dir, dest_dir, cache_dir, state_path, settings=None, jobs=1, files=None,
+                         output_dirs=()):
+    """Make responsive variants of every image under `source_dir` and place them in `dest_dir`.
+
+    Variants are cached under `cache_dir` by source hash and settings, so an image is only
+    resized again when it or the settings change, and resizing runs across `jobs` processes.
+    `files` is a list of (relative path, DirEntry) from an inventory.Inventory, used instead of
+    walking `source_dir`, and pruning stale variants never removes one of its `output_dirs`.
+    Returns {site URL of original: [(site URL of variant, width), ...]} for the renderer, the
+    original itself last with its own width: once a srcset has w descriptors browsers ignore
+    `src`, so without it wide and high-density screens would be capped at the largest variant.
+    """
+    settings = settings or ImageSettings()
+    if Image is None:
+        print("Pillow is not installed; skipping responsive image variants")
+        return {}
+
+    state = load_state(state_path, IMAGE_STATE_VERSION)
+    old_outputs = state.get("outputs", {})
+    hasher = FileHasher({os.path.join(source_dir, path): entry for path, entry in state.get("sources", {}).items()})
+    sources = {}
+    pending = {}
+    for relative, entry in scan_static(source_dir) if files is None else files:
+        if not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        sources[relative] = hasher.stat_entry(entry.path, entry.stat())
+        entry_dir = os.path.join(cache_dir, settings.cache_key(sources[relative]["hash"]))
+        if _cached_widths(entry_dir) is None:
+            pending[relative] = (entry.path, entry_dir)
+
+    if pending:
+        args = [(src, entry_dir, settings.widths, settings.image_format, settings.quality, settings.extension)
+                for src, entry_dir in pending.values()]
+        if jobs > 1 and len(args) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                list(pool.map(_make_variants, *zip(*args)))
+        else:
+            for arg in args:
+                _make_variants(*arg)
+
+    variants = {}
+    # output path -> cache key it was placed from
+    outputs = {}
+    for relative, source in sorted(sources.items()):
+        key = settings.cache_key(source["hash"])
+        entry_dir = os.path.join(cache_dir, key)
+        stem = os.path.splitext(relative)[0]
+        cached = _cached_widths(entry_dir) or {"widths": []}
+        urls = []
+        for width in cached["widths"]:
+            output = f"{stem}-{width}w{settings.extension}"
+            dest_path = os.path.join(dest_dir, output)
+            if old_outputs.get(output) != key or not os.path.exists(dest_path):
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                place_file(os.path.join(entry_dir, f"{width}{settings.extension}"), dest_path, "hardlink")
+            outputs[output] = key
+            urls.append(("/" + output.replace(os.sep, "/"), width))
+        if urls:
+            url = "/" + relative.replace(os.sep, "/")
+            variants[url] = urls + [(url, cached["original"])]
+
+    for output in old_outputs:
+        if output not in outputs:
+            remove_output(os.path.join(dest_dir, output), dest_dir, output_dirs)
+
+    write_json_atomic(state_path, {"version": IMAGE_STATE_VERSION, "sources": sources, "outputs": outputs})
+    return variants
+
+
+def remove_image_variants(dest_dir, state_path, output_dirs=()):
+    """Delete the variants an earlier run placed in `dest_dir`; the cache is kept. Returns how many."""
+    outputs = load_state(state_path, IMAGE_STATE_VERSION).get("outputs", {})
+    for output in outputs:
+        remove_output(os.path.join(dest_dir, output), dest_dir, output_dirs)
+    remove_state(state_path)
+    return len(outputs)
@@ -0,0 +1,78 @@
+import os
+from fnmatch import fnmatch
+
+
+def _ignored(relative, name, ignore):
+    relative = relative.replace(os.sep, "/")
+    return any(fnmatch(name, pattern) or fnmatch(relative, pattern) for pattern in ignore)
+
+
+def _page_name(name):
+    return name.replace(".md", ".html")
+
+
+class Inventory:
+    """Everything the build reads and writes, found by one os.scandir walk of each tree.
+
+    `pages` holds (from_path, dest_path) pairs in the order find_pages always used,
+    `page_stats` the stat of each source, and `static_files` (relative path, DirEntry)
+    pairs whose DirEntry keeps its stat. `output_dirs` is every directory the build
+    writes into, so they can be created once instead of checked per file.
+    """
+
+    def __init__(self, dest_dir):
+        self.dest_dir = dest_dir
+        self.pages = []
+        self.page_stats = {}
+        self.static_files = []
+        self.output_dirs = {os.path.normpath(dest_dir)}
+
+    def _scan_content(self, content_dir, dest_dir, relative_dir, ignore):
+        with os.scandir(content_dir) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        for entry in entries:
+            relative = os.path.join(relative_dir, entry.name)
+            if _ignored(relative, entry.name, ignore):
+                continue
+            if entry.is_dir():
+                self._scan_content(entry.path, os.path.join(dest_dir, entry.name), relative, ignore)
+            elif entry.name.endswith(".md"):
+                self.pages.append((entry.path, os.path.join(dest_dir, _page_name(entry.name))))
+                self.page_stats[entry.path] = entry.stat()
+                self.output_dirs.add(os.path.normpath(dest_dir))
+
+    def _scan_static(self, static_dir, ignore):
+        stack = [""]
+        while stack:
+            relative_dir = stack.pop()
+            with os.scandir(os.path.join(static_dir, relative_dir)) as entries:
+                for entry in entries:
+                    relative = os.path.join(relative_dir, entry.name)
+                    if entry.name.startswith(".") or _ignored(relative, entry.name, ignore):
+                        continue
+                    if entry.is_dir():
+                        stack.append(relative)
+                    elif entry.is_file():
+                        entry.stat()  # cached on the entry for every later stage
+                        self.static_files.append((relative, entry))
+                        self.output_dirs.add(os.path.normpath(os.path.join(self.dest_dir, relative_dir)))
+
+    def make_output_dirs(self):
+        """Create every output directory; parents sort before their children."""
+        for directory in sorted(self.output_dirs):
+            os.makedirs(directory, exist_ok=True)
+
+
+def scan(content_dir, static_dir, dest_dir, ignore=()):
+    """Walk `content_dir` and `static_dir` once and return their Inventory.
+
+    `ignore` is a list of glob patterns matched against each entry's name and its path
+    relative to the tree root; an ignored directory is not descended into. Hidden files
+    under `static_dir` are always skipped, as scan_static does.
+    """
+    inventory = Inventory(dest_dir)
+    if content_dir is not None and os.path.isdir(content_dir):
+        inventory._scan_content(content_dir, dest_dir, "", ignore)
+    if static_dir is not None and os.path.isdir(static_dir):
+        inventory._scan_static(static_dir, ignore)
+    return inventory
@@ -0,0 +1,75 @@
+import os
+import posixpath
+import re
+from urllib.parse import unquote
+
+from fs_utils import load_state, write_json_atomic
+
+# 2: links come from the rendered TextNodes
+LINK_STATE_VERSION = 2
+_SCHEME_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+
+def output_targets(inventory):
+    """Every site path (relative, with / separators) the build writes for `inventory`."""
+    targets = {
+        os.path.relpath(dest_path, inventory.dest_dir).replace(os.sep, "/") for _, dest_path in inventory.pages
+    }
+    targets.update(relative.replace(os.sep, "/") for relative, _ in inventory.static_files)
+    return targets
+
+
+def resolve_target(url, page_url, basepath="/"):
+    """Map a link on the page served at `page_url` to the site paths that would satisfy it.
+
+    Returns None for links that are not checked (external, fragment only, other schemes)
+    and () for links that leave the site, such as relative links climbing above `basepath`.
+    """
+    path = url.split("#", 1)[0].split("?", 1)[0]
+    if not path or path.startswith("//") or _SCHEME_RE.match(path):
+        return None
+    path = unquote(path)
+    directory = path.endswith("/")
+    if not path.startswith("/"):
+        # The browser resolves relative links against the served URL, basepath included
+        served = basepath + page_url.lstrip("/")
+        joined = posixpath.normpath((served if served.endswith("/") else posixpath.dirname(served) + "/") + path)
+        if not (joined + "/").startswith(basepath):
+            return ()
+        path = joined[len(basepath) - 1:]
+    # Site-absolute links are put under the basepath by RenderContext.resolve_url
+    site_path = posixpath.normpath(path).lstrip("/")
+    if site_path in ("", "."):
+        return ("index.html",)
+    if directory:
+        return (site_path + "/index.html",)
+    return site_path, site_path + "/index.html", site_path + ".html"
+
+
+class LinkChecker:
+    """Links found on every page, kept between builds so unchanged pages are checked too."""
+
+    def __init__(self, state_path, dest_dir):
+        self.state_path = state_path
+        self.dest_dir = dest_dir
+        self.pages = load_state(state_path, LINK_STATE_VERSION).get("pages", {})
+
+    def add_page(self, from_path, url, links):
+        self.pages[from_path] = {"url": url, "links": links}
+
+    def retain(self, from_paths):
+        for from_path in [path for path in self.pages if path not in from_paths]:
+            del self.pages[from_path]
+
+    def check(self, targets, basepath="/"):
+        """Return (from_path, line, kind, url) for each link whose target is not in `targets`."""
+        broken = []
+        for from_path, page in sorted(self.pages.items()):
+            for line, kind, url in page["links"]:
+                candidates = resolve_target(url, page["url"], basepath)
+                if candidates is not None and not any(candidate in targets for candidate in candidates):
+                    broken.append((from_path, line, kind, url))
+        return broken
+
+    def save(self):
+        write_json_atomic(self.state_path, {"version": LINK_STATE_VERSION, "pages": self.pages}, compact=True)
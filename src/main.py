@@ -1,72 +1,473 @@
-import shutil, os, sys
+import argparse
+import os, sys
 
-from generate_page import generate_pages_recursive
+from asset_sync import LINK_MODES, scan_static, sync_static
+from build_manifest import load_manifest, save_manifest
+from fs_utils import remove_output
+from deploy import write_deploy_manifest
+from fingerprint import fingerprint_assets, remove_fingerprints
+from generate_page import generate_pages_incremental, render_pages
+import inventory
+from images import DEFAULT_FORMAT, DEFAULT_QUALITY, DEFAULT_SIZES, DEFAULT_WIDTHS, IMAGE_FORMATS, ImageSettings, \
+    build_image_variants, remove_image_variants
+from block_markdown import RENDERER_VERSION
+from client import DEFAULT_SOCKET_PATH
+from precompress import MIN_SIZE, precompress, remove_precompressed
+from pipeline import DEFAULT_MAX_INFLIGHT, format_peak_rss
+from profiler import NULL_PROFILER, Profiler
+from render_cache import BlockCacheSettings
+from render_context import RenderContext
+from links import LinkChecker, output_targets
+from minify import MinifyCache
+from search import SearchIndex
+from template import LAYOUTS_DIR
 
 SOURCE_DIR = "static/"
 DEST_DIR = "docs/"
+CONTENT_DIR = "content/"
+TEMPLATE_PATH = "template.html"
+MANIFEST_PATH = ".build/manifest.json"
+ASSET_STATE_PATH = ".build/assets.json"
+TRACE_PATH = ".build/trace.json"
+BLOCK_CACHE_PATH = ".build/blocks.sqlite"
+PRECOMPRESS_STATE_PATH = ".build/compressed.json"
+IMAGE_CACHE_DIR = ".build/images"
+IMAGE_STATE_PATH = ".build/images.json"
+FINGERPRINT_STATE_PATH = ".build/fingerprints.json"
+SEARCH_STATE_PATH = ".build/search.json"
+LINK_STATE_PATH = ".build/links.json"
+OUTPUT_STATE_PATH = ".build/outputs.json"
+DEPLOY_MANIFEST_PATH = ".build/deploy.json"
+MINIFY_CACHE_DIR = ".build/minify"
 PORT = 8888
-basepath = ''
-if len(sys.argv) > 1:
-    basepath = sys.argv[1]
-else:
-    basepath = '/'
 
 
-def main():
-    copy_src_to_public(SOURCE_DIR, DEST_DIR, True)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static site from content/ into docs/.")
+    parser.add_argument("basepath", nargs="?", default="/", help="URL prefix the site is served under (default: /)")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="keep docs/ and only re-render pages whose source, layout or basepath changed",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="render pages across N worker processes (default: 1)",
+    )
+    parser.add_argument(
+        "--max-inflight",
+        type=int,
+        default=DEFAULT_MAX_INFLIGHT,
+        metavar="N",
+        help=f"pages held in memory between reading and writing (default: {DEFAULT_MAX_INFLIGHT})",
+    )
+    parser.add_argument(
+        "--link-mode",
+        choices=LINK_MODES,
+        default="auto",
+        help="how changed static files are placed in docs/: reflink/copy_file_range with a copy fallback (auto), "
+             "plain copies, hardlinks or reflinks (default: auto)",
+    )
+    parser.add_argument(
+        "--hash-assets",
+        action="store_true",
+        help="compare static files with their copies in docs/ by content hash instead of size and mtime",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=f"build incrementally, serve docs/ on port {PORT} and rebuild with live reload when sources change",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=TRACE_PATH,
+        metavar="TRACE",
+        help=f"record per-page, per-stage timings to a Chrome/Perfetto trace (default: {TRACE_PATH})",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="how many of the slowest pages --profile lists (default: 10)",
+    )
+    parser.add_argument(
+        "--block-cache",
+        nargs="?",
+        const=BLOCK_CACHE_PATH,
+        metavar="PATH",
+        help=f"reuse rendered HTML for unchanged markdown blocks across builds (default: {BLOCK_CACHE_PATH})",
+    )
+    parser.add_argument(
+        "--block-cache-size",
+        type=int,
+        default=256,
+        metavar="MB",
+        help="evict least recently used blocks once the cache grows past this size (default: 256)",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="after the build, write .gz (and .br with brotli installed) siblings for HTML, CSS, SVG and JSON",
+    )
+    parser.add_argument(
+        "--precompress-min-size",
+        type=int,
+        default=MIN_SIZE,
+        metavar="BYTES",
+        help=f"skip files smaller than this when precompressing (default: {MIN_SIZE})",
+    )
+    parser.add_argument(
+        "--images",
+        action="store_true",
+        help="make resized variants of static images (needs Pillow) and give <img> tags a srcset",
+    )
+    parser.add_argument(
+        "--image-widths",
+        type=lambda value: tuple(int(width) for width in value.split(",")),
+        default=DEFAULT_WIDTHS,
+        metavar="W,W,...",
+        help=f"variant widths in pixels (default: {','.join(map(str, DEFAULT_WIDTHS))})",
+    )
+    parser.add_argument(
+        "--image-format",
+        choices=IMAGE_FORMATS,
+        default=DEFAULT_FORMAT,
+        help=f"encoding for image variants (default: {DEFAULT_FORMAT})",
+    )
+    parser.add_argument(
+        "--image-quality",
+        type=int,
+        default=DEFAULT_QUALITY,
+        metavar="Q",
+        help=f"encoder quality for image variants (default: {DEFAULT_QUALITY})",
+    )
+    parser.add_argument(
+        "--image-sizes",
+        default=DEFAULT_SIZES,
+        metavar="SIZES",
+        help=f"sizes attribute for images with variants (default: {DEFAULT_SIZES})",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="give static assets content-hashed names (index.3f9a1c2b4d.css) and point pages and templates at them",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="build a sharded full-text search index into docs/search/",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help=f"after the build, serve docs/ on port {PORT} with the bundled asyncio server",
+    )
+    parser.add_argument(
+        "--ignore",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="skip content and static files matching GLOB (name or relative path); repeatable",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="minify page HTML as it is rendered and CSS as it is copied",
+    )
+    parser.add_argument(
+        "--strict-links",
+        action="store_true",
+        help="fail the build when a page links to a page or file the build does not produce",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="build, then keep caches warm and take build/status/stop commands from src/client.py",
+    )
+    parser.add_argument(
+        "--socket",
+        default=DEFAULT_SOCKET_PATH,
+        metavar="PATH",
+        help=f"Unix socket the --daemon listens on (default: {DEFAULT_SOCKET_PATH})",
+    )
+    args = parser.parse_args(argv)
+    if args.daemon and args.profile:
+        # A trace covers one build, and the daemon's builds never finish the process that would write it
+        parser.error("--profile cannot be used with --daemon")
+    return args
 
-    generate_pages_recursive(basepath=basepath, dir_path_content="content/", template_path="template.html", dest_dir_path=DEST_DIR)
 
+def scan_inventory(args, profiler=NULL_PROFILER):
+    """Walk content/ and static/ once and create every output directory up front."""
+    with profiler.stage("inventory"):
+        found = inventory.scan(CONTENT_DIR, SOURCE_DIR, DEST_DIR, args.ignore)
+        found.make_output_dirs()
+    return found
 
-def copy_src_to_public(source_dir: str, destination_dir: str, clean_dir: bool):
-    if clean_dir:
-        if os.path.exists(destination_dir):
-            shutil.rmtree(path=DEST_DIR)
-            os.mkdir(path=DEST_DIR)
 
-        else:
-            os.mkdir(path=DEST_DIR)
+def prune_disabled_stages(args, found, profiler=NULL_PROFILER):
+    """Remove what optional stages wrote into docs/ on earlier builds when they are now switched off.
 
+    docs/ is kept between builds, so without this a .gz sibling, search shard or fingerprinted
+    twin from an older build would be deployed next to the pages that replaced it.
+    """
+    stages = [
+        ("--precompress", args.precompress, lambda: remove_precompressed(DEST_DIR, PRECOMPRESS_STATE_PATH)),
+        ("--images", args.images, lambda: remove_image_variants(DEST_DIR, IMAGE_STATE_PATH, found.output_dirs)),
+        ("--fingerprint", args.fingerprint,
+         lambda: remove_fingerprints(DEST_DIR, FINGERPRINT_STATE_PATH, found.output_dirs)),
+        ("--search", args.search, lambda: SearchIndex(SEARCH_STATE_PATH, DEST_DIR).remove()),
+    ]
+    with profiler.stage("prune_disabled"):
+        for flag, enabled, remove in stages:
+            removed = 0 if enabled else remove()
+            if removed:
+                print(f"Removed {removed} output(s) left by {flag}, which is now off")
 
-    #get contents
-    disc_dirs = os.listdir(source_dir)
-    child_paths = []
-    #iterate over list files/dirs
-    for item in disc_dirs:
-        if item.startswith("."):
-            pass
-        else:
-            is_file = os.path.isfile(f"{source_dir}/{item}")
-            if is_file:
-                src_path = f"{source_dir}{item}"
-                dest_path = f"{destination_dir}{item}"
-                shutil.copy(src_path, dest_path)
-            elif not is_file:
-                target_dir = f"{destination_dir}{item}"
-                existing_dir = f"{source_dir}{item}"
-                try:
-                    os.mkdir(target_dir)
-                except FileExistsError:
-                    print(f"Directory '{target_dir}' already exists.")
-                except OSError as e:
-                    print(f"Error creating directory: {e}")
 
-                child_paths.append(f"{existing_dir}/")
+def render_context(args, profiler=NULL_PROFILER, found=None):
+    """Run the build stages whose output the renderer needs, then return the RenderContext."""
+    images = {}
+    if args.images:
+        settings = ImageSettings(args.image_widths, args.image_format, args.image_quality, args.image_sizes)
+        with profiler.stage("images"):
+            images = build_image_variants(SOURCE_DIR, DEST_DIR, IMAGE_CACHE_DIR, IMAGE_STATE_PATH, settings,
+                                          jobs=args.jobs, files=found.static_files if found else None,
+                                          output_dirs=found.output_dirs if found else ())
+        print(f"Responsive images: {len(images)} image(s) with variants")
+    assets = {}
+    if args.fingerprint:
+        with profiler.stage("fingerprint"):
+            # Only what was copied from static/ or made from it, never files other stages write to docs/
+            static_files = found.static_files if found else scan_static(SOURCE_DIR)
+            files = [relative for relative, _ in static_files]
+            files.extend(url[1:].replace("/", os.sep) for variants in images.values() for url, _ in variants)
+            assets = fingerprint_assets(DEST_DIR, FINGERPRINT_STATE_PATH, files,
+                                        output_dirs=found.output_dirs if found else ())
+        print(f"Fingerprinted {len(assets)} asset(s)")
+    return RenderContext(args.basepath, images=images, image_sizes=args.image_sizes, assets=assets,
+                         minify=args.minify)
+
+
+def open_block_cache(args):
+    if not args.block_cache:
+        return None
+    return BlockCacheSettings(args.block_cache, RENDERER_VERSION, args.block_cache_size * 1024 * 1024)
+
+
+def close_block_cache(block_cache):
+    if block_cache is None:
+        return
+    evicted = block_cache.open().evict()
+    print(block_cache.summary() + (f", evicted {evicted} block(s)" if evicted else ""))
+    block_cache.hits = block_cache.misses = 0
+
+
+def report_failures(failures, broken_links=()):
+    """Print the pages that failed to render and return the exit status.
+
+    `broken_links` are what check_links found under --strict-links. They were listed as the
+    links were checked, so here they only fail the build with their own count.
+    """
+    for from_path, error in failures:
+        print(f"Failed to generate {from_path}: {error}", file=sys.stderr)
+    if failures:
+        print(f"{len(failures)} page(s) failed", file=sys.stderr)
+    if broken_links:
+        print(f"{len(broken_links)} broken link(s) fail the build under --strict-links", file=sys.stderr)
+    return 1 if failures or broken_links else 0
+
+
+def open_search(args):
+    return SearchIndex(SEARCH_STATE_PATH, DEST_DIR) if args.search else None
+
+
+def write_search(search, profiler=NULL_PROFILER):
+    if search is None:
+        return
+    with profiler.stage("search_index"):
+        written = search.write()
+    print(f"Search index: {len(search.pages)} page(s), {written} shard(s) written")
+
+
+def check_links(args, links, found, profiler=NULL_PROFILER):
+    """Report links to paths the build does not produce.
+
+    Returns the broken (from_path, line, kind, url) under --strict-links, when they fail the build.
+    """
+    with profiler.stage("check_links"):
+        broken = links.check(output_targets(found), RenderContext(args.basepath).basepath)
+        links.save()
+    for from_path, line, kind, url in broken:
+        print(f"{from_path}:{line}: broken {kind} {url}")
+    if broken:
+        print(f"{len(broken)} broken link(s)")
+    if not args.strict_links:
+        return []
+    return broken
 
-    if child_paths:
-        for path in range(len(child_paths)):
-            formatted = child_paths[path].split("/")
-            copy_src_to_public(f"{child_paths[path]}/", f"{destination_dir}{formatted[-2]}/", clean_dir=False)
 
+def run_precompress(args, profiler=NULL_PROFILER):
+    if not args.precompress:
+        return
+    with profiler.stage("precompress"):
+        counts = precompress(DEST_DIR, PRECOMPRESS_STATE_PATH, args.precompress_min_size, jobs=max(4, args.jobs))
+    print("Precompressed files: " + ", ".join(f"{count} {outcome}" for outcome, count in sorted(counts.items())))
 
 
+def write_deploy(profiler=NULL_PROFILER):
+    with profiler.stage("deploy_manifest"):
+        manifest = write_deploy_manifest(DEST_DIR, OUTPUT_STATE_PATH, DEPLOY_MANIFEST_PATH)
+    print(f"Deploy manifest: {len(manifest['added'])} added, {len(manifest['changed'])} changed, "
+          f"{len(manifest['removed'])} removed ({DEPLOY_MANIFEST_PATH})")
 
 
+def sync_assets(args, found, profiler=NULL_PROFILER):
+    with profiler.stage("copy_static"):
+        counts = sync_static(SOURCE_DIR, DEST_DIR, ASSET_STATE_PATH, link_mode=args.link_mode,
+                             use_hash=args.hash_assets, jobs=max(4, args.jobs), files=found.static_files,
+                             output_dirs=found.output_dirs,
+                             minifier=MinifyCache(MINIFY_CACHE_DIR) if args.minify else None)
+    print("Static files: " + ", ".join(f"{count} {outcome}" for outcome, count in sorted(counts.items())))
+
+
+def build_incremental(args, assets=True, pages=True, profiler=NULL_PROFILER, block_cache=None, found=None,
+                      pool=None):
+    """Bring docs/ up to date; returns (pages that failed, broken links that fail the build)."""
+    if found is None:
+        found = scan_inventory(args, profiler)
+    prune_disabled_stages(args, found, profiler)
+    failures = []
+    links = LinkChecker(LINK_STATE_PATH, DEST_DIR)
+    if assets:
+        sync_assets(args, found, profiler)
+        # Pages carry asset names and image variants, so they have to follow asset changes
+        pages = pages or args.fingerprint or args.images
+    if pages:
+        search = open_search(args)
+        rendered, failures = generate_pages_incremental(
+            basepath=args.basepath,
+            dir_path_content=CONTENT_DIR,
+            template_path=TEMPLATE_PATH,
+            dest_dir_path=DEST_DIR,
+            manifest_path=MANIFEST_PATH,
+            jobs=args.jobs,
+            max_inflight=args.max_inflight,
+            profiler=profiler,
+            block_cache=block_cache,
+            context=render_context(args, profiler, found),
+            search=search,
+            inventory=found,
+            pool=pool,
+            links=links,
+        )
+        print(f"Incremental build rendered {len(rendered)} page(s)")
+        write_search(search, profiler)
+    # Unchanged pages are checked too, so removing a page or file flags the links to it
+    return failures, check_links(args, links, found, profiler)
+
+
+def watch(args):
+    from watch import start_server, watch_changes
+
+    block_cache = open_block_cache(args)
+    report_failures(*build_incremental(args, block_cache=block_cache))
+    close_block_cache(block_cache)
+    server, livereload = start_server(DEST_DIR, PORT)
+    print(f"Serving {DEST_DIR} on http://localhost:{PORT}/ and watching for changes")
+
+    layouts_dir = os.path.join(os.path.dirname(TEMPLATE_PATH), LAYOUTS_DIR)
+    static_root = os.path.normpath(SOURCE_DIR) + os.sep
+    try:
+        for changed in watch_changes([CONTENT_DIR, SOURCE_DIR, TEMPLATE_PATH, layouts_dir]):
+            # Only the side that changed gets rebuilt; the manifests narrow it down to single files
+            assets = any(os.path.normpath(path).startswith(static_root) for path in changed)
+            pages = any(not os.path.normpath(path).startswith(static_root) for path in changed)
+            report_failures(*build_incremental(args, assets=assets, pages=pages, block_cache=block_cache))
+            close_block_cache(block_cache)
+            livereload.notify()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    return 0
+
+
+def build_full(args, profiler=NULL_PROFILER, block_cache=None):
+    # Every page is rendered again, but docs/ is kept: unchanged outputs are not rewritten,
+    # so their mtimes survive for rsync and the deploy manifest
+    manifest = load_manifest(MANIFEST_PATH)
+    found = scan_inventory(args, profiler)
+    prune_disabled_stages(args, found, profiler)
+    sync_assets(args, found, profiler)
+    destinations = {dest_path for _, dest_path in found.pages}
+    for entry in manifest["pages"].values():
+        if entry.get("dest") not in destinations:
+            remove_output(entry["dest"], DEST_DIR, found.output_dirs)
+    # Without a hash the next incremental build renders these again, but it knows their outputs;
+    # the recorded output hashes spare reading back pages that render the same bytes
+    page_dests = dict(found.pages)
+    outputs = {from_path: entry["output"] for from_path, entry in manifest["pages"].items()
+               if "output" in entry and entry.get("dest") == page_dests.get(from_path)}
+    manifest["pages"] = {from_path: {"dest": dest_path} for from_path, dest_path in found.pages}
+    save_manifest(MANIFEST_PATH, manifest)
+
+    context = render_context(args, profiler, found)
+    search = open_search(args)
+    links = LinkChecker(LINK_STATE_PATH, DEST_DIR)
+    failures = render_pages(args.basepath, found.pages, TEMPLATE_PATH, jobs=args.jobs, content_root=CONTENT_DIR,
+                            profiler=profiler, block_cache=block_cache, context=context, search=search,
+                            make_dirs=False, max_inflight=args.max_inflight, links=links, outputs=outputs,
+                            page_stats=found.page_stats)
+    for from_path, output in outputs.items():
+        if from_path in manifest["pages"]:
+            manifest["pages"][from_path]["output"] = output
+    save_manifest(MANIFEST_PATH, manifest)
+    write_search(search, profiler)
+    return failures, check_links(args, links, found, profiler)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.watch:
+        return watch(args)
+    if args.daemon:
+        import daemon
+
+        return daemon.run(args, args.socket)
+
+    profiler = Profiler() if args.profile else NULL_PROFILER
+    block_cache = open_block_cache(args)
+    with profiler.stage("build"):
+        if args.incremental:
+            failures, broken_links = build_incremental(args, profiler=profiler, block_cache=block_cache)
+        else:
+            failures, broken_links = build_full(args, profiler, block_cache)
+    close_block_cache(block_cache)
+    print(format_peak_rss())
 
+    run_precompress(args, profiler)
+    write_deploy(profiler)
 
+    if args.profile:
+        profiler.write_trace(args.profile)
+        print(profiler.summary(args.profile_top))
+        print(f"Trace written to {args.profile}")
+    status = report_failures(failures, broken_links)
 
+    if args.serve:
+        import serve
 
+        return serve.main([DEST_DIR, str(PORT)])
+    return status
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
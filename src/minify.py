@@ -0,0 +1,193 @@
+import os
+import re
+
+# Whitespace next to these tags never renders, so it can go entirely
+BLOCK_TAGS = frozenset((
+    "!doctype", "html", "head", "body", "title", "meta", "link", "script", "style", "base", "div", "p", "ul", "ol",
+    "li", "dl", "dt", "dd", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "hr", "br", "header", "footer",
+    "nav", "main", "section", "article", "aside", "figure", "figcaption", "table", "thead", "tbody", "tfoot", "tr",
+    "td", "th", "form", "fieldset", "noscript",
+))
+# Content of these is kept byte for byte
+PRESERVE_TAGS = frozenset(("pre", "code", "textarea", "script", "style"))
+
+# A "<" that never closes (a comparison in a script, say) is text
+_TOKEN_RE = re.compile(r"<!--.*?-->|<[^>]*>|[^<]+|<", re.DOTALL)
+_TAG_NAME_RE = re.compile(r"</?\s*([!\w-]+)")
+# Not \s, which would also swallow non-breaking spaces
+_WHITESPACE_RE = re.compile(r"[ \t\n\r\f]+")
+# Inside these only the closing tag matters; anything tag-like is script or CSS text
+_RAW_TEXT_TAGS = ("script", "style")
+_CSS_TOKEN_RE = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)", re.DOTALL)
+_CSS_SPACE_RE = re.compile(r"\s*([{};,>~])\s*")
+_CSS_COLON_RE = re.compile(r":\s+")
+
+
+class HtmlMinifier:
+    """Collapses whitespace and drops comments in HTML fed to it in arbitrary chunks.
+
+    Text inside pre, code, textarea, script and style passes through untouched, and
+    conditional comments are kept.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._preserve = []
+        self._space = False
+        self._after_block = True
+
+    def _tag(self, token, out):
+        match = _TAG_NAME_RE.match(token)
+        name = match.group(1).lower() if match else ""
+        closing = token.startswith("</")
+        if self._preserve:
+            if closing and name == self._preserve[-1]:
+                self._preserve.pop()
+            elif (not closing and name in PRESERVE_TAGS and not token.endswith("/>")
+                  and self._preserve[-1] not in _RAW_TEXT_TAGS):
+                self._preserve.append(name)
+            out.append(token)
+            return
+        block = name in BLOCK_TAGS
+        if self._space and not block and not self._after_block:
+            out.append(" ")
+        self._space = False
+        self._after_block = block
+        if not closing and name in PRESERVE_TAGS and not token.endswith("/>"):
+            self._preserve.append(name)
+        out.append(token)
+
+    def _text(self, token, out):
+        if self._preserve:
+            out.append(token)
+            return
+        text = _WHITESPACE_RE.sub(" ", token)
+        core = text.strip(" ")
+        if not core:
+            self._space = True
+            return
+        if (self._space or text[0] == " ") and not self._after_block:
+            out.append(" ")
+        out.append(core)
+        self._space = text[-1] == " "
+        self._after_block = False
+
+    def feed(self, chunk):
+        """Return the minified HTML for everything up to the last complete token seen so far."""
+        data = self._pending + chunk
+        # A tag or comment cut off at the end of the chunk waits for the rest
+        cut = data.rfind("<")
+        comment = data.rfind("<!--")
+        if comment != -1 and data.find("-->", comment + 4) == -1:
+            cut = comment
+        elif cut != -1 and data.find(">", cut) != -1:
+            cut = -1
+        if cut != -1:
+            data, self._pending = data[:cut], data[cut:]
+        else:
+            self._pending = ""
+        out = []
+        for match in _TOKEN_RE.finditer(data):
+            token = match.group(0)
+            if token.startswith("<!--"):
+                if self._preserve or token.startswith("<!--["):
+                    out.append(token)
+            elif token.startswith("<") and token.endswith(">"):
+                self._tag(token, out)
+            else:
+                self._text(token, out)
+        return "".join(out)
+
+    def close(self):
+        out = self.feed("")
+        if self._pending:
+            out += self._pending
+            self._pending = ""
+        if self._space and not self._after_block and not self._preserve:
+            # Whatever comes next (a template slot, say) may need the separating space
+            out += " "
+        self._space = False
+        return out
+
+    def after_slot(self):
+        """Note that markup this minifier never sees, such as a template slot's value, goes here.
+
+        Call close() before the slot. What follows is treated as coming after inline text,
+        so whitespace that separates it from the slot's value is kept.
+        """
+        self._after_block = False
+
+
+def minify_chunks(chunks):
+    """Yield minified HTML for a stream of HTML chunks."""
+    minifier = HtmlMinifier()
+    for chunk in chunks:
+        out = minifier.feed(chunk)
+        if out:
+            yield out
+    out = minifier.close()
+    if out:
+        yield out
+
+
+def minify_html(html):
+    return "".join(minify_chunks([html]))
+
+
+def minify_css(css):
+    """Drop comments (except /*! ones) and the whitespace CSS does not need; strings are left alone."""
+    out = []
+    position = 0
+    for match in _CSS_TOKEN_RE.finditer(css):
+        out.append(_minify_css_code(css[position:match.start()]))
+        string, comment = match.groups()
+        if string is not None:
+            out.append(string)
+        elif comment.startswith("/*!"):
+            out.append(comment)
+        position = match.end()
+    out.append(_minify_css_code(css[position:]))
+    return "".join(out).strip()
+
+
+def _minify_css_code(code):
+    code = _WHITESPACE_RE.sub(" ", code)
+    code = _CSS_SPACE_RE.sub(r"\1", code).replace(";}", "}")
+    # Only after a colon: before one it can be a descendant combinator ("a :hover")
+    return _CSS_COLON_RE.sub(":", code)
+
+
+class MinifyCache:
+    """Minified copies of static files, stored by source hash so each version is minified once."""
+
+    EXTENSIONS = (".css",)
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def handles(self, path):
+        return path.endswith(self.EXTENSIONS)
+
+    def output_for(self, src_path, source_hash):
+        """Return the path of the minified copy of `src_path`, making it on a miss."""
+        extension = os.path.splitext(src_path)[1]
+        path = os.path.join(self.cache_dir, source_hash + extension)
+        if not os.path.exists(path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(src_path, "r", encoding="utf-8") as file:
+                minified = minify_css(file.read())
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write(minified)
+            os.replace(tmp_path, path)
+        return path
+
+    def retain(self, hashes):
+        """Delete cached copies whose source hash is not in `hashes`."""
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if os.path.splitext(name)[0] not in hashes:
+                os.remove(os.path.join(self.cache_dir, name))
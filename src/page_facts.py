@@ -0,0 +1,78 @@
+import re
+from collections import Counter
+
+from textnode import TextType
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+_TERM_RE = re.compile(r"\w+")
+_LINK_KINDS = {TextType.LINK: "link", TextType.IMAGE: "image"}
+
+
+def tokenize(text):
+    return [
+        term for term in _TERM_RE.findall(text.lower())
+        if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH
+    ]
+
+
+def body_first_line(markdown, body):
+    """Return the source line `body`, what is left of `markdown` after its front matter, starts on."""
+    return markdown.count("\n", 0, len(markdown) - len(body)) + 1
+
+
+class PageFacts:
+    """What later build stages need from a page, gathered from its TextNodes while it renders.
+
+    block_markdown.render_block hands over the nodes each block is built from, so what is
+    collected is exactly what the reader gets. With `links`, `links` collects [line, kind, url]
+    for every link and image; with `terms`, `terms` counts the words of all text nodes, link
+    text, alt text and code included but URLs left out. With `urls`, `urls` gathers the
+    RenderContext.url_keys of every site-absolute URL the page renders, template included.
+    `first_line` is the source line the markdown body starts on, so line numbers count front
+    matter. `title` is the text of the first heading, unless the renderer set it beforehand.
+    """
+
+    def __init__(self, links=False, terms=False, first_line=1, urls=False):
+        self.links = [] if links else None
+        self.terms = Counter() if terms else None
+        self.urls = {} if urls else None
+        self.first_line = first_line
+        self.title = None
+
+    def _wanted(self):
+        return [name for name in ("links", "terms", "urls") if getattr(self, name) is not None]
+
+    def covered_by(self, meta):
+        """Whether block metadata from the cache has everything this page collects."""
+        return all(name in meta for name in self._wanted())
+
+    def collect(self, lines, text_nodes):
+        """Return the JSON-ready facts of one block, with link lines relative to its first line."""
+        meta = {}
+        if self.links is not None:
+            links = []
+            for node in text_nodes:
+                kind = _LINK_KINDS.get(node.text_type)
+                if kind is not None:
+                    # The line that closes the link, or the block's first line when it cannot be told
+                    target = f"]({node.url})"
+                    offset = next((index for index, line in enumerate(lines) if target in line), 0)
+                    links.append([offset, kind, node.url])
+            meta["links"] = links
+        if self.terms is not None:
+            terms = Counter()
+            for node in text_nodes:
+                terms.update(tokenize(node.text))
+            meta["terms"] = dict(terms)
+        return meta
+
+    def add(self, line, meta):
+        """Take the facts of the block starting on body line `line`."""
+        if self.links is not None:
+            start = self.first_line + line - 1
+            self.links.extend([start + offset, kind, url] for offset, kind, url in meta["links"])
+        if self.terms is not None:
+            self.terms.update(meta["terms"])
+        if self.urls is not None:
+            self.urls.update(meta["urls"])
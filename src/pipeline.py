@@ -0,0 +1,116 @@
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+DEFAULT_MAX_INFLIGHT = 64
+DEFAULT_IO_WORKERS = 4
+
+
+def _render_batch(render, batch):
+    return [render(item) for item in batch]
+
+
+def run_pipeline(items, read, render, write=None, max_inflight=DEFAULT_MAX_INFLIGHT, io_workers=DEFAULT_IO_WORKERS,
+                 pool=None, batch_size=1):
+    """Run each item through read -> render -> write and yield what the last stage returns.
+
+    `read` and `write` run on thread pools of `io_workers` threads, so disk I/O overlaps
+    with rendering; either can be None when `render` does that I/O itself. `render` runs
+    on `pool` (a process pool, say) or, without one, on the calling thread. A pool gets
+    up to `batch_size` items per future, so each round trip to a worker carries several.
+    At most `max_inflight` items are between being fed and being yielded, so memory
+    stays bounded however many items there are. Results come in completion order. The
+    stage functions report their own failures; an exception they raise ends the run.
+    """
+    max_inflight = max(1, max_inflight)
+    slots = threading.Semaphore(max_inflight)
+    events = queue.Queue()
+    stopped = threading.Event()
+
+    def forward(kind):
+        return lambda future: events.put((kind, future))
+
+    with ThreadPoolExecutor(io_workers, thread_name_prefix="read") as readers, \
+            ThreadPoolExecutor(io_workers, thread_name_prefix="write") as writers:
+        def feed():
+            count = 0
+            try:
+                for item in items:
+                    slots.acquire()
+                    if stopped.is_set():
+                        break
+                    if read is not None:
+                        readers.submit(read, item).add_done_callback(forward("read"))
+                    else:
+                        events.put(("item", item))
+                    count += 1
+            finally:
+                events.put(("fed", count))
+
+        def rendered(result):
+            if write is not None:
+                writers.submit(write, result).add_done_callback(forward("write"))
+            else:
+                events.put(("done", result))
+
+        feeder = threading.Thread(target=feed, name="pipeline-feed", daemon=True)
+        feeder.start()
+        fed = None
+        finished = 0
+        batch = []
+        # A batch larger than the in-flight limit could never fill
+        batch_size = min(max(1, batch_size), max_inflight)
+        try:
+            while fed is None or finished < fed:
+                # A partial batch only goes out once nothing more is coming to fill it
+                if batch and (len(batch) >= batch_size or fed is not None):
+                    pool.submit(_render_batch, render, batch).add_done_callback(forward("render"))
+                    batch = []
+                kind, value = events.get()
+                if kind == "fed":
+                    fed = value
+                elif kind in ("read", "item"):
+                    item = value.result() if kind == "read" else value
+                    if pool is not None:
+                        batch.append(item)
+                    else:
+                        rendered(render(item))
+                elif kind == "render":
+                    for result in value.result():
+                        rendered(result)
+                else:
+                    finished += 1
+                    slots.release()
+                    yield value.result() if kind == "write" else value
+        finally:
+            # Unblock the feeder if we stop early; in-flight work drains as the pools shut down
+            stopped.set()
+            slots.release()
+            feeder.join()
+
+
+def peak_rss():
+    """Return (this process, largest finished child) peak resident set size in bytes, or None."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+
+def format_peak_rss():
+    peak = peak_rss()
+    if peak is None:
+        return "Peak RSS: unavailable on this platform"
+    own, children = peak
+    line = f"Peak RSS: {own / (1 << 20):.1f} MiB"
+    if children:
+        line += f" (largest child process {children / (1 << 20):.1f} MiB)"
+    return line
@@ -0,0 +1,160 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asset_sync import scan_static
+from build_manifest import FileHasher
+from fs_utils import load_state, remove_state, temp_path_for, write_json_atomic
+
+try:
+    import brotli
+except ImportError:  # optional, only .gz siblings are written
+    brotli = None
+
+PRECOMPRESS_STATE_VERSION = 1
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".svg", ".json")
+# Below this, the compressed copy saves too little to be worth a second file
+MIN_SIZE = 1024
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def available_encodings():
+    """Return the encodings siblings are written for, in the order the server prefers them."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _write_sibling(path, encoding, data, stat):
+    sibling = path + SUFFIXES[encoding]
+    tmp_path = temp_path_for(sibling)
+    with open(tmp_path, "wb") as file:
+        file.write(_compress(data, encoding))
+    # Match the original's mtime so the server can tell the sibling is current
+    os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(tmp_path, sibling)
+
+
+def _compress_file(path, encodings):
+    with open(path, "rb") as file:
+        data = file.read()
+    stat = os.stat(path)
+    for encoding in encodings:
+        _write_sibling(path, encoding, data, stat)
+
+
+def _remove_siblings(path):
+    for suffix in SUFFIXES.values():
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def precompress(dest_dir, state_path, min_size=MIN_SIZE, jobs=4):
+    """Write .gz (and .br, with brotli installed) siblings for compressible files in `dest_dir`.
+
+    A file whose content hash matches the last run keeps its siblings; only their mtime is
+    brought up to date. Siblings of files that were removed or shrank below `min_size`
+    are deleted. Returns a dict of counts by outcome.
+    """
+    encodings = available_encodings()
+    old_files = load_state(state_path, PRECOMPRESS_STATE_VERSION).get("files", {})
+    hasher = FileHasher({os.path.join(dest_dir, path): entry for path, entry in old_files.items()})
+    files = {}
+    counts = {"compressed": 0, "unchanged": 0, "pruned": 0}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = []
+        for relative, entry in scan_static(dest_dir):
+            if not entry.name.endswith(COMPRESSIBLE_EXTENSIONS) or entry.stat().st_size < min_size:
+                continue
+            path = entry.path
+            files[relative] = dict(hasher.stat_entry(path), encodings=list(encodings))
+
+            old = old_files.get(relative)
+            siblings = [path + SUFFIXES[encoding] for encoding in encodings]
+            if (old is not None and old.get("hash") == files[relative]["hash"]
+                    and old.get("encodings") == files[relative]["encodings"]
+                    and all(os.path.exists(sibling) for sibling in siblings)):
+                stat = entry.stat()
+                for sibling in siblings:
+                    os.utime(sibling, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+                counts["unchanged"] += 1
+                continue
+            # zlib and brotli release the GIL while compressing, so threads run in parallel
+            futures.append(pool.submit(_compress_file, path, encodings))
+
+        for future in futures:
+            future.result()
+            counts["compressed"] += 1
+
+    for relative in old_files:
+        if relative not in files:
+            _remove_siblings(os.path.join(dest_dir, relative))
+            counts["pruned"] += 1
+
+    write_json_atomic(state_path, {"version": PRECOMPRESS_STATE_VERSION, "files": files})
+    return counts
+
+
+def remove_precompressed(dest_dir, state_path):
+    """Delete every sibling an earlier precompress run wrote, for builds that no longer precompress.
+
+    Returns how many files had siblings.
+    """
+    old_files = load_state(state_path, PRECOMPRESS_STATE_VERSION).get("files", {})
+    for relative in old_files:
+        _remove_siblings(os.path.join(dest_dir, relative))
+    remove_state(state_path)
+    return len(old_files)
+
+
+def accepted_encodings(header):
+    """Return the content codings an Accept-Encoding header allows (q > 0)."""
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def select_precompressed(path, accept_encoding):
+    """Return (sibling path, encoding) to serve for `path`, or None to serve it as is.
+
+    A sibling is only used while its mtime matches the original, so a page rebuilt
+    without precompress running again is never answered with stale content.
+    """
+    if not path.endswith(COMPRESSIBLE_EXTENSIONS):
+        return None
+    accepted = accepted_encodings(accept_encoding)
+    if not accepted:
+        return None
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    for encoding in ("br", "gzip"):
+        if encoding not in accepted:
+            continue
+        sibling = path + SUFFIXES[encoding]
+        try:
+            if os.stat(sibling).st_mtime_ns == mtime_ns:
+                return sibling, encoding
+        except OSError:
+            continue
+    return None
@@ -0,0 +1,115 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+
+class Profiler:
+    """Records per-stage wall time, CPU time and allocated-block deltas as Chrome trace events.
+
+    The trace loads in chrome://tracing and ui.perfetto.dev. Timestamps come from
+    perf_counter, which is system-wide on Linux, so events from worker processes line up.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+
+    def add_event(self, name, start_ns, wall_ns, cpu_ns=0, blocks=0, page=None, **args):
+        if page is not None:
+            args["page"] = page
+        args["cpu_ms"] = round(cpu_ns / 1e6, 3)
+        args["allocated_blocks"] = blocks
+        self.events.append({
+            "name": name,
+            "cat": "build",
+            "ph": "X",
+            "ts": start_ns / 1000,
+            "dur": wall_ns / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+            "args": args,
+        })
+
+    @contextlib.contextmanager
+    def stage(self, name, page=None, **args):
+        blocks = sys.getallocatedblocks()
+        cpu = time.thread_time_ns()
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add_event(
+                name,
+                start,
+                time.perf_counter_ns() - start,
+                time.thread_time_ns() - cpu,
+                sys.getallocatedblocks() - blocks,
+                page,
+                **args,
+            )
+
+    def write_trace(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        origin = min((event["ts"] for event in self.events), default=0)
+        events = [{**event, "ts": event["ts"] - origin} for event in self.events]
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    def slowest_pages(self, count=10):
+        pages = [event for event in self.events if event["name"] == "page"]
+        pages.sort(key=lambda event: event["dur"], reverse=True)
+        return pages[:count]
+
+    def summary(self, count=10):
+        totals = {}
+        for event in self.events:
+            if event["name"] != "page":
+                totals[event["name"]] = totals.get(event["name"], 0) + event["dur"]
+
+        lines = ["Time by stage:"]
+        for name, total in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"  {name:<16}{total / 1000:>10.1f} ms")
+        lines.append(f"Slowest {count} pages:")
+        for event in self.slowest_pages(count):
+            lines.append(f"  {event['dur'] / 1000:>8.2f} ms  {event['args']['page']}")
+        return "\n".join(lines)
+
+
+class _NullProfiler:
+    """Stands in when profiling is off so instrumented code pays one attribute check."""
+
+    enabled = False
+    events = ()
+
+    def stage(self, name, page=None, **args):
+        return contextlib.nullcontext()
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+class TimedIterator:
+    """Wraps an iterator and adds up the wall and CPU time spent producing its items."""
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.wall_ns = 0
+        self.cpu_ns = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        cpu = time.thread_time_ns()
+        start = time.perf_counter_ns()
+        try:
+            return next(self.iterator)
+        finally:
+            self.wall_ns += time.perf_counter_ns() - start
+            self.cpu_ns += time.thread_time_ns() - cpu
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    key TEXT PRIMARY KEY,
+    html TEXT NOT NULL,
+    meta TEXT NOT NULL DEFAULT '{}',
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocks_last_used ON blocks (last_used);
+"""
+
+
+class BlockCache:
+    """On-disk cache of rendered block HTML, keyed by block text, block type, render context and renderer version.
+
+    Next to the HTML each block keeps a small JSON dict of what was collected from it while
+    rendering (see page_facts.PageFacts). Several build processes can share one cache file. Hits are recorded in memory and
+    written back on flush, and evict() trims the least recently used blocks down to
+    `max_bytes`.
+    """
+
+    def __init__(self, path, renderer_version, max_bytes=DEFAULT_MAX_BYTES):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.renderer_version = renderer_version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._used = set()
+        self._pending = {}
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(blocks)")]
+        if columns and "meta" not in columns:
+            # Written before blocks kept their metadata; it is only a cache, so start over
+            self._connection.execute("DROP TABLE blocks")
+        self._connection.executescript(_SCHEMA)
+
+    def key(self, block_type, block, context=""):
+        digest = hashlib.sha256()
+        for part in (self.renderer_version, block_type, block, context):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_entry(self, key, usable=None):
+        """Return (html, meta dict) for `key`, or None on a miss.
+
+        An entry whose meta fails `usable` counts as a miss and comes back as (None, meta),
+        so the caller can carry its metadata over when it renders the block again.
+        """
+        entry = self._pending.get(key)
+        if entry is None:
+            row = self._connection.execute("SELECT html, meta FROM blocks WHERE key = ?", (key,)).fetchone()
+            entry = (row[0], json.loads(row[1])) if row is not None else None
+        if entry is None:
+            self.misses += 1
+            return None
+        if usable is not None and not usable(entry[1]):
+            self.misses += 1
+            return None, entry[1]
+        self.hits += 1
+        self._used.add(key)
+        return entry
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def put(self, key, html, meta=None):
+        self._pending[key] = (html, meta or {})
+
+    def flush(self):
+        now = time.time()
+        rows = []
+        for key, (html, meta) in self._pending.items():
+            meta = json.dumps(meta, separators=(",", ":"), sort_keys=True)
+            rows.append((key, html, meta, len(html.encode("utf-8")) + len(meta), now))
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO blocks (key, html, meta, size, last_used) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._connection.executemany(
+                "UPDATE blocks SET last_used = ? WHERE key = ?",
+                [(now, key) for key in self._used],
+            )
+        self._pending.clear()
+        self._used.clear()
+
+    def total_bytes(self):
+        return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM blocks").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used blocks until the cache fits in `max_bytes`; return how many went."""
+        self.flush()
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+
+        doomed = []
+        for key, size in self._connection.execute("SELECT key, size FROM blocks ORDER BY last_used, key"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        with self._connection:
+            self._connection.executemany("DELETE FROM blocks WHERE key = ?", doomed)
+        return len(doomed)
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+
+_open_caches: dict[tuple, BlockCache] = {}
+
+
+class BlockCacheSettings:
+    """Where the block cache lives and how big it may get; cheap to send to worker processes.
+
+    The parent's copy also adds up the hits and misses reported back for each page.
+    """
+
+    def __init__(self, path, renderer_version, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.renderer_version = renderer_version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def open(self):
+        """Return this process's open cache, so each pool worker keeps a single connection."""
+        key = (self.path, self.renderer_version, self.max_bytes)
+        cache = _open_caches.get(key)
+        if cache is None:
+            cache = BlockCache(self.path, self.renderer_version, self.max_bytes)
+            _open_caches[key] = cache
+        return cache
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return f"Block cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate)"
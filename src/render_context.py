@@ -0,0 +1,70 @@
+class RenderContext:
+    """Per-build settings the renderer needs while it turns nodes into HTML.
+
+    Site-absolute URLs ("/images/x.png") are resolved against `basepath` as link and
+    image nodes are built, so the finished page never has to be searched and rewritten.
+    `images` maps an original image URL to its responsive [(variant URL, width), ...] and
+    `assets` maps an asset URL to its fingerprinted name, which replaces it everywhere.
+    With `minify`, block HTML and template markup are minified as they are produced.
+
+    Cached blocks and pages are keyed on `cache_key` plus url_keys of the URLs they use, so
+    a changed image or asset only invalidates what refers to it.
+    """
+
+    def __init__(self, basepath="/", images=None, image_sizes="100vw", assets=None, minify=False):
+        if not basepath.endswith("/"):
+            basepath += "/"
+        self.basepath = basepath
+        self.images = images or {}
+        self.image_sizes = image_sizes
+        self.assets = assets or {}
+        self.minify = minify
+        self._cache_key = None
+
+    @property
+    def cache_key(self):
+        """What about this context changes all rendered HTML, for cache keys; see url_keys for the rest."""
+        if self._cache_key is None:
+            self._cache_key = self.basepath + (":min" if self.minify else "")
+        return self._cache_key
+
+    def url_key(self, url):
+        """What `url` renders as here: its resolved form and, for images with variants, the srcset."""
+        srcset = self.image_srcset(url)
+        resolved = self.resolve_url(url)
+        return resolved if srcset is None else f"{resolved} {srcset} {self.image_sizes}"
+
+    def url_keys(self, urls):
+        """Map the site-absolute URLs among `urls` to their url_key, to be stored next to cached HTML."""
+        return {url: self.url_key(url) for url in urls if _is_site_absolute(url)}
+
+    def urls_current(self, url_keys):
+        """Whether HTML stored with these url_keys would still render the same in this context."""
+        return url_keys is not None and all(self.url_key(url) == key for url, key in url_keys.items())
+
+    def image_srcset(self, url):
+        """Return the srcset for an image URL, or None when it has no variants."""
+        variants = self.images.get(url)
+        if not variants:
+            return None
+        return ", ".join(f"{self.resolve_url(variant)} {width}w" for variant, width in variants)
+
+    def resolve_url(self, url):
+        # Only site-absolute paths move; relative, external and protocol-relative URLs stay put
+        if not _is_site_absolute(url):
+            return url
+        if self.assets:
+            path, separator, rest = url.partition("?") if "?" in url else url.partition("#")
+            fingerprinted = self.assets.get(path)
+            if fingerprinted is not None:
+                url = fingerprinted + separator + rest
+        if self.basepath == "/":
+            return url
+        return self.basepath + url[1:]
+
+    def __repr__(self):
+        return f"RenderContext({self.basepath!r})"
+
+
+def _is_site_absolute(url):
+    return url is not None and url.startswith("/") and not url.startswith("//")
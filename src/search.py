@@ -0,0 +1,182 @@
+import os
+import re
+
+from fs_utils import load_state, remove_output, remove_state, write_json_atomic
+
+SEARCH_STATE_VERSION = 1
+SEARCH_DIR = "search"
+# Terms are sharded by their first PREFIX_LENGTH characters
+PREFIX_LENGTH = 2
+
+CLIENT_SCRIPT = """\
+// Minimal client: await search("query", "/search/") -> [{url, title, score}]
+async function search(query, base) {
+  const meta = await (await fetch(base + "meta.json")).json();
+  const terms = (query.toLowerCase().match(/[\\p{L}\\p{N}_]+/gu) || []).filter((t) => t.length >= 2);
+  if (!terms.length) return [];
+  const shards = {};
+  for (const term of terms) {
+    const prefix = meta.shard_names[term.slice(0, meta.prefix_length)];
+    if (prefix && !(prefix in shards)) shards[prefix] = fetch(base + prefix + ".json").then((r) => r.json());
+  }
+  const docs = await (await fetch(base + "docs.json")).json();
+  let scores = null;
+  for (const term of terms) {
+    const prefix = meta.shard_names[term.slice(0, meta.prefix_length)];
+    const postings = prefix ? (await shards[prefix])[term] || [] : [];
+    // Postings are [doc id delta, term frequency, ...]; every term must match
+    const next = new Map();
+    for (let j = 0, doc = 0; j < postings.length; j += 2) {
+      doc += postings[j];
+      if (scores === null || scores.has(doc)) next.set(doc, (scores === null ? 0 : scores.get(doc)) + postings[j + 1]);
+    }
+    scores = next;
+  }
+  return [...scores].sort((a, b) => b[1] - a[1]).map(([doc, score]) => ({url: docs[doc][0], title: docs[doc][1], score}));
+}
+"""
+
+
+def shard_name(prefix):
+    """File name for a prefix; anything outside [a-z0-9_] is spelled as code points."""
+    if re.fullmatch(r"[a-z0-9_]+", prefix):
+        return prefix
+    return "u" + "-".join(f"{ord(char):x}" for char in prefix)
+
+
+def page_url(dest_path, dest_dir):
+    relative = os.path.relpath(dest_path, dest_dir).replace(os.sep, "/")
+    if relative == "index.html":
+        return "/"
+    if relative.endswith("/index.html"):
+        return "/" + relative[:-len("index.html")]
+    return "/" + relative
+
+
+class SearchIndex:
+    """Inverted index of the site, kept between builds so only changed shards are rewritten.
+
+    Pages keep a stable numeric id. Each shard maps the terms sharing a prefix to a flat
+    postings list of [doc id delta, term frequency, ...], so ids compress to small numbers.
+    """
+
+    def __init__(self, state_path, dest_dir):
+        self.state_path = state_path
+        self.dest_dir = dest_dir
+        self.pages = {}
+        self.next_id = 0
+        self._dirty_prefixes = set()
+        self._docs_changed = False
+        state = load_state(state_path, SEARCH_STATE_VERSION)
+        if "pages" in state and "next_id" in state:
+            self.pages = state["pages"]
+            self.next_id = state["next_id"]
+
+    def _touch(self, entry):
+        self._dirty_prefixes.update(term[:PREFIX_LENGTH] for term in entry["terms"])
+
+    def add_page(self, from_path, url, title, terms):
+        old = self.pages.get(from_path)
+        doc_id = old["id"] if old is not None else self.next_id
+        if old is None:
+            self.next_id += 1
+        entry = {"id": doc_id, "url": url, "title": title, "terms": dict(terms)}
+        if old == entry:
+            return
+        if old is not None:
+            # Only prefixes whose postings really differ need rewriting
+            for term in old["terms"].keys() | entry["terms"].keys():
+                if old["terms"].get(term) != entry["terms"].get(term):
+                    self._dirty_prefixes.add(term[:PREFIX_LENGTH])
+        else:
+            self._touch(entry)
+        if old is None or (old["url"], old["title"]) != (url, title):
+            self._docs_changed = True
+        self.pages[from_path] = entry
+
+    def remove_page(self, from_path):
+        old = self.pages.pop(from_path, None)
+        if old is not None:
+            self._touch(old)
+            self._docs_changed = True
+
+    def retain(self, from_paths):
+        for from_path in [path for path in self.pages if path not in from_paths]:
+            self.remove_page(from_path)
+
+    def _shards(self, prefixes):
+        """Build {prefix: {term: postings}} for `prefixes` in one pass over the pages."""
+        postings = {prefix: {} for prefix in prefixes}
+        for entry in sorted(self.pages.values(), key=lambda entry: entry["id"]):
+            for term, count in entry["terms"].items():
+                shard = postings.get(term[:PREFIX_LENGTH])
+                if shard is not None:
+                    shard.setdefault(term, []).append((entry["id"], count))
+
+        shards = {}
+        for prefix, terms in postings.items():
+            shard = {}
+            for term, hits in sorted(terms.items()):
+                flat = []
+                previous = 0
+                for doc_id, count in hits:
+                    flat.extend((doc_id - previous, count))
+                    previous = doc_id
+                shard[term] = flat
+            shards[prefix] = shard
+        return shards
+
+    def write(self):
+        """Write the shards that changed (or are missing) and return how many were written."""
+        directory = os.path.join(self.dest_dir, SEARCH_DIR)
+        os.makedirs(directory, exist_ok=True)
+        prefixes = {term[:PREFIX_LENGTH] for entry in self.pages.values() for term in entry["terms"]}
+        names = {prefix: shard_name(prefix) for prefix in sorted(prefixes)}
+        dirty = {
+            prefix for prefix in prefixes
+            if prefix in self._dirty_prefixes or not os.path.exists(os.path.join(directory, names[prefix] + ".json"))
+        }
+
+        for prefix, shard in self._shards(dirty).items():
+            write_json_atomic(os.path.join(directory, names[prefix] + ".json"), shard, compact=True)
+        removed = self._dirty_prefixes - prefixes
+        for prefix in removed:
+            remove_output(os.path.join(directory, shard_name(prefix) + ".json"), self.dest_dir)
+
+        docs_path = os.path.join(directory, "docs.json")
+        if self._docs_changed or dirty or removed or not os.path.exists(docs_path):
+            docs = [None] * self.next_id
+            for entry in self.pages.values():
+                docs[entry["id"]] = [entry["url"], entry["title"]]
+            write_json_atomic(docs_path, docs, compact=True)
+            write_json_atomic(os.path.join(directory, "meta.json"), {
+                "version": SEARCH_STATE_VERSION,
+                "prefix_length": PREFIX_LENGTH,
+                "shard_names": names,
+            }, compact=True)
+            with open(os.path.join(directory, "search.js"), "w") as file:
+                file.write(CLIENT_SCRIPT)
+
+        self._dirty_prefixes.clear()
+        self._docs_changed = False
+        state = {"version": SEARCH_STATE_VERSION, "next_id": self.next_id, "pages": self.pages}
+        write_json_atomic(self.state_path, state, compact=True)
+        return len(dirty)
+
+    def remove(self):
+        """Delete everything write() put in `dest_dir`, and the state, for builds that stop indexing.
+
+        Returns how many files there were.
+        """
+        if not os.path.exists(self.state_path):
+            return 0
+        directory = os.path.join(self.dest_dir, SEARCH_DIR)
+        prefixes = {term[:PREFIX_LENGTH] for entry in self.pages.values() for term in entry["terms"]}
+        names = [shard_name(prefix) + ".json" for prefix in prefixes] + ["docs.json", "meta.json", "search.js"]
+        for name in names:
+            remove_output(os.path.join(directory, name), self.dest_dir)
+        remove_state(self.state_path)
+        self.pages = {}
+        self.next_id = 0
+        return len(names)
+
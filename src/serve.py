@@ -0,0 +1,371 @@
+"""Serve the built site.
+
+    python3 src/serve.py docs 8888
+
+The asyncio server keeps connections alive, answers conditional and byte-range requests,
+prefers precompressed siblings and keeps hot files in memory until their mtime changes.
+"""
+import argparse
+import asyncio
+import mimetypes
+import os
+import sys
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler
+from urllib.parse import unquote, urlsplit
+
+from fingerprint import FINGERPRINTED_RE
+from precompress import COMPRESSIBLE_EXTENSIONS, select_precompressed
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+# Bigger files are streamed from disk instead of being cached
+DEFAULT_CACHE_FILE_BYTES = 1024 * 1024
+KEEP_ALIVE_TIMEOUT = 15
+MAX_HEADER_BYTES = 64 * 1024
+SERVER_NAME = "static_site"
+
+
+class PrecompressedHandler(SimpleHTTPRequestHandler):
+    """Threaded stdlib handler with the same sibling selection, used by --watch."""
+
+    def send_response(self, code, message=None):
+        super().send_response(code, message)
+        # Fingerprinted names change whenever their content does, so they can be cached forever
+        if code == 200 and FINGERPRINTED_RE.search(self.path.split("?", 1)[0]):
+            self.send_header("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split("?", 1)[0].endswith("/"):
+            path = os.path.join(path, "index.html")
+        selected = select_precompressed(path, self.headers.get("Accept-Encoding"))
+        if selected is None:
+            return super().send_head()
+
+        sibling, encoding = selected
+        try:
+            file = open(sibling, "rb")
+        except OSError:
+            return super().send_head()
+        stat = os.fstat(file.fileno())
+        self.send_response(200)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(stat.st_size))
+        self.send_header("Last-Modified", self.date_time_string(stat.st_mtime))
+        self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        return file
+
+
+class FileCache:
+    """LRU of file bodies keyed by path, each valid only while the file's mtime and size hold."""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, max_file_bytes=DEFAULT_CACHE_FILE_BYTES):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    async def get(self, path, stat):
+        """Return the body of `path` if it is small enough to cache, reading it on a miss.
+
+        The read runs on a worker thread; the entries are only touched from the event loop.
+        """
+        if stat.st_size > self.max_file_bytes:
+            return None
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == (stat.st_mtime_ns, stat.st_size):
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        data = await asyncio.to_thread(_read_file, path)
+        if len(data) != stat.st_size:
+            return data  # changed while we read it; serve it but do not keep it
+        self._discard(path)
+        self._entries[path] = ((stat.st_mtime_ns, stat.st_size), data)
+        self.total_bytes += len(data)
+        while self.total_bytes > self.max_bytes and self._entries:
+            self._discard(next(iter(self._entries)))
+        return data
+
+    def _discard(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.total_bytes -= len(entry[1])
+
+
+def _read_file(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single `bytes=` range, "invalid" if unsatisfiable, else None.
+
+    None means the header is absent or not one we handle (multiple ranges), so the whole
+    file is sent.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            length = int(last)
+            # An empty file has no last bytes to send
+            if length <= 0 or size == 0:
+                return "invalid"
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return "invalid"
+    return start, min(end, size - 1)
+
+
+def etag_matches(header, etag):
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def not_modified_since(header, mtime):
+    if header is None:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+class Request:
+    __slots__ = ("method", "target", "version", "headers")
+
+    def __init__(self, method, target, version, headers):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+
+    @property
+    def has_body(self):
+        return "transfer-encoding" in self.headers or self.headers.get("content-length", "0").strip() != "0"
+
+    @property
+    def keep_alive(self):
+        # Bodies are never read, so what follows one on the connection cannot be parsed as a request
+        if self.has_body:
+            return False
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+def parse_request(head):
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, version = lines[0].split(" ")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return Request(method, target, version, headers)
+
+
+class StaticServer:
+    """Serves files under `directory` over HTTP/1.1 with asyncio streams."""
+
+    def __init__(self, directory, cache=None):
+        self.root = os.path.realpath(directory)
+        self.cache = cache if cache is not None else FileCache()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError):
+                    break
+                try:
+                    request = parse_request(head)
+                except ValueError:
+                    await self._send(writer, HTTPStatus.BAD_REQUEST, {}, b"", keep_alive=False)
+                    break
+                keep_alive = await self.respond(request, writer)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def resolve(self, target):
+        """Map a request target to (file path, redirect location); both None means not found."""
+        url_path = unquote(urlsplit(target).path)
+        try:
+            path = os.path.realpath(os.path.join(self.root, url_path.lstrip("/")))
+        except ValueError:  # an embedded null byte, say
+            return None, None
+        if path != self.root and not path.startswith(self.root + os.sep):
+            return None, None
+        if os.path.isdir(path):
+            if not url_path.endswith("/"):
+                return None, url_path + "/"
+            path = os.path.join(path, "index.html")
+        if not os.path.isfile(path):
+            return None, None
+        return path, None
+
+    def locate(self, target, accept_encoding, ranged):
+        """Return (path, redirect, served path, content encoding, stat) for a request target.
+
+        Everything that touches the disk before the body is sent happens here, so respond
+        runs it on a worker thread instead of the event loop. `stat` is None if the served
+        file vanished.
+        """
+        path, redirect = self.resolve(target)
+        if path is None:
+            return None, redirect, None, None, None
+        served_path, encoding = path, None
+        # Ranges always refer to the identity bytes, so skip siblings for them
+        if path.endswith(COMPRESSIBLE_EXTENSIONS) and not ranged:
+            selected = select_precompressed(path, accept_encoding)
+            if selected is not None:
+                served_path, encoding = selected
+        try:
+            stat = os.stat(served_path)
+        except OSError:
+            stat = None
+        return path, None, served_path, encoding, stat
+
+    async def respond(self, request, writer):
+        keep_alive = request.keep_alive
+        if request.method not in ("GET", "HEAD"):
+            await self._send(writer, HTTPStatus.METHOD_NOT_ALLOWED, {"Allow": "GET, HEAD"}, b"", keep_alive)
+            return keep_alive
+
+        range_header = request.headers.get("range")
+        path, redirect, served_path, encoding, stat = await asyncio.to_thread(
+            self.locate, request.target, request.headers.get("accept-encoding"), range_header is not None)
+        if redirect is not None:
+            await self._send(writer, HTTPStatus.MOVED_PERMANENTLY, {"Location": redirect}, b"", keep_alive)
+            return keep_alive
+        if path is None:
+            body = b"Not Found" if request.method == "GET" else b""
+            await self._send(writer, HTTPStatus.NOT_FOUND, {"Content-Type": "text/plain"}, body, keep_alive,
+                             content_length=9)
+            return keep_alive
+
+        headers = {"Content-Type": mimetypes.guess_type(path)[0] or "application/octet-stream"}
+        if path.endswith(COMPRESSIBLE_EXTENSIONS):
+            headers["Vary"] = "Accept-Encoding"
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        if stat is None:
+            await self._send(writer, HTTPStatus.NOT_FOUND, {}, b"", keep_alive)
+            return keep_alive
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+        headers["ETag"] = etag
+        headers["Last-Modified"] = formatdate(stat.st_mtime, usegmt=True)
+        headers["Accept-Ranges"] = "bytes"
+        if FINGERPRINTED_RE.search(path):
+            headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+
+        if_none_match = request.headers.get("if-none-match")
+        if etag_matches(if_none_match, etag) or (
+                if_none_match is None and not_modified_since(request.headers.get("if-modified-since"), stat.st_mtime)):
+            await self._send(writer, HTTPStatus.NOT_MODIFIED, headers, b"", keep_alive, content_length=None)
+            return keep_alive
+
+        status = HTTPStatus.OK
+        start, end = 0, stat.st_size - 1
+        if_range = request.headers.get("if-range")
+        if range_header is not None and (if_range is None or if_range == etag):
+            byte_range = parse_range(range_header, stat.st_size)
+            if byte_range == "invalid":
+                headers["Content-Range"] = f"bytes */{stat.st_size}"
+                await self._send(writer, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, headers, b"", keep_alive)
+                return keep_alive
+            if byte_range is not None:
+                start, end = byte_range
+                status = HTTPStatus.PARTIAL_CONTENT
+                headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+        length = end - start + 1
+
+        if request.method == "HEAD":
+            await self._send(writer, status, headers, b"", keep_alive, content_length=length)
+            return keep_alive
+
+        data = await self.cache.get(served_path, stat)
+        if data is not None:
+            await self._send(writer, status, headers, data[start:end + 1], keep_alive)
+            return keep_alive
+
+        file = await asyncio.to_thread(open, served_path, "rb")
+        with file:
+            self._write_head(writer, status, headers, keep_alive, length)
+            await asyncio.get_running_loop().sendfile(writer.transport, file, start, length)
+        await writer.drain()
+        return keep_alive
+
+    def _write_head(self, writer, status, headers, keep_alive, content_length):
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+                 f"Date: {formatdate(usegmt=True)}",
+                 f"Server: {SERVER_NAME}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        if content_length is not None:
+            lines.append(f"Content-Length: {content_length}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def _send(self, writer, status, headers, body, keep_alive, content_length=-1):
+        if content_length == -1:
+            content_length = len(body)
+        self._write_head(writer, status, headers, keep_alive, content_length)
+        if body:
+            writer.write(body)
+        await writer.drain()
+
+
+async def serve(directory, host="", port=8888, cache=None, ready=None):
+    """Serve `directory` until cancelled; `ready`, if given, is called with the bound server."""
+    static = StaticServer(directory, cache)
+    server = await asyncio.start_server(static.handle, host or None, port, limit=MAX_HEADER_BYTES)
+    if ready is not None:
+        ready(server)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the built site.")
+    parser.add_argument("directory", nargs="?", default="docs")
+    parser.add_argument("port", nargs="?", type=int, default=8888)
+    parser.add_argument("--host", default="", help="address to bind (default: all interfaces)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024), metavar="MB",
+                        help="memory for cached file bodies (default: 64)")
+    args = parser.parse_args(argv)
+
+    print(f"Serving {args.directory} on http://localhost:{args.port}/")
+    try:
+        asyncio.run(serve(args.directory, args.host, args.port, FileCache(args.cache_size * 1024 * 1024)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
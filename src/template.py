@@ -0,0 +1,231 @@
+import hashlib
+import os
+import re
+
+from minify import HtmlMinifier
+
+LAYOUTS_DIR = "layouts"
+LAYOUT_FILE = ".layout"
+
+# {{ Name }} placeholders and {% include "path" %} directives
+_TAG_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}|\{%\s*include\s+[\"']([^\"']+)[\"']\s*%\}")
+# Site-absolute URLs in literal template markup, resolved once per basepath
+_URL_ATTR_RE = re.compile(r'((?:href|src)=")(/[^"]*)')
+_FRONT_MATTER_RE = re.compile(r"\A---[ \t]*\r?\n(.*?)\r?\n---[ \t]*(?:\r?\n|\Z)", re.DOTALL)
+
+
+class Template:
+    """A template parsed into literal segments plus the slots that get filled per page."""
+
+    def __init__(self, path, segments, slots, dependencies, digest, urls=None):
+        self.path = path
+        self.segments = segments
+        # (segment index, placeholder name) pairs
+        self.slots = slots
+        # path -> mtime_ns of the template and every file it includes
+        self.dependencies = dependencies
+        self.digest = digest
+        # Site-absolute URLs in the literal markup, as written
+        if urls is None:
+            slot_indexes = {index for index, _ in slots}
+            urls = sorted({match.group(2) for index, segment in enumerate(segments) if index not in slot_indexes
+                           for match in _URL_ATTR_RE.finditer(segment)})
+        self.urls = urls
+        self._resolved: dict[tuple, Template] = {}
+
+    def render(self, **values):
+        parts = list(self.segments)
+        for index, name in self.slots:
+            if name in values:
+                parts[index] = values[name]
+        return "".join(parts)
+
+    def iter_render(self, **values):
+        """Yield the rendered template piece by piece; a non-string value is yielded from in place."""
+        slots = dict(self.slots)
+        for index, segment in enumerate(self.segments):
+            name = slots.get(index)
+            if name is None or name not in values:
+                yield segment
+            elif isinstance(values[name], str):
+                yield values[name]
+            else:
+                yield from values[name]
+
+    def resolve_urls(self, context):
+        """Return a copy with href/src URLs in the template's own markup resolved by a RenderContext.
+
+        A minifying context also gets the markup minified, once per template version
+        and per resolution of its `urls`.
+        """
+        key = (context.cache_key, tuple(context.url_key(url) for url in self.urls))
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            slot_indexes = {index for index, _ in self.slots}
+            segments = [
+                segment if index in slot_indexes
+                else _URL_ATTR_RE.sub(lambda match: match.group(1) + context.resolve_url(match.group(2)), segment)
+                for index, segment in enumerate(self.segments)
+            ]
+            if context.minify:
+                # One minifier across the whole template, so a literal next to a slot keeps the
+                # space that separates it from the slot's value ("{{ Title }} | My Site")
+                minifier = HtmlMinifier()
+                minified = []
+                for index, segment in enumerate(segments):
+                    if index in slot_indexes:
+                        minifier.after_slot()
+                        minified.append(segment)
+                    else:
+                        minified.append(minifier.feed(segment) + minifier.close())
+                segments = minified
+            resolved = Template(self.path, segments, self.slots, self.dependencies, self.digest, self.urls)
+            self._resolved[key] = resolved
+        return resolved
+
+    def is_stale(self):
+        for path, mtime_ns in self.dependencies.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime_ns:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def __repr__(self):
+        return f"Template({self.path!r}, slots={[name for _, name in self.slots]!r})"
+
+
+def _append_literal(segments, slots, text):
+    # Merge neighbouring literals (e.g. around an include) so render joins as few strings as possible
+    if segments and (not slots or slots[-1][0] != len(segments) - 1):
+        segments[-1] += text
+    else:
+        segments.append(text)
+
+
+def _compile_into(path, segments, slots, dependencies, digest, including):
+    path = os.path.normpath(path)
+    if path in including:
+        raise ValueError(f"template include cycle: {' -> '.join(including + [path])}")
+
+    dependencies[path] = os.stat(path).st_mtime_ns
+    with open(path, "r") as file:
+        source = file.read()
+    digest.update(path.encode())
+    digest.update(source.encode())
+
+    position = 0
+    for match in _TAG_RE.finditer(source):
+        if match.start() > position:
+            _append_literal(segments, slots, source[position:match.start()])
+        name, include = match.groups()
+        if include is not None:
+            include_path = os.path.join(os.path.dirname(path), include)
+            _compile_into(include_path, segments, slots, dependencies, digest, including + [path])
+        else:
+            # Keep the original text so unknown placeholders render untouched
+            slots.append((len(segments), name))
+            segments.append(match.group(0))
+        position = match.end()
+    if position < len(source):
+        _append_literal(segments, slots, source[position:])
+
+
+def compile_template(path) -> Template:
+    segments: list[str] = []
+    slots: list[tuple[int, str]] = []
+    dependencies: dict[str, int] = {}
+    digest = hashlib.sha256()
+    _compile_into(path, segments, slots, dependencies, digest, [])
+    return Template(os.path.normpath(path), segments, slots, dependencies, digest.hexdigest())
+
+
+_template_cache: dict[str, Template] = {}
+
+
+def load_template(path, context=None) -> Template:
+    """Return the compiled template for `path`, recompiling only when it or an include changed.
+
+    With a RenderContext, asset URLs in the template are resolved against its basepath.
+    """
+    key = os.path.normpath(path)
+    template = _template_cache.get(key)
+    if template is None or template.is_stale():
+        template = compile_template(key)
+        _template_cache[key] = template
+    if context is not None:
+        return template.resolve_urls(context)
+    return template
+
+
+def clear_template_cache():
+    _template_cache.clear()
+
+
+def split_front_matter(markdown: str):
+    """Split an optional leading `---` block of `key: value` lines off a markdown document."""
+    match = _FRONT_MATTER_RE.match(markdown)
+    if match is None:
+        return {}, markdown
+
+    front_matter = {}
+    for line in match.group(1).splitlines():
+        if ":" in line:
+            key, value = line.split(":", 1)
+            front_matter[key.strip()] = value.strip()
+    return front_matter, markdown[match.end():]
+
+
+def read_front_matter(file):
+    """Consume a leading front matter block from an open text file and return it as a dict.
+
+    The file is left positioned at the start of the markdown body.
+    """
+    start = file.tell()
+    if file.readline().rstrip("\r\n").rstrip(" \t") != "---":
+        file.seek(start)
+        return {}
+
+    lines = []
+    line = file.readline()
+    while line:
+        if line.rstrip("\r\n").rstrip(" \t") == "---" and lines:
+            front_matter, _ = split_front_matter("---\n" + "".join(lines) + "---\n")
+            return front_matter
+        lines.append(line)
+        line = file.readline()
+
+    # Never closed, so it was not front matter after all
+    file.seek(start)
+    return {}
+
+
+def layout_path(name, default_template_path):
+    return os.path.join(os.path.dirname(default_template_path), LAYOUTS_DIR, f"{name}.html")
+
+
+def directory_layout(directory, content_root):
+    """Find the nearest `.layout` file from `directory` up to `content_root`."""
+    root = os.path.abspath(content_root)
+    current = os.path.abspath(directory)
+    while True:
+        candidate = os.path.join(current, LAYOUT_FILE)
+        if os.path.isfile(candidate):
+            with open(candidate, "r") as file:
+                name = file.read().strip()
+            if name:
+                return name
+        if current == root or not current.startswith(root + os.sep):
+            return None
+        current = os.path.dirname(current)
+
+
+def select_template(from_path, front_matter, default_template_path, content_root=None):
+    """Pick the template for a page: front matter first, then the directory, then the default."""
+    name = front_matter.get("layout")
+    if not name and content_root is not None:
+        name = directory_layout(os.path.dirname(from_path), content_root)
+    if not name:
+        return default_template_path
+    return layout_path(name, default_template_path)
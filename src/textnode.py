@@ -11,6 +11,8 @@ class TextType(Enum):
 
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         if not isinstance(text_type, TextType):
             raise TypeError("text_type must be an instance of TextType")
@@ -33,7 +35,8 @@ class TextNode:
         return f'TextNode("{self.text}", {self.text_type})'
     
 
-def text_node_to_html_node(text_node):
+def text_node_to_html_node(text_node, context=None):
+        """Build the leaf for a text node; a RenderContext, when given, resolves link and image URLs."""
         if not isinstance(text_node.text_type, TextType):
             raise TypeError("The nodes text type must bean instance of TextType")
         else:
@@ -51,10 +54,18 @@ def text_node_to_html_node(text_node):
                     return LeafNode(tag="code", value=text_node.text)
 
                 case TextType.LINK:
-                    return LeafNode(tag="a", value=text_node.text, props={"href": text_node.url })
+                    url = text_node.url if context is None else context.resolve_url(text_node.url)
+                    return LeafNode(tag="a", value=text_node.text, props={"href": url})
 
                 case TextType.IMAGE:
-                    return LeafNode(tag="img", value="", props={"src": text_node.url, "alt": text_node.text})
+                    if context is None:
+                        return LeafNode(tag="img", value="", props={"src": text_node.url, "alt": text_node.text})
+                    props = {"src": context.resolve_url(text_node.url), "alt": text_node.text}
+                    srcset = context.image_srcset(text_node.url)
+                    if srcset is not None:
+                        props["srcset"] = srcset
+                        props["sizes"] = context.image_sizes
+                    return LeafNode(tag="img", value="", props=props)
 
 
 
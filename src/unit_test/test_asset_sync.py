@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from src.asset_sync import place_file, sync_static
+
+
+class TestSyncStatic(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.static = os.path.join(self.root, "static")
+        self.dest = os.path.join(self.root, "docs")
+        self.state = os.path.join(self.root, ".build", "assets.json")
+        os.makedirs(os.path.join(self.static, "images"))
+        os.makedirs(self.dest)
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "png bytes")
+        self.write(os.path.join(self.static, ".DS_Store"), "hidden")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as file:
+            file.write(text)
+
+    def read(self, path):
+        with open(path) as file:
+            return file.read()
+
+    def sync(self, **kwargs):
+        return sync_static(self.static, self.dest, self.state, **kwargs)
+
+    def test_copies_then_skips_unchanged(self):
+        counts = self.sync(link_mode="copy")
+        self.assertEqual(counts["copy"], 2)
+        self.assertEqual(self.read(os.path.join(self.dest, "images", "a.png")), "png bytes")
+        self.assertFalse(os.path.exists(os.path.join(self.dest, ".DS_Store")))
+
+        counts = self.sync(link_mode="copy")
+        self.assertEqual(counts["unchanged"], 2)
+        self.assertNotIn("copy", counts)
+
+    def test_changed_file_is_recopied(self):
+        self.sync(use_hash=True)
+        self.write(os.path.join(self.static, "index.css"), "body { color: red }")
+        counts = self.sync(use_hash=True)
+        self.assertEqual(counts["unchanged"], 1)
+        self.assertEqual(self.read(os.path.join(self.dest, "index.css")), "body { color: red }")
+
+    def test_removed_source_is_pruned(self):
+        self.write(os.path.join(self.dest, "index.html"), "<p>generated page</p>")
+        self.sync()
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        counts = self.sync()
+        self.assertEqual(counts["pruned"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images")))
+        # Files the sync never placed are left alone
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html")))
+
+    def test_hardlinked_destination_is_replaced_not_written_through(self):
+        src = os.path.join(self.static, "index.css")
+        dest = os.path.join(self.dest, "index.css")
+        self.assertEqual(place_file(src, dest, "hardlink"), "hardlink")
+        self.assertEqual(os.stat(src).st_ino, os.stat(dest).st_ino)
+
+        old_source = os.path.join(self.root, "old.css")
+        os.rename(src, old_source)
+        self.write(src, "new")
+        place_file(src, dest, "copy")
+        self.assertEqual(self.read(dest), "new")
+        self.assertEqual(self.read(old_source), "body {}")
+
+
+if __name__ == "__main__":
+    unittest.main()
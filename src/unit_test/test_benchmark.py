@@ -0,0 +1,36 @@
+import random
+import unittest
+
+from src.benchmark import compare_results
+from src.block_markdown import BlockType, block_to_block_type, markdown_to_blocks
+from src.corpus import generate_document
+
+
+class TestCorpus(unittest.TestCase):
+    def test_same_seed_same_document(self):
+        self.assertEqual(generate_document(random.Random(7)), generate_document(random.Random(7)))
+        self.assertNotEqual(generate_document(random.Random(7)), generate_document(random.Random(8)))
+
+    def test_block_mix_is_respected(self):
+        document = generate_document(random.Random(1), blocks=30, block_mix={"code": 1})
+        blocks = markdown_to_blocks(document)
+        self.assertTrue(blocks[0].startswith("# "))
+        self.assertEqual({block_to_block_type(block).value for block in blocks[1:]}, {BlockType.CODE.value})
+
+    def test_inline_density(self):
+        document = generate_document(random.Random(1), blocks=10, block_mix={"paragraph": 1},
+                                     inline_density={"link": 1.0})
+        self.assertNotIn("**", document)
+        self.assertGreater(document.count("]("), 50)
+
+
+class TestCompareResults(unittest.TestCase):
+    def test_flags_slowdowns_over_threshold(self):
+        baseline = {"results": {"fast": {"min": 1.0}, "slow": {"min": 1.0}, "gone": {"min": 1.0}}}
+        current = {"results": {"fast": {"min": 0.9}, "slow": {"min": 1.5}, "new": {"min": 1.0}}}
+        rows = {name: regressed for name, _, _, _, regressed in compare_results(baseline, current, threshold=0.1)}
+        self.assertEqual(rows, {"fast": False, "slow": True})
+
+
+if __name__ == "__main__":
+    unittest.main()
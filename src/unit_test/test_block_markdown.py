@@ -1,6 +1,9 @@
+import random
 import unittest
 
-from src.block_markdown import markdown_to_blocks, block_to_block_type, BlockType, markdown_to_html_node
+from src.block_markdown import markdown_to_blocks, block_to_block_type, BlockType, markdown_to_html_node, \
+    iter_typed_blocks
+from src.corpus import generate_document
 
 class TestMarkdownToBlocks(unittest.TestCase):
     def test_markdown_to_blocks(self):
@@ -105,3 +108,39 @@ class TestBlockToBlock(unittest.TestCase):
         block = "paragraph"
         self.assertEqual(block_to_block_type(block), BlockType.PARAGRAPH)
 
+
+class TestTypedBlocks(unittest.TestCase):
+    def assertMatchesReference(self, markdown):
+        expected = [(block_to_block_type(block), block.splitlines()) for block in markdown_to_blocks(markdown)]
+        self.assertEqual([(t.value, l) for t, l in iter_typed_blocks(markdown)],
+                         [(t.value, l) for t, l in expected], markdown)
+
+    def test_matches_block_to_block_type_on_corpus(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            self.assertMatchesReference(generate_document(rng, blocks=40))
+
+    def test_matches_on_edge_cases(self):
+        for markdown in [
+            "```",
+            "  ```\ncode\n```  ",
+            "# heading\nsecond line",
+            "#nospace",
+            "####### too deep",
+            ">\n> quote\n>",
+            "- item\n- ",
+            "- item\n-  \n- last",
+            "- \t",
+            "1. one\n3. three",
+            "1. one\n2. two\n\n1. again",
+            "  \t\n\n   indented paragraph  \n  \t",
+            "> quote\nnot quote",
+            "a\r\nb\r\n\r\nc\x0cd",
+        ]:
+            self.assertMatchesReference(markdown)
+
+    def test_matches_on_random_lines(self):
+        rng = random.Random(1)
+        pieces = ["", " ", "# h", "```", "> q", ">", "- i", "- ", "1. a", "2. b", "3. c", "text", "  - x ", "##  y"]
+        for _ in range(500):
+            self.assertMatchesReference("\n".join(rng.choice(pieces) for _ in range(rng.randint(1, 12))))
@@ -0,0 +1,100 @@
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import unittest
+
+from src import daemon, main
+from src.client import send_command
+
+
+class TestBuildDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        os.makedirs("content/blog")
+        os.makedirs("static")
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.write("content/index.md", "# Home\n\nHello")
+        self.write("content/blog/post.md", "# Post\n\nWorld")
+        self.write("static/index.css", "body {}")
+
+        self.socket_path = os.path.join(self.tmp.name, "daemon.sock")
+        started = threading.Event()
+        self.thread = threading.Thread(
+            target=daemon.run, args=(main.parse_args([]), self.socket_path, lambda server: started.set()), daemon=True
+        )
+        self.thread.start()
+        self.assertTrue(started.wait(10))
+
+    def tearDown(self):
+        if self.thread.is_alive():
+            send_command(self.socket_path, {"command": "stop"}, timeout=5)
+        self.thread.join(5)
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as file:
+            file.write(text)
+
+    def request(self, command, **fields):
+        return send_command(self.socket_path, {"command": command, **fields}, timeout=10)
+
+    def test_status_and_path_rebuild(self):
+        status = self.request("status")["status"]
+        self.assertEqual((status["builds"], status["pages"], status["static_files"]), (1, 2, 1))
+
+        self.write("content/blog/post.md", "# Post\n\nChanged")
+        reply = self.request("build", paths=[os.path.abspath("content/blog/post.md")])
+        self.assertTrue(reply["ok"])
+        self.assertIn("rendered 1 page(s)", reply["log"])
+        with open("docs/blog/post.html") as file:
+            self.assertIn("Changed", file.read())
+
+    def test_new_page_triggers_rescan(self):
+        self.write("content/new.md", "# New")
+        reply = self.request("build", paths=["content/new.md"])
+        self.assertTrue(reply["ok"])
+        self.assertTrue(os.path.exists("docs/new.html"))
+        self.assertEqual(self.request("status")["status"]["pages"], 3)
+
+    def test_builds_precompress(self):
+        builder = daemon.BuildDaemon(main.parse_args(["--precompress", "--precompress-min-size", "0"]))
+        try:
+            failures, broken_links, log, _ = builder.build()
+        finally:
+            builder.close()
+        self.assertEqual((failures, broken_links), ([], []))
+        self.assertIn("Precompressed files:", log)
+        self.assertTrue(os.path.exists("docs/index.html.gz"))
+
+    def test_strict_broken_links_are_not_page_failures(self):
+        self.write("content/index.md", "# Home\n\nSee [Tom](/blog/tom)")
+        builder = daemon.BuildDaemon(main.parse_args(["--strict-links"]))
+        try:
+            failures, broken_links, _, _ = builder.build()
+        finally:
+            builder.close()
+        self.assertEqual(failures, [])
+        self.assertEqual([tuple(link) for link in broken_links], [("content/index.md", 3, "link", "/blog/tom")])
+
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            self.assertEqual(main.report_failures(failures, broken_links), 1)
+        self.assertEqual(stderr.getvalue(), "1 broken link(s) fail the build under --strict-links\n")
+
+    def test_profile_is_rejected(self):
+        with self.assertRaises(SystemExit):
+            main.parse_args(["--daemon", "--profile"])
+
+    def test_stop_removes_socket(self):
+        self.assertTrue(self.request("stop")["ok"])
+        self.thread.join(5)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
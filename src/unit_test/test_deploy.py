@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+
+from src.deploy import write_deploy_manifest
+from src.fs_utils import load_state, open_if_changed, write_json_atomic
+
+
+class TestWriteAvoidance(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "page.html")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_record_of_the_last_write(self):
+        record = {}
+        with open_if_changed(self.path, record) as file:
+            file.write(b"<p>one</p>")
+        stat = os.stat(self.path)
+        self.assertEqual(record, {"hash": hashlib.sha256(b"<p>one</p>").hexdigest(), "size": 10,
+                                  "mtime_ns": stat.st_mtime_ns})
+
+        # While size and mtime match, the recorded hash is trusted instead of reading the file
+        os.utime(self.path, ns=(1, 1))
+        with open_if_changed(self.path, {"hash": "stale", "size": 10, "mtime_ns": 1}) as file:
+            file.write(b"<p>one</p>")
+        self.assertNotEqual(os.stat(self.path).st_mtime_ns, 1)
+
+        with open_if_changed(self.path, record) as file:
+            file.write(b"<p>two</p>")
+        with open(self.path, "rb") as file:
+            self.assertEqual(file.read(), b"<p>two</p>")
+        self.assertEqual(record["hash"], hashlib.sha256(b"<p>two</p>").hexdigest())
+
+    def test_streamed_writes(self):
+        with open_if_changed(self.path) as file:
+            file.write(b"abc")
+        os.utime(self.path, ns=(1, 1))
+        with open_if_changed(self.path) as file:
+            file.write(b"abc")
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 1)
+        self.assertEqual(os.listdir(self.tmp.name), ["page.html"])
+
+    def test_state_round_trip(self):
+        path = os.path.join(self.tmp.name, ".build", "state.json")
+        self.assertEqual(load_state(path, 1), {})
+        write_json_atomic(path, {"version": 1, "files": {"a": 1}})
+        self.assertEqual(load_state(path, 1), {"version": 1, "files": {"a": 1}})
+        self.assertEqual(load_state(path, 2), {})
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["state.json"])
+
+
+class TestDeployManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.state = os.path.join(self.tmp.name, ".build", "outputs.json")
+        self.manifest = os.path.join(self.tmp.name, ".build", "deploy.json")
+        os.makedirs(os.path.join(self.dest, "blog"))
+        self.write("index.html", "home")
+        self.write(os.path.join("blog", "post.html"), "post")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative, text):
+        with open(os.path.join(self.dest, relative), "w") as file:
+            file.write(text)
+
+    def test_added_changed_removed(self):
+        first = write_deploy_manifest(self.dest, self.state, self.manifest)
+        self.assertEqual((first["added"], first["changed"], first["removed"]), (["blog/post.html", "index.html"], [], []))
+
+        self.write("index.html", "home, again")
+        self.write("new.css", "body {}")
+        os.remove(os.path.join(self.dest, "blog", "post.html"))
+        second = write_deploy_manifest(self.dest, self.state, self.manifest)
+        self.assertEqual((second["added"], second["changed"], second["removed"]),
+                         (["new.css"], ["index.html"], ["blog/post.html"]))
+        with open(self.manifest) as file:
+            self.assertEqual(sorted(json.load(file)["hashes"]), ["index.html", "new.css"])
+
+    def test_rewritten_with_same_bytes_is_not_changed(self):
+        write_deploy_manifest(self.dest, self.state, self.manifest)
+        self.write("index.html", "home")
+        os.utime(os.path.join(self.dest, "index.html"), ns=(1, 1))
+        self.assertEqual(write_deploy_manifest(self.dest, self.state, self.manifest)["changed"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
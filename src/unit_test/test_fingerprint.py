@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.block_markdown import markdown_to_html_node
+from src.fingerprint import ASSET_MANIFEST_NAME, fingerprint_assets, remove_fingerprints
+from src.render_context import RenderContext
+from src.template import compile_template
+
+
+FILES = ["index.css", os.path.join("images", "cat.png"), "index.html"]
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.state = os.path.join(self.tmp.name, ".build", "fingerprints.json")
+        os.makedirs(os.path.join(self.dest, "images"))
+        self.write("index.css", "body { color: red; }")
+        self.write(os.path.join("images", "cat.png"), "not really a png")
+        self.write("index.html", "<html></html>")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative, text):
+        with open(os.path.join(self.dest, relative), "w") as file:
+            file.write(text)
+
+    def test_twins_and_manifest(self):
+        assets = fingerprint_assets(self.dest, self.state, FILES)
+        self.assertEqual(sorted(assets), ["/images/cat.png", "/index.css"])
+        self.assertRegex(assets["/index.css"], r"^/index\.[0-9a-f]{10}\.css$")
+        with open(os.path.join(self.dest, assets["/index.css"][1:])) as file:
+            self.assertEqual(file.read(), "body { color: red; }")
+        with open(os.path.join(self.dest, ASSET_MANIFEST_NAME)) as file:
+            self.assertEqual(json.load(file), assets)
+
+    def test_names_are_stable_until_content_changes(self):
+        first = fingerprint_assets(self.dest, self.state, FILES)
+        self.assertEqual(fingerprint_assets(self.dest, self.state, FILES), first)
+
+        self.write("index.css", "body { color: blue; }")
+        second = fingerprint_assets(self.dest, self.state, FILES)
+        self.assertNotEqual(second["/index.css"], first["/index.css"])
+        self.assertEqual(second["/images/cat.png"], first["/images/cat.png"])
+        self.assertFalse(os.path.exists(os.path.join(self.dest, first["/index.css"][1:])))
+
+    def test_generated_files_are_left_alone(self):
+        os.makedirs(os.path.join(self.dest, "search"))
+        self.write(os.path.join("search", "search.js"), "search();")
+        first = fingerprint_assets(self.dest, self.state, FILES)
+        self.assertNotIn("/search/search.js", first)
+        self.assertEqual(os.listdir(os.path.join(self.dest, "search")), ["search.js"])
+        self.assertEqual(fingerprint_assets(self.dest, self.state, FILES), first)
+
+    def test_switching_off_removes_twins(self):
+        fingerprint_assets(self.dest, self.state, FILES)
+        self.assertEqual(remove_fingerprints(self.dest, self.state), 2)
+        self.assertEqual(sorted(os.listdir(self.dest)), ["images", "index.css", "index.html"])
+        self.assertEqual(os.listdir(os.path.join(self.dest, "images")), ["cat.png"])
+
+    def test_references_are_rewritten(self):
+        context = RenderContext("/site/", assets={"/images/cat.png": "/images/cat.0123456789.png"})
+        html = markdown_to_html_node("![cat](/images/cat.png) [raw](/images/cat.png#top)", context=context).to_html()
+        self.assertIn('src="/site/images/cat.0123456789.png"', html)
+        self.assertIn('href="/site/images/cat.0123456789.png#top"', html)
+
+        template_path = os.path.join(self.tmp.name, "template.html")
+        with open(template_path, "w") as file:
+            file.write('<link href="/index.css?v=1">{{ Content }}')
+        template = compile_template(template_path).resolve_urls(RenderContext(assets={"/index.css": "/index.a.css"}))
+        self.assertEqual(template.render(Content=""), '<link href="/index.a.css?v=1">')
+
+
+if __name__ == "__main__":
+    unittest.main()
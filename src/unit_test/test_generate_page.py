@@ -0,0 +1,218 @@
+import contextlib
+import io
+import os
+import random
+import tempfile
+import unittest
+
+from src.block_markdown import iter_markdown_blocks, markdown_to_blocks, markdown_to_html_node
+from src.corpus import generate_document
+from src.extract_title import extract_title
+from src.generate_page import STREAM_THRESHOLD, find_pages, generate_page, generate_pages_incremental, render_pages
+from src.page_facts import PageFacts
+from src.render_context import RenderContext
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestIncrementalBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.dest = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        self.manifest = os.path.join(self.root, ".build", "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(self.template, TEMPLATE)
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nHello")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as file:
+            file.write(text)
+
+    def build(self, basepath="/", context=None):
+        rendered, failures = generate_pages_incremental(basepath, self.content, self.template, self.dest, self.manifest,
+                                                        context=context)
+        self.assertEqual(failures, [])
+        return sorted(os.path.relpath(dest, self.dest) for _, dest in rendered)
+
+    def test_first_build_renders_everything(self):
+        self.assertEqual(self.build(), [os.path.join("blog", "post.html"), "index.html"])
+
+    def test_unchanged_build_renders_nothing(self):
+        self.build()
+        self.assertEqual(self.build(), [])
+
+    def test_only_changed_page_is_rendered(self):
+        self.build()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome back")
+        self.assertEqual(self.build(), ["index.html"])
+
+    def test_template_or_basepath_change_renders_everything(self):
+        self.build()
+        self.write(self.template, TEMPLATE + "\n")
+        self.assertEqual(len(self.build()), 2)
+        self.assertEqual(len(self.build(basepath="/site/")), 2)
+
+    def test_new_asset_name_renders_only_pages_using_it(self):
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\n![hero](/images/hero.png)")
+        self.build()
+        images = {"/images/hero.png": [("/images/hero-480w.webp", 480)]}
+        self.assertEqual(self.build(context=RenderContext(images=images)), [os.path.join("blog", "post.html")])
+        self.assertEqual(self.build(context=RenderContext(images=images, assets={"/other.css": "/other.1.css"})), [])
+
+        # URLs in the template count for every page that uses it
+        self.write(self.template, '<link href="/index.css">' + TEMPLATE)
+        self.build(context=RenderContext(images=images))
+        fingerprinted = RenderContext(images=images, assets={"/index.css": "/index.1.css"})
+        self.assertEqual(len(self.build(context=fingerprinted)), 2)
+
+    def test_directory_layout_change_renders_that_directory(self):
+        self.build()
+        os.makedirs(os.path.join(self.root, "layouts"))
+        self.write(os.path.join(self.root, "layouts", "post.html"), "<article>{{ Content }}</article>")
+        self.write(os.path.join(self.content, "blog", ".layout"), "post")
+        self.assertEqual(self.build(), [os.path.join("blog", "post.html")])
+        with open(os.path.join(self.dest, "blog", "post.html")) as file:
+            self.assertTrue(file.read().startswith("<article>"))
+
+    def test_removed_source_removes_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.assertEqual(self.build(), [])
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog")))
+
+    def test_renamed_only_page_in_directory(self):
+        self.build()
+        os.rename(os.path.join(self.content, "blog", "post.md"), os.path.join(self.content, "blog", "about.md"))
+        self.assertEqual(self.build(), [os.path.join("blog", "about.html")])
+        self.assertEqual(os.listdir(os.path.join(self.dest, "blog")), ["about.html"])
+
+
+class TestParallelBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(self.content)
+        with open(self.template, "w") as file:
+            file.write(TEMPLATE)
+        for i in range(8):
+            with open(os.path.join(self.content, f"page{i}.md"), "w") as file:
+                file.write(f"# Page {i}\n\nSome **bold** text and a [link](/page{i})")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_tree(self, dest):
+        tree = {}
+        for name in sorted(os.listdir(dest)):
+            with open(os.path.join(dest, name), "rb") as file:
+                tree[name] = file.read()
+        return tree
+
+    def test_parallel_output_matches_serial(self):
+        serial = os.path.join(self.root, "serial")
+        parallel = os.path.join(self.root, "parallel")
+        self.assertEqual(render_pages("/site/", find_pages(self.content, serial), self.template, jobs=1), [])
+        self.assertEqual(render_pages("/site/", find_pages(self.content, parallel), self.template, jobs=3), [])
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+
+    def test_failures_are_reported_per_page(self):
+        broken = os.path.join(self.content, "broken.md")
+        with open(broken, "w") as file:
+            file.write("no title here")
+        dest = os.path.join(self.root, "out")
+        failures = render_pages("/", find_pages(self.content, dest), self.template, jobs=2)
+        self.assertEqual([from_path for from_path, _ in failures], [broken])
+        self.assertEqual(len(os.listdir(dest)), 8)
+
+    def test_inventory_sizes_decide_streaming(self):
+        pages = find_pages(self.content, os.path.join(self.root, "out"))
+        huge = os.stat_result((0, 0, 0, 0, 0, 0, STREAM_THRESHOLD + 1, 0, 0, 0))
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            self.assertEqual(render_pages("/", pages, self.template, page_stats={pages[0][0]: huge}), [])
+        self.assertEqual(log.getvalue().count("Streaming page"), 1)
+
+
+class TestStreamingPage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w") as file:
+            file.write('<link href="/index.css"><title>{{ Title }}</title><body>{{ Content }}</body>')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def render(self, source, threshold):
+        dest = os.path.join(self.root, f"out-{threshold}.html")
+        front_matter = generate_page("/site/", source, self.template, dest, stream_threshold=threshold)
+        with open(dest, "rb") as file:
+            return front_matter, file.read()
+
+    def test_streamed_page_matches_whole_file_page(self):
+        source = os.path.join(self.root, "big.md")
+        with open(source, "w") as file:
+            file.write("---\nlayout: \n---\n" + generate_document(random.Random(3), blocks=200))
+        self.assertEqual(self.render(source, threshold=0), self.render(source, threshold=1 << 30))
+
+    def test_block_reader_matches_markdown_to_blocks(self):
+        document = generate_document(random.Random(5), blocks=50) + "\n\n\n  trailing  \n"
+        self.assertEqual(list(iter_markdown_blocks(io.StringIO(document))), markdown_to_blocks(document))
+        self.assertEqual(list(iter_markdown_blocks(io.BytesIO(document.encode()))), markdown_to_blocks(document))
+
+    def test_title_comes_from_the_single_scan(self):
+        rng = random.Random(9)
+        for document in ["Intro\n\n## Second  \nline\n\n# First"] + [generate_document(rng) for _ in range(5)]:
+            facts = PageFacts()
+            markdown_to_html_node(document, facts=facts)
+            self.assertEqual(facts.title, extract_title(document))
+
+
+class TestBasepath(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w") as file:
+            file.write('<link href="/index.css"><script src="//cdn.example.com/x.js"></script>{{ Content }}')
+        self.source = os.path.join(self.root, "index.md")
+        with open(self.source, "w") as file:
+            file.write('# Home\n\n[about](/about) and [ext](https://example.com) ![cat](/cat.png)\n\n'
+                       '```\n<a href="/not-a-link">\n```')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def render(self, basepath):
+        dest = os.path.join(self.root, "index.html")
+        generate_page(basepath, self.source, self.template, dest)
+        with open(dest, "r") as file:
+            return file.read()
+
+    def test_basepath_applies_to_urls_only(self):
+        html = self.render("/site/")
+        self.assertIn('<link href="/site/index.css">', html)
+        self.assertIn('src="//cdn.example.com/x.js"', html)
+        self.assertIn('<a href="/site/about">about</a>', html)
+        self.assertIn('<a href="https://example.com">ext</a>', html)
+        self.assertIn('<img src="/site/cat.png" alt="cat"></img>', html)
+        self.assertIn('<a href="/not-a-link">', html)
+
+    def test_root_basepath_leaves_urls_alone(self):
+        html = self.render("/")
+        self.assertIn('<link href="/index.css">', html)
+        self.assertIn('<a href="/about">about</a>', html)
+
+
+if __name__ == "__main__":
+    unittest.main()
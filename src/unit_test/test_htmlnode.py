@@ -1,5 +1,7 @@
 import unittest
 
+import io
+
 from src.htmlnode import HTMLNode, LeafNode, ParentNode
 from src.textnode import TextNode, TextType
 from src.inline_markdown import split_nodes_delimiter, split_nodes_image, split_nodes_link, text_to_textnodes
@@ -27,6 +29,11 @@ class TestHTMLNode(unittest.TestCase):
     })
         assert html3.props_to_html() == ' href="https://www.google.com" target="_blank"'
 
+    def test_no_instance_dict(self):
+        for node in (HTMLNode(), LeafNode("b", "x"), ParentNode("p", [])):
+            self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual(repr(LeafNode("b", "x")), "LeafNode(b, x, None)")
+
 class TestLeafNode(unittest.TestCase):
 
     def test_leaf_to_html_p(self):
@@ -58,6 +65,35 @@ class TestParentNode(unittest.TestCase):
             "<div><span><b>grandchild</b></span></div>",
         )
 
+class TestStreamingHTML(unittest.TestCase):
+    def make_tree(self):
+        items = [ParentNode("li", [LeafNode("b", f"item {i}"), LeafNode(None, " é")]) for i in range(200)]
+        return ParentNode("div", [ParentNode("ul", items, props={"class": "list"})])
+
+    def test_write_html_to_text_sink(self):
+        tree = self.make_tree()
+        sink = io.StringIO()
+        tree.write_html(sink, buffer_size=64)
+        self.assertEqual(sink.getvalue(), tree.to_html())
+
+    def test_write_html_to_binary_sink(self):
+        tree = self.make_tree()
+        sink = io.BytesIO()
+        tree.write_html(sink, buffer_size=64)
+        self.assertEqual(sink.getvalue(), tree.to_html().encode("utf-8"))
+
+    def test_deep_tree_does_not_recurse(self):
+        node = LeafNode("i", "deep")
+        for _ in range(5000):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span>" * 5000 + "<i>deep</i>"))
+
+    def test_invalid_parent_raises(self):
+        self.assertRaises(ValueError, ParentNode("div", None).to_html)
+        self.assertRaises(ValueError, ParentNode("div", [ParentNode(None, [])]).to_html)
+
+
 class TestInLineMarkdown(unittest.TestCase):
     def test_delim_bold(self):
         node = TextNode("This is text with a **bolded** word", TextType.TEXT)
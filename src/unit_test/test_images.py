@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from src.block_markdown import markdown_to_html_node
+from src.images import Image, ImageSettings, build_image_variants
+from src.render_context import RenderContext
+
+VARIANTS = {"/images/hero.png": [("/images/hero-480w.webp", 480), ("/images/hero-960w.webp", 960)]}
+
+
+class TestImageSrcset(unittest.TestCase):
+    def test_image_with_variants_gets_srcset(self):
+        context = RenderContext("/site/", images=VARIANTS, image_sizes="50vw")
+        html = markdown_to_html_node("![hero](/images/hero.png)", context=context).to_html()
+        self.assertEqual(
+            html,
+            '<div><p><img src="/site/images/hero.png" alt="hero" '
+            'srcset="/site/images/hero-480w.webp 480w, /site/images/hero-960w.webp 960w" sizes="50vw"></img></p></div>',
+        )
+
+    def test_image_without_variants_is_unchanged(self):
+        context = RenderContext(images=VARIANTS)
+        html = markdown_to_html_node("![cat](/images/cat.png)", context=context).to_html()
+        self.assertEqual(html, '<div><p><img src="/images/cat.png" alt="cat"></img></p></div>')
+
+    def test_variants_change_only_their_url_keys(self):
+        plain, with_variants = RenderContext(), RenderContext(images=VARIANTS)
+        self.assertEqual(plain.cache_key, with_variants.cache_key)
+        self.assertFalse(with_variants.urls_current(plain.url_keys(["/images/hero.png"])))
+        self.assertTrue(with_variants.urls_current(plain.url_keys(["/images/cat.png", "/about/", "relative.png"])))
+
+    def test_settings_change_cache_key(self):
+        self.assertEqual(ImageSettings().cache_key("abc"), ImageSettings().cache_key("abc"))
+        self.assertNotEqual(ImageSettings().cache_key("abc"), ImageSettings(widths=(320,)).cache_key("abc"))
+        self.assertNotEqual(ImageSettings().cache_key("abc"), ImageSettings(quality=50).cache_key("abc"))
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ImageSettings(image_format="gif")
+
+
+@unittest.skipUnless(Image is not None, "Pillow is not installed")
+class TestImageVariants(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.static = os.path.join(self.root, "static")
+        self.dest = os.path.join(self.root, "docs")
+        os.makedirs(os.path.join(self.static, "images"))
+        Image.new("RGB", (1000, 500), "green").save(os.path.join(self.static, "images", "hero.png"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, settings):
+        return build_image_variants(self.static, self.dest, os.path.join(self.root, "cache"),
+                                    os.path.join(self.root, "images.json"), settings)
+
+    def test_variants_are_narrower_than_the_original(self):
+        variants = self.build(ImageSettings(widths=(480, 960, 1600)))
+        # The original closes the list, so wide screens still get every pixel
+        self.assertEqual(variants["/images/hero.png"], [("/images/hero-480w.webp", 480),
+                                                        ("/images/hero-960w.webp", 960), ("/images/hero.png", 1000)])
+        with Image.open(os.path.join(self.dest, "images", "hero-480w.webp")) as image:
+            self.assertEqual(image.size, (480, 240))
+
+    def test_changed_settings_prune_old_variants(self):
+        self.build(ImageSettings(widths=(480,)))
+        self.build(ImageSettings(widths=(320,), image_format="jpeg"))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images", "hero-480w.webp")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "images", "hero-320w.jpg")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import random
+import unittest
+
+from src.inline_markdown import text_to_textnodes, text_to_textnodes_reference
+
+# Fragments chosen to produce overlapping, unclosed and nested inline syntax
+FRAGMENTS = ["`", "**", "_", "![", "[", "](", ")", "(", "]", "!", "a", " ", "b c", "*", "/x.png"]
+
+
+def tokenize(function, text):
+    try:
+        return function(text)
+    except ValueError:
+        return "ValueError"
+
+
+class TestSinglePassTokenizer(unittest.TestCase):
+    def assertMatchesReference(self, text):
+        self.assertEqual(
+            tokenize(text_to_textnodes, text),
+            tokenize(text_to_textnodes_reference, text),
+            msg=repr(text),
+        )
+
+    def test_known_inputs(self):
+        for text in [
+            "",
+            "plain",
+            "This is **text** with an _italic_ word and a `code block` and an ![image](https://i.imgur.com/zjjcJKZ.png) and a [link](https://boot.dev)",
+            "[a](b)[c](d)![e](f)",
+            "![[[](![ )_]()![![](_",
+            "`**not bold**` and [**also** not](/x_y_z)",
+            "unclosed **bold",
+            "unclosed `code",
+        ]:
+            self.assertMatchesReference(text)
+
+    def test_random_inputs_match_reference(self):
+        rng = random.Random(20240601)
+        for _ in range(20000):
+            text = "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 16)))
+            self.assertMatchesReference(text)
+
+    def test_many_links(self):
+        text = " ".join(f"see [link {i}](/page/{i}) and **bold {i}**" for i in range(2000))
+        nodes = text_to_textnodes(text)
+        self.assertEqual(nodes, text_to_textnodes_reference(text))
+        self.assertEqual(len(nodes), 8000)
+
+
+if __name__ == "__main__":
+    unittest.main()
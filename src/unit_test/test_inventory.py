@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from src.inventory import scan
+
+
+class TestInventory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.dest = os.path.join(self.root, "docs")
+        for relative in ("content/blog/drafts", "static/images", "static/.git"):
+            os.makedirs(os.path.join(self.root, relative))
+        for relative in ("content/index.md", "content/blog/post.md", "content/blog/notes.txt",
+                         "content/blog/drafts/wip.md", "static/index.css", "static/images/cat.png",
+                         "static/images/cat.psd", "static/.git/HEAD"):
+            with open(os.path.join(self.root, relative), "w") as file:
+                file.write(relative)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pages_static_files_and_output_dirs(self):
+        inventory = scan(self.content, self.static, self.dest)
+        self.assertEqual(inventory.pages, [
+            (os.path.join(self.content, "blog", "drafts", "wip.md"), os.path.join(self.dest, "blog", "drafts", "wip.html")),
+            (os.path.join(self.content, "blog", "post.md"), os.path.join(self.dest, "blog", "post.html")),
+            (os.path.join(self.content, "index.md"), os.path.join(self.dest, "index.html")),
+        ])
+        self.assertEqual(inventory.page_stats[os.path.join(self.content, "index.md")].st_size,
+                         len("content/index.md"))
+        self.assertEqual(sorted(relative for relative, _ in inventory.static_files),
+                         ["images/cat.png", "images/cat.psd", "index.css"])
+        self.assertEqual(inventory.output_dirs, {os.path.join(self.dest, path) if path else self.dest
+                                                 for path in ("", "blog", os.path.join("blog", "drafts"), "images")})
+
+        inventory.make_output_dirs()
+        for directory in inventory.output_dirs:
+            self.assertTrue(os.path.isdir(directory))
+
+    def test_ignore_globs(self):
+        inventory = scan(self.content, self.static, self.dest, ignore=["drafts", "*.psd"])
+        self.assertEqual([os.path.basename(from_path) for from_path, _ in inventory.pages], ["post.md", "index.md"])
+        self.assertEqual(sorted(relative for relative, _ in inventory.static_files), ["images/cat.png", "index.css"])
+        self.assertNotIn(os.path.join(self.dest, "blog", "drafts"), inventory.output_dirs)
+
+        inventory = scan(self.content, None, self.dest, ignore=["blog/post.md"])
+        self.assertEqual(len(inventory.pages), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+
+from src.block_markdown import markdown_to_html_node
+from src.generate_page import generate_pages_incremental
+from src.inventory import scan
+from src.links import LinkChecker, output_targets, resolve_target
+from src.page_facts import PageFacts
+from src.render_cache import BlockCache
+
+
+def page_links(markdown, first_line=1):
+    facts = PageFacts(links=True, first_line=first_line)
+    markdown_to_html_node(markdown, facts=facts)
+    return facts.links
+
+
+class TestPageLinks(unittest.TestCase):
+    def test_links_are_the_rendered_ones(self):
+        source = (
+            "# Title\n\n"
+            "See [a page](/blog/) and ![a cat](cat.png)\n\n"
+            "```\n[not a link](/code)\n```\n\n"
+            "```inline```\n\n"
+            "Inline `[code](/span)` then [a long\nlink](../up.html#top)\n"
+        )
+        self.assertEqual(page_links(source, first_line=4), [
+            [6, "link", "/blog/"],
+            [6, "image", "cat.png"],
+            # A link wrapped across lines counts from the line that closes it
+            [15, "link", "../up.html#top"],
+        ])
+
+    def test_cached_blocks_still_report_links(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = BlockCache(os.path.join(root, "blocks.sqlite"), "1")
+            # Cached by a build that did not collect links, so the first collecting build renders it again
+            markdown_to_html_node("Intro\n\n[a](/a)", cache)
+            for _ in range(2):
+                facts = PageFacts(links=True)
+                markdown_to_html_node("Intro\n\n[a](/a)", cache, facts=facts)
+                self.assertEqual(facts.links, [[3, "link", "/a"]])
+            cache.close()
+
+    def test_resolve_target(self):
+        self.assertEqual(resolve_target("/", "/blog/post.html"), ("index.html",))
+        self.assertEqual(resolve_target("/blog/", "/"), ("blog/index.html",))
+        self.assertEqual(resolve_target("/a.css?v=2", "/"), ("a.css", "a.css/index.html", "a.css.html"))
+        self.assertEqual(resolve_target("cat.png", "/blog/post.html", "/site/")[0], "blog/cat.png")
+        self.assertEqual(resolve_target("../", "/blog/", "/site/"), ("index.html",))
+        self.assertEqual(resolve_target("../../x", "/blog/post.html", "/site/"), ())
+        for url in ("https://example.com/", "//cdn.example.com/x.js", "mailto:a@b.c", "#top"):
+            self.assertIsNone(resolve_target(url, "/"))
+
+
+class TestLinkChecker(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.dest = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        self.write(self.template, "{{ Content }}")
+        self.write(os.path.join(self.static, "cat.png"), "png")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[post](/blog/post) ![cat](/cat.png)")
+        self.write(os.path.join(self.content, "blog", "post.md"),
+                   "---\ntitle: Post\n---\n# Post\n\n[home](../)\n\n[gone](/nope.html)")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as file:
+            file.write(text)
+
+    def build(self):
+        links = LinkChecker(os.path.join(self.root, ".build", "links.json"), self.dest)
+        inventory = scan(self.content, self.static, self.dest)
+        inventory.make_output_dirs()
+        _, failures = generate_pages_incremental("/site/", self.content, self.template, self.dest,
+                                                 os.path.join(self.root, ".build", "manifest.json"),
+                                                 inventory=inventory, links=links)
+        self.assertEqual(failures, [])
+        broken = links.check(output_targets(inventory), "/site/")
+        links.save()
+        return broken
+
+    def test_broken_links_have_source_and_line(self):
+        # Line numbers count the front matter
+        self.assertEqual(self.build(), [(os.path.join(self.content, "blog", "post.md"), 8, "link", "/nope.html")])
+
+    def test_deleted_page_flags_inbound_links_without_rerendering(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        os.remove(os.path.join(self.static, "cat.png"))
+        self.assertEqual(self.build(), [
+            (os.path.join(self.content, "index.md"), 3, "link", "/blog/post"),
+            (os.path.join(self.content, "index.md"), 3, "image", "/cat.png"),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import random
+import tempfile
+import unittest
+
+from src.asset_sync import sync_static
+from src.block_markdown import markdown_to_html_node
+from src.minify import MinifyCache, minify_chunks, minify_css, minify_html
+from src.render_context import RenderContext
+from src.template import compile_template
+
+PAGE = """<!DOCTYPE html>
+<html>
+  <head>
+    <title>  Hi  </title>
+    <!-- dropped -->
+    <!--[if IE]><p>kept</p><![endif]-->
+    <script> if (a  <  b) { x = "<pre>"; } </script>
+  </head>
+  <body>
+    <p>Some   <b>bold</b>   and <a href="/x">link</a>.
+    </p>
+    <pre><code>  keep
+   this  </code></pre>
+    <p>inline <code>a  b</code> end</p>
+  </body>
+</html>
+"""
+
+
+class TestMinifyHtml(unittest.TestCase):
+    def test_whitespace_and_comments(self):
+        self.assertEqual(
+            minify_html(PAGE),
+            '<!DOCTYPE html><html><head><title>Hi</title><!--[if IE]><p>kept</p><![endif]-->'
+            '<script> if (a  <  b) { x = "<pre>"; } </script></head><body>'
+            '<p>Some <b>bold</b> and <a href="/x">link</a>.</p>'
+            '<pre><code>  keep\n   this  </code></pre><p>inline <code>a  b</code> end</p></body></html>',
+        )
+
+    def test_chunk_boundaries_do_not_matter(self):
+        rng = random.Random(7)
+        for _ in range(100):
+            cuts = sorted(rng.sample(range(1, len(PAGE)), 6))
+            chunks = [PAGE[start:end] for start, end in zip([0] + cuts, cuts + [len(PAGE)])]
+            self.assertEqual("".join(minify_chunks(chunks)), minify_html(PAGE))
+
+    def test_rendered_blocks_and_template(self):
+        context = RenderContext(minify=True)
+        markdown = "Some  words\nacross lines\n\n```\n  code   stays\n```"
+        self.assertEqual(markdown_to_html_node(markdown, context=context).to_html(),
+                         "<div><p>Some words across lines</p><pre><code>code   stays\n</code></pre></div>")
+        self.assertNotEqual(context.cache_key, RenderContext().cache_key)
+
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "template.html")
+            with open(path, "w") as file:
+                file.write("<html>\n  <body>\n    <p>Hello {{ Name }}</p>\n  </body>\n</html>\n")
+            template = compile_template(path).resolve_urls(context)
+            self.assertEqual(template.render(Name="you"), "<html><body><p>Hello you</p></body></html>")
+
+            with open(path, "w") as file:
+                file.write("<html>\n  <title>{{ Title }} | My Site</title>\n"
+                           "  <body>\n    {{ Content }}\n  </body>\n</html>\n")
+            template = compile_template(path).resolve_urls(context)
+            self.assertEqual(template.render(Title="Home", Content="<p>Hi</p>"),
+                             "<html><title>Home | My Site</title><body><p>Hi</p></body></html>")
+
+
+class TestMinifyCss(unittest.TestCase):
+    def test_minify_css(self):
+        css = 'a :hover { content: "a  ;  }" ; margin: 0 auto; } /* gone */ /*! kept */\n' \
+              "@media screen and (max-width: 10px) { b , i > u { width: calc(1px + 2px) ; } }"
+        self.assertEqual(
+            minify_css(css),
+            'a :hover{content:"a  ;  }";margin:0 auto} /*! kept */ '
+            "@media screen and (max-width:10px){b,i>u{width:calc(1px + 2px)}}",
+        )
+
+    def test_strings_keep_semicolon_brace(self):
+        self.assertEqual(minify_css('a::after { content: ";}"; }'), 'a::after{content:";}"}')
+        self.assertEqual(minify_css("a { content: ';}' }"), "a{content:';}'}")
+
+    def test_static_copy_minifies_once_per_source(self):
+        with tempfile.TemporaryDirectory() as root:
+            static = os.path.join(root, "static")
+            dest = os.path.join(root, "docs")
+            state = os.path.join(root, "assets.json")
+            cache = MinifyCache(os.path.join(root, "minify"))
+            os.makedirs(static)
+            with open(os.path.join(static, "site.css"), "w") as file:
+                file.write("body {\n  color: red;\n}\n")
+
+            sync_static(static, dest, state, minifier=cache)
+            with open(os.path.join(dest, "site.css")) as file:
+                self.assertEqual(file.read(), "body{color:red}")
+            self.assertEqual(sync_static(static, dest, state, minifier=cache)["unchanged"], 1)
+            self.assertEqual(len(os.listdir(cache.cache_dir)), 1)
+
+            # Turning minification off puts the original back
+            self.assertEqual(sync_static(static, dest, state)["unchanged"], 0)
+            with open(os.path.join(dest, "site.css")) as file:
+                self.assertEqual(file.read(), "body {\n  color: red;\n}\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from src.pipeline import peak_rss, run_pipeline
+
+
+class TestRunPipeline(unittest.TestCase):
+    def test_every_item_passes_each_stage(self):
+        results = run_pipeline(range(50), lambda n: n + 1, lambda n: n * 2, lambda n: n - 1, max_inflight=4)
+        self.assertEqual(sorted(results), [(n + 1) * 2 - 1 for n in range(50)])
+
+    def test_inflight_items_are_bounded(self):
+        lock = threading.Lock()
+        inflight = [0, 0]  # current, peak
+
+        def read(n):
+            with lock:
+                inflight[0] += 1
+                inflight[1] = max(inflight[1], inflight[0])
+            return n
+
+        def write(n):
+            with lock:
+                inflight[0] -= 1
+            return n
+
+        with ThreadPoolExecutor(2) as pool:
+            results = list(run_pipeline(range(200), read, lambda n: n, write, max_inflight=3, pool=pool))
+        self.assertEqual(len(results), 200)
+        self.assertLessEqual(inflight[1], 3)
+
+    def test_pool_gets_items_in_batches(self):
+        class CountingPool(ThreadPoolExecutor):
+            submits = 0
+
+            def submit(self, *args, **kwargs):
+                CountingPool.submits += 1
+                return super().submit(*args, **kwargs)
+
+        with CountingPool(2) as pool:
+            results = list(run_pipeline(range(100), None, lambda n: n * 2, None, max_inflight=20, pool=pool,
+                                        batch_size=10))
+        self.assertEqual(sorted(results), [n * 2 for n in range(100)])
+        self.assertEqual(CountingPool.submits, 10)
+
+    def test_consumer_can_stop_early(self):
+        results = run_pipeline(iter(range(1000)), lambda n: n, lambda n: n, lambda n: n, max_inflight=2)
+        self.assertEqual(len([next(results), next(results)]), 2)
+        results.close()
+
+    def test_peak_rss(self):
+        peak = peak_rss()
+        if peak is not None:
+            self.assertGreater(peak[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
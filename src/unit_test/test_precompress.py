@@ -0,0 +1,102 @@
+import gzip
+import os
+import tempfile
+import threading
+import unittest
+import urllib.request
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+from src.precompress import accepted_encodings, precompress, remove_precompressed, select_precompressed
+from src.serve import PrecompressedHandler
+
+
+class QuietHandler(PrecompressedHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+PAGE = "<html><body>" + "<p>hello world</p>" * 200 + "</body></html>"
+
+
+class TestPrecompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.state = os.path.join(self.tmp.name, ".build", "compressed.json")
+        os.makedirs(os.path.join(self.dest, "blog"))
+        self.write("index.html", PAGE)
+        self.write(os.path.join("blog", "post.html"), PAGE)
+        self.write("tiny.css", "body{}")
+        self.write("photo.png", PAGE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative, text):
+        with open(os.path.join(self.dest, relative), "w") as file:
+            file.write(text)
+
+    def test_writes_gzip_siblings_above_threshold(self):
+        counts = precompress(self.dest, self.state)
+        self.assertEqual(counts["compressed"], 2)
+        with gzip.open(os.path.join(self.dest, "index.html.gz"), "rt") as file:
+            self.assertEqual(file.read(), PAGE)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "tiny.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "photo.png.gz")))
+
+    def test_rewritten_but_identical_file_is_skipped(self):
+        precompress(self.dest, self.state)
+        self.write("index.html", PAGE)
+        os.utime(os.path.join(self.dest, "index.html"), ns=(1, 10**18))
+        counts = precompress(self.dest, self.state)
+        self.assertEqual((counts["compressed"], counts["unchanged"]), (0, 2))
+        # The sibling follows the original's mtime so the server keeps using it
+        self.assertIsNotNone(select_precompressed(os.path.join(self.dest, "index.html"), "gzip"))
+
+    def test_changed_file_is_recompressed_and_removed_file_pruned(self):
+        precompress(self.dest, self.state)
+        self.write("index.html", PAGE + "<!-- changed -->")
+        os.remove(os.path.join(self.dest, "blog", "post.html"))
+        counts = precompress(self.dest, self.state)
+        self.assertEqual((counts["compressed"], counts["pruned"]), (1, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog", "post.html.gz")))
+
+    def test_switching_off_removes_siblings(self):
+        precompress(self.dest, self.state)
+        self.assertEqual(remove_precompressed(self.dest, self.state), 2)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "index.html.gz")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html")))
+        self.assertEqual(remove_precompressed(self.dest, self.state), 0)
+
+    def test_stale_sibling_is_not_served(self):
+        precompress(self.dest, self.state)
+        path = os.path.join(self.dest, "index.html")
+        os.utime(path, ns=(1, 10**18))
+        self.assertIsNone(select_precompressed(path, "gzip"))
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings("gzip, deflate, br;q=0"), {"gzip", "deflate"})
+        self.assertEqual(accepted_encodings(None), set())
+
+    def test_server_uses_sibling_when_accepted(self):
+        precompress(self.dest, self.state)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=self.dest))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/"
+            request = urllib.request.Request(url, headers={"Accept-Encoding": "gzip"})
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual(response.headers["Content-Encoding"], "gzip")
+                self.assertEqual(response.headers["Content-Type"], "text/html")
+                self.assertEqual(gzip.decompress(response.read()).decode(), PAGE)
+            with urllib.request.urlopen(url) as response:
+                self.assertIsNone(response.headers["Content-Encoding"])
+                self.assertEqual(response.read().decode(), PAGE)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
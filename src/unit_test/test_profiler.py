@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.generate_page import generate_page
+from src.profiler import NULL_PROFILER, Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stage_records_complete_event(self):
+        profiler = Profiler()
+        with profiler.stage("parse", page="a.md"):
+            [object() for _ in range(100)]
+        (event,) = profiler.events
+        self.assertEqual((event["name"], event["ph"]), ("parse", "X"))
+        self.assertEqual(event["args"]["page"], "a.md")
+        self.assertGreaterEqual(event["dur"], 0)
+
+    def test_null_profiler_records_nothing(self):
+        with NULL_PROFILER.stage("parse"):
+            pass
+        self.assertFalse(NULL_PROFILER.enabled)
+        self.assertEqual(list(NULL_PROFILER.events), [])
+
+    def test_profiled_page_matches_unprofiled_and_writes_trace(self):
+        source = os.path.join(self.root, "page.md")
+        template = os.path.join(self.root, "template.html")
+        with open(source, "w") as file:
+            file.write("# Title\n\nSome [link](/x) and **bold**")
+        with open(template, "w") as file:
+            file.write('<link href="/a.css"><title>{{ Title }}</title>{{ Content }}')
+
+        profiler = Profiler()
+        generate_page("/base/", source, template, os.path.join(self.root, "profiled.html"), profiler=profiler)
+        generate_page("/base/", source, template, os.path.join(self.root, "plain.html"))
+        with open(os.path.join(self.root, "profiled.html"), "rb") as profiled, \
+                open(os.path.join(self.root, "plain.html"), "rb") as plain:
+            self.assertEqual(profiled.read(), plain.read())
+
+        names = {event["name"] for event in profiler.events}
+        self.assertTrue({"page", "read", "parse", "to_html", "template", "write"} <= names)
+        self.assertEqual([event["args"]["page"] for event in profiler.slowest_pages(5)], [source])
+
+        trace_path = os.path.join(self.root, "trace.json")
+        profiler.write_trace(trace_path)
+        with open(trace_path) as file:
+            trace = json.load(file)
+        self.assertEqual(min(event["ts"] for event in trace["traceEvents"]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import random
+import tempfile
+import unittest
+
+from src.block_markdown import markdown_to_html_node
+from src.corpus import generate_document
+from src.render_cache import BlockCache, BlockCacheSettings
+from src.render_context import RenderContext
+
+
+class TestBlockCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "blocks.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_miss_then_hit_across_connections(self):
+        cache = BlockCache(self.path, "1")
+        key = cache.key("paragraph", "hello")
+        self.assertIsNone(cache.get(key))
+        cache.put(key, "<p>hello</p>")
+        cache.close()
+
+        reopened = BlockCache(self.path, "1")
+        self.assertEqual(reopened.get(key), "<p>hello</p>")
+        self.assertEqual((reopened.hits, reopened.misses), (1, 0))
+        reopened.close()
+
+    def test_renderer_version_changes_key(self):
+        old = BlockCache(self.path, "1")
+        new = BlockCache(self.path, "2")
+        self.assertNotEqual(old.key("paragraph", "hello"), new.key("paragraph", "hello"))
+        self.assertNotEqual(old.key("paragraph", "hello"), old.key("heading", "hello"))
+        old.close()
+        new.close()
+
+    def test_evict_drops_least_recently_used(self):
+        cache = BlockCache(self.path, "1", max_bytes=25)
+        keys = [cache.key("paragraph", str(i)) for i in range(3)]
+        for key in keys:
+            cache.put(key, "x" * 10)
+            cache.flush()
+        cache.get(keys[0])
+        cache.flush()
+
+        self.assertEqual(cache.evict(), 1)
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNotNone(cache.get(keys[2]))
+        self.assertLessEqual(cache.total_bytes(), 25)
+        cache.close()
+
+    def test_cached_render_matches_uncached(self):
+        settings = BlockCacheSettings(self.path, "1")
+        rng = random.Random(3)
+        documents = [generate_document(rng, blocks=30) for _ in range(5)]
+        expected = [markdown_to_html_node(document).to_html() for document in documents]
+
+        cache = settings.open()
+        cold = [markdown_to_html_node(document, cache).to_html() for document in documents]
+        cache.flush()
+        misses = cache.misses
+        warm = [markdown_to_html_node(document, cache).to_html() for document in documents]
+
+        self.assertEqual(cold, expected)
+        self.assertEqual(warm, expected)
+        self.assertEqual(cache.misses, misses)
+        self.assertGreater(cache.hits, 0)
+        self.assertIs(settings.open(), cache)
+
+    def test_changed_image_only_rerenders_its_block(self):
+        cache = BlockCacheSettings(self.path, "1").open()
+        markdown = "![hero](/images/hero.png)\n\n[about](/about/)\n\nPlain text"
+        markdown_to_html_node(markdown, cache, RenderContext())
+        misses = cache.misses
+
+        context = RenderContext(images={"/images/hero.png": [("/images/hero-480w.webp", 480)]})
+        html = markdown_to_html_node(markdown, cache, context).to_html()
+        self.assertIn('srcset="/images/hero-480w.webp 480w"', html)
+        self.assertEqual(cache.misses - misses, 1)
+        self.assertEqual(markdown_to_html_node(markdown, cache, context).to_html(), html)
+        self.assertEqual(cache.misses - misses, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.block_markdown import markdown_to_html_node
+from src.generate_page import generate_pages_incremental
+from src.page_facts import PageFacts
+from src.search import SEARCH_DIR, SearchIndex, page_url, shard_name
+
+
+def decode(postings):
+    doc_id = 0
+    hits = {}
+    for i in range(0, len(postings), 2):
+        doc_id += postings[i]
+        hits[doc_id] = postings[i + 1]
+    return hits
+
+
+class TestPageTerms(unittest.TestCase):
+    def test_terms_come_from_visible_text(self):
+        facts = PageFacts(terms=True)
+        markdown_to_html_node(
+            "# Rivendell Guide\n\nVisit **Elrond** and [the ford](/pages/bruinen) ![valley view](/img/x.png)\n\n"
+            "- elrond again\n\n```\nfunc main\n```",
+            facts=facts,
+        )
+        terms = facts.terms
+        self.assertEqual(terms["elrond"], 2)
+        for term in ("rivendell", "ford", "valley", "func"):
+            self.assertIn(term, terms)
+        for term in ("pages", "bruinen", "img", "png"):
+            self.assertNotIn(term, terms)
+
+    def test_page_url(self):
+        self.assertEqual(page_url(os.path.join("docs", "index.html"), "docs"), "/")
+        self.assertEqual(page_url(os.path.join("docs", "blog", "index.html"), "docs"), "/blog/")
+        self.assertEqual(page_url(os.path.join("docs", "blog", "post.html"), "docs"), "/blog/post.html")
+
+    def test_shard_names_are_file_safe(self):
+        self.assertEqual(shard_name("ab"), "ab")
+        self.assertEqual(shard_name("é"), "ue9")
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.dest = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(self.template, "{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome to the shire")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nThe shire and the river")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as file:
+            file.write(text)
+
+    def build(self, basepath="/"):
+        search = SearchIndex(os.path.join(self.root, ".build", "search.json"), self.dest)
+        _, failures = generate_pages_incremental(basepath, self.content, self.template, self.dest,
+                                                 os.path.join(self.root, ".build", "manifest.json"), search=search)
+        self.assertEqual(failures, [])
+        return search.write()
+
+    def read(self, name):
+        with open(os.path.join(self.dest, SEARCH_DIR, name + ".json")) as file:
+            return json.load(file)
+
+    def test_postings_point_at_pages(self):
+        self.build("/site/")
+        docs = self.read("docs")
+        shire = decode(self.read("sh")["shire"])
+        self.assertEqual(sorted(docs[doc][0] for doc in shire), ["/site/", "/site/blog/post.html"])
+        self.assertEqual([docs[doc][1] for doc in decode(self.read("ri")["river"])], ["Post"])
+
+    def test_only_changed_shards_are_rewritten(self):
+        self.assertGreater(self.build(), 0)
+        self.assertEqual(self.build(), 0)
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome to the shire, hobbits")
+        self.assertEqual(self.build(), 1)
+        self.assertIn("hobbits", self.read("ho"))
+
+    def test_removed_page_leaves_the_index(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.build()
+        self.assertEqual(len(decode(self.read("sh")["shire"])), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, SEARCH_DIR, "ri.json")))
+
+    def test_switching_off_removes_the_index(self):
+        self.build()
+        self.assertGreater(SearchIndex(os.path.join(self.root, ".build", "search.json"), self.dest).remove(), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, SEARCH_DIR)))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
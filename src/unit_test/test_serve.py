@@ -0,0 +1,156 @@
+import asyncio
+import gzip
+import http.client
+import os
+import tempfile
+import threading
+import unittest
+
+from src.serve import FileCache, parse_range, serve
+
+PAGE = b"<html><body>" + b"<p>hello</p>" * 300 + b"</body></html>"
+
+
+class TestStaticServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "blog"))
+        self.write("index.html", PAGE)
+        self.write(os.path.join("blog", "index.html"), b"<p>blog</p>")
+        self.write("big.bin", os.urandom(4096))
+        self.cache = FileCache(max_file_bytes=2048)
+
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def ready(server):
+            self.port = server.sockets[0].getsockname()[1]
+            started.set()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.task = self.loop.create_task(serve(self.root, "127.0.0.1", 0, self.cache, ready))
+            try:
+                self.loop.run_until_complete(self.task)
+            except asyncio.CancelledError:
+                pass
+            # Let open connections see the cancellation before the loop goes away
+            pending = asyncio.all_tasks(self.loop)
+            for task in pending:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait(5)
+
+    def tearDown(self):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join(5)
+        self.loop.close()
+        self.tmp.cleanup()
+
+    def write(self, relative, data):
+        with open(os.path.join(self.root, relative), "wb") as file:
+            file.write(data)
+
+    def connect(self):
+        return http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+
+    def get(self, connection, path, **headers):
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        return response, response.read()
+
+    def test_keep_alive_serves_several_requests(self):
+        connection = self.connect()
+        response, body = self.get(connection, "/")
+        self.assertEqual((response.status, body), (200, PAGE))
+        response, body = self.get(connection, "/blog/")
+        self.assertEqual((response.status, body), (200, b"<p>blog</p>"))
+        response, _ = self.get(connection, "/missing.html")
+        self.assertEqual(response.status, 404)
+        connection.close()
+
+    def test_directory_without_slash_redirects(self):
+        response, _ = self.get(self.connect(), "/blog")
+        self.assertEqual((response.status, response.getheader("Location")), (301, "/blog/"))
+
+    def test_conditional_requests(self):
+        connection = self.connect()
+        response, _ = self.get(connection, "/index.html")
+        etag, modified = response.getheader("ETag"), response.getheader("Last-Modified")
+        response, body = self.get(connection, "/index.html", **{"If-None-Match": etag})
+        self.assertEqual((response.status, body), (304, b""))
+        response, _ = self.get(connection, "/index.html", **{"If-Modified-Since": modified})
+        self.assertEqual(response.status, 304)
+        response, _ = self.get(connection, "/index.html", **{"If-None-Match": '"other"'})
+        self.assertEqual(response.status, 200)
+
+    def test_byte_ranges(self):
+        with open(os.path.join(self.root, "big.bin"), "rb") as file:
+            data = file.read()
+        connection = self.connect()
+        response, body = self.get(connection, "/big.bin", Range="bytes=100-199")
+        self.assertEqual((response.status, body), (206, data[100:200]))
+        self.assertEqual(response.getheader("Content-Range"), "bytes 100-199/4096")
+        response, body = self.get(connection, "/index.html", Range="bytes=-5")
+        self.assertEqual((response.status, body), (206, PAGE[-5:]))
+        response, _ = self.get(connection, "/big.bin", Range="bytes=5000-")
+        self.assertEqual(response.status, 416)
+
+    def test_null_byte_is_not_found(self):
+        response, _ = self.get(self.connect(), "/%00")
+        self.assertEqual(response.status, 404)
+
+    def test_request_body_closes_connection(self):
+        connection = self.connect()
+        connection.request("POST", "/", body=b"GET /blog/ HTTP/1.1\r\n\r\n")
+        response = connection.getresponse()
+        response.read()
+        self.assertEqual(response.status, 405)
+        self.assertEqual(response.getheader("Connection"), "close")
+
+    def test_range_of_empty_file(self):
+        self.write("empty.txt", b"")
+        response, _ = self.get(self.connect(), "/empty.txt", Range="bytes=-5")
+        self.assertEqual(response.status, 416)
+        self.assertEqual(response.getheader("Content-Range"), "bytes */0")
+
+    def test_precompressed_sibling(self):
+        self.write("index.html.gz", gzip.compress(PAGE))
+        stat = os.stat(os.path.join(self.root, "index.html"))
+        os.utime(os.path.join(self.root, "index.html.gz"), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        response, body = self.get(self.connect(), "/", **{"Accept-Encoding": "gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(gzip.decompress(body), PAGE)
+
+    def test_cache_is_invalidated_by_mtime(self):
+        connection = self.connect()
+        self.get(connection, "/blog/")
+        self.get(connection, "/blog/")
+        self.assertEqual(self.cache.hits, 1)
+        self.write(os.path.join("blog", "index.html"), b"<p>new!</p>")
+        os.utime(os.path.join(self.root, "blog", "index.html"), ns=(1, 10**18))
+        _, body = self.get(connection, "/blog/")
+        self.assertEqual(body, b"<p>new!</p>")
+
+
+class TestParseRange(unittest.TestCase):
+    def test_forms(self):
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=50-500", 100), (50, 99))
+        self.assertEqual(parse_range("bytes=100-", 100), "invalid")
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 100))
+        self.assertIsNone(parse_range(None, 100))
+
+    def test_empty_file(self):
+        self.assertEqual(parse_range("bytes=-5", 0), "invalid")
+        self.assertEqual(parse_range("bytes=0-", 0), "invalid")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+
+from src.template import (
+    clear_template_cache,
+    compile_template,
+    load_template,
+    select_template,
+    split_front_matter,
+)
+
+
+class TemplateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        clear_template_cache()
+
+    def tearDown(self):
+        clear_template_cache()
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+
+class TestCompileTemplate(TemplateTestCase):
+    def test_render_fills_slots(self):
+        path = self.write("t.html", "<title>{{ Title }}</title><main>{{Content}}</main>")
+        template = compile_template(path)
+        self.assertEqual(template.render(Title="Hi", Content="<p>x</p>"), "<title>Hi</title><main><p>x</p></main>")
+
+    def test_iter_render_streams_iterable_values(self):
+        path = self.write("t.html", "<title>{{ Title }}</title><main>{{ Content }}</main>")
+        chunks = list(compile_template(path).iter_render(Title="Hi", Content=iter(["<p>", "x", "</p>"])))
+        self.assertEqual(chunks, ["<title>", "Hi", "</title><main>", "<p>", "x", "</p>", "</main>"])
+
+    def test_unknown_placeholder_is_left_alone(self):
+        path = self.write("t.html", "{{ Title }} {{ Author }}")
+        self.assertEqual(compile_template(path).render(Title="Hi"), "Hi {{ Author }}")
+
+    def test_includes_are_inlined(self):
+        self.write("partials/head.html", "<head><title>{{ Title }}</title></head>")
+        path = self.write("t.html", '<html>{% include "partials/head.html" %}<body>{{ Content }}</body></html>')
+        template = compile_template(path)
+        self.assertEqual(
+            template.render(Title="T", Content="C"),
+            "<html><head><title>T</title></head><body>C</body></html>",
+        )
+        self.assertEqual(len(template.dependencies), 2)
+
+    def test_literals_around_includes_are_merged(self):
+        self.write("part.html", "b")
+        path = self.write("t.html", 'a{% include "part.html" %}c{{ Content }}')
+        self.assertEqual(compile_template(path).segments, ["abc", "{{ Content }}"])
+
+    def test_include_cycle_raises(self):
+        self.write("a.html", '{% include "b.html" %}')
+        self.write("b.html", '{% include "a.html" %}')
+        self.assertRaises(ValueError, compile_template, os.path.join(self.root, "a.html"))
+
+
+class TestTemplateCache(TemplateTestCase):
+    def test_cached_until_include_changes(self):
+        part = self.write("part.html", "one")
+        path = self.write("t.html", '{% include "part.html" %}')
+        first = load_template(path)
+        self.assertIs(load_template(path), first)
+
+        self.write("part.html", "two")
+        stat = os.stat(part)
+        os.utime(part, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        second = load_template(path)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.render(), "two")
+        self.assertNotEqual(second.digest, first.digest)
+
+
+class TestLayoutSelection(TemplateTestCase):
+    def test_front_matter(self):
+        front_matter, body = split_front_matter("---\nlayout: post\ntitle: x\n---\n# Hello")
+        self.assertEqual(front_matter, {"layout": "post", "title": "x"})
+        self.assertEqual(body, "# Hello")
+        self.assertEqual(split_front_matter("# Hello"), ({}, "# Hello"))
+
+    def test_page_then_directory_then_default(self):
+        default = os.path.join(self.root, "template.html")
+        content = os.path.join(self.root, "content")
+        self.write("content/blog/.layout", "post\n")
+        page = self.write("content/blog/deep/page.md", "# x")
+        other = self.write("content/other.md", "# x")
+
+        self.assertEqual(select_template(other, {}, default, content), default)
+        self.assertEqual(
+            select_template(page, {}, default, content),
+            os.path.join(self.root, "layouts", "post.html"),
+        )
+        self.assertEqual(
+            select_template(page, {"layout": "wide"}, default, content),
+            os.path.join(self.root, "layouts", "wide.html"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
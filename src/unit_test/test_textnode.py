@@ -24,6 +24,11 @@ class TestTextNode(unittest.TestCase):
 
         self.assertNotEqual(node5, node6)
 
+    def test_no_instance_dict(self):
+        node = TextNode("compact", TextType.TEXT)
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual(repr(node), 'TextNode("compact", TextType.TEXT)')
+
 class TestTextToLeaf(unittest.TestCase):
     def test_text(self):
         node = TextNode("This is a text node", TextType.TEXT)
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from src.watch import LiveReload, PollingWatcher, inject_reload_script, RELOAD_SCRIPT
+
+
+class TestPollingWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "content", "blog"))
+        self.page = os.path.join(self.root, "content", "blog", "post.md")
+        self.template = os.path.join(self.root, "template.html")
+        for path in (self.page, self.template):
+            with open(path, "w") as file:
+                file.write("one")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reports_changed_added_and_removed_files(self):
+        watcher = PollingWatcher([os.path.join(self.root, "content"), self.template], interval=0)
+        self.assertEqual(watcher.poll(0), set())
+
+        with open(self.page, "w") as file:
+            file.write("two, longer")
+        added = os.path.join(self.root, "content", "new.md")
+        with open(added, "w") as file:
+            file.write("new")
+        os.remove(self.template)
+        self.assertEqual(watcher.poll(0), {self.page, added, self.template})
+        self.assertEqual(watcher.poll(0), set())
+
+
+class TestLiveReload(unittest.TestCase):
+    def test_notify_wakes_waiters(self):
+        livereload = LiveReload()
+        versions = []
+        waiter = threading.Thread(target=lambda: versions.append(livereload.wait(0, timeout=5)))
+        waiter.start()
+        livereload.notify()
+        waiter.join()
+        self.assertEqual(versions, [1])
+
+    def test_wait_times_out_without_change(self):
+        self.assertEqual(LiveReload().wait(0, timeout=0.01), 0)
+
+    def test_script_goes_before_closing_body(self):
+        self.assertEqual(inject_reload_script("<body><p>x</p></body>"), f"<body><p>x</p>{RELOAD_SCRIPT}</body>")
+        self.assertEqual(inject_reload_script("<p>x</p>"), f"<p>x</p>{RELOAD_SCRIPT}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+from serve import PrecompressedHandler
+
+try:
+    import inotify_simple
+except ImportError:  # optional, fall back to polling
+    inotify_simple = None
+
+LIVERELOAD_PATH = "/__livereload"
+RELOAD_SCRIPT = (
+    f'<script>new EventSource("{LIVERELOAD_PATH}").onmessage = function () {{ location.reload(); }};</script>'
+)
+
+
+def snapshot(roots):
+    """Map every file under `roots` (files or directories) to its (mtime_ns, size)."""
+    files = {}
+    stack = list(roots)
+    while stack:
+        path = stack.pop()
+        try:
+            if os.path.isdir(path):
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            else:
+                stat = os.stat(path)
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            continue  # vanished between listing and stat
+    return files
+
+
+class PollingWatcher:
+    def __init__(self, roots, interval=0.25):
+        self.roots = roots
+        self.interval = interval
+        self.files = snapshot(roots)
+
+    def poll(self, timeout):
+        """Return the paths that changed, waiting up to `timeout` seconds."""
+        time.sleep(min(timeout, self.interval))
+        current = snapshot(self.roots)
+        changed = {path for path in current.keys() | self.files.keys() if current.get(path) != self.files.get(path)}
+        self.files = current
+        return changed
+
+
+class InotifyWatcher:
+    def __init__(self, roots):
+        flags = inotify_simple.flags
+        self.mask = (flags.CLOSE_WRITE | flags.CREATE | flags.DELETE | flags.MOVED_FROM | flags.MOVED_TO)
+        self.inotify = inotify_simple.INotify()
+        self.directories = {}
+        # Watches on whole directories; the rest only watch the parent of a single file root
+        self.recursive = set()
+        self.files = set()
+        for root in roots:
+            if os.path.isdir(root):
+                for directory, _, _ in os.walk(root):
+                    self._add(directory, recursive=True)
+            elif os.path.exists(root):
+                # Watch the parent so editors that replace the file are still seen
+                self._add(os.path.dirname(root) or ".", recursive=False)
+                self.files.add(os.path.normpath(root))
+
+    def _add(self, directory, recursive):
+        descriptor = self.inotify.add_watch(directory, self.mask)
+        self.directories[descriptor] = directory
+        if recursive:
+            self.recursive.add(descriptor)
+
+    def poll(self, timeout):
+        changed = set()
+        for event in self.inotify.read(timeout=int(timeout * 1000)):
+            directory = self.directories.get(event.wd)
+            if directory is None or not event.name:
+                continue
+            path = os.path.join(directory, event.name)
+            if event.wd in self.recursive:
+                if event.mask & inotify_simple.flags.ISDIR:
+                    if event.mask & (inotify_simple.flags.CREATE | inotify_simple.flags.MOVED_TO):
+                        self._add(path, recursive=True)
+                    continue
+                changed.add(path)
+            elif os.path.normpath(path) in self.files:
+                changed.add(path)
+        return changed
+
+
+def make_watcher(roots, interval=0.25):
+    if inotify_simple is not None:
+        try:
+            return InotifyWatcher(roots)
+        except OSError:
+            pass  # e.g. out of watches, polling still works
+    return PollingWatcher(roots, interval)
+
+
+def watch_changes(roots, debounce=0.15, interval=0.25):
+    """Yield sets of changed paths, merging bursts of saves into one set."""
+    watcher = make_watcher(roots, interval)
+    while True:
+        changed = watcher.poll(interval)
+        if not changed:
+            continue
+        # Keep collecting until the burst goes quiet for `debounce` seconds
+        while True:
+            more = watcher.poll(debounce)
+            if not more:
+                break
+            changed |= more
+        yield changed
+
+
+class LiveReload:
+    """Lets the build wake every browser waiting on the reload event stream."""
+
+    def __init__(self):
+        self.version = 0
+        self._condition = threading.Condition()
+
+    def notify(self):
+        with self._condition:
+            self.version += 1
+            self._condition.notify_all()
+
+    def wait(self, version, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+def inject_reload_script(html: str) -> str:
+    index = html.rfind("</body>")
+    if index == -1:
+        return html + RELOAD_SCRIPT
+    return html[:index] + RELOAD_SCRIPT + html[index:]
+
+
+class LiveReloadHandler(PrecompressedHandler):
+    def __init__(self, *args, livereload, **kwargs):
+        self.livereload = livereload
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.path == LIVERELOAD_PATH:
+            return self._stream_events()
+
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split("?", 1)[0].endswith("/"):
+            path = os.path.join(path, "index.html")
+        if not path.endswith(".html") or not os.path.isfile(path):
+            return super().do_GET()
+
+        with open(path, "r") as file:
+            body = inject_reload_script(file.read()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        version = self.livereload.version
+        try:
+            while True:
+                new_version = self.livereload.wait(version, timeout=15)
+                # A comment line keeps idle connections from being dropped by proxies
+                self.wfile.write(b"data: reload\n\n" if new_version != version else b": ping\n\n")
+                self.wfile.flush()
+                version = new_version
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_server(directory, port):
+    """Serve `directory` on a background thread and return (server, livereload)."""
+    livereload = LiveReload()
+    handler = partial(LiveReloadHandler, directory=directory, livereload=livereload)
+    server = ThreadingHTTPServer(("", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, livereload